@@ -0,0 +1,438 @@
+"""
+Benchmark offline dos fluxos do projeto, sem credenciais nem rede.
+
+Os fluxos do Earth Engine (export_all_images.py, projeto-01b.py e
+export_test.py) são reexecutados sobre o fake_ee, com latência simulada por
+tipo de chamada e relógio virtual; para cada um são registradas as idas e
+voltas ao servidor (getInfo, task.start, getTaskList...), as operações
+montadas (size, toList), a latência simulada total e o tempo real. As etapas
+locais (NDVI, máscara de nuvens, composição, tendência, fragmentação,
+estatísticas zonais, mosaico, cubo de dados e amostragem de pontos) rodam
+sobre rasters sintéticos e informam pixels/s.
+
+Cada caso roda em um processo próprio, em um diretório temporário, para que o
+pico de memória (RSS) seja o do caso e os diários/caches não se misturem. O
+relatório JSON de duas execuções pode ser comparado para achar regressões.
+
+Uso:
+    python benchmark.py executar relatorio.json [lado dos rasters] [meses do catálogo]
+    python benchmark.py comparar base.json novo.json
+"""
+
+import contextlib
+import datetime
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import runpy
+import shutil
+import sys
+import tempfile
+import time
+from queue import Empty
+
+# Latência simulada (segundos) de cada tipo de ida e volta ao servidor
+LATENCY = {'default': 0.2, 'getInfo': 0.5, 'task.start': 0.3, 'getTaskList': 0.4, 'getDownloadURL': 0.3}
+
+# Lado (pixels) dos rasters sintéticos e meses do catálogo sintético
+RASTER_SIDE = 2048
+CATALOG_MONTHS = 1
+
+# Tolerância relativa na comparação de relatórios (tempo, pixels/s e memória)
+TOLERANCE = 0.2
+
+# Tempo máximo de cada caso (segundos) e intervalo em que se confere se o processo ainda está vivo
+CASE_TIMEOUT = 3600
+POLL_SECONDS = 1.0
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _peak_rss_mb():
+    # ru_maxrss é dado em KB no Linux (e em bytes no macOS); inclui os processos filhos já encerrados
+    scale = 1 if sys.platform == 'darwin' else 1024
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak * scale / 2 ** 20
+
+
+# -------------------------------------------
+# Fluxos do Earth Engine (fake_ee)
+# -------------------------------------------
+
+def _install_fake(months):
+    os.environ['EE_CACHE_PATH'] = 'off'
+    import fake_ee
+
+    fake_ee.install()
+    fake_ee.reset()
+    fake_ee.latency.update(LATENCY)
+    fake_ee.task_timing.update({'queue': 5.0, 'run': 60.0})
+    end = datetime.datetime(2017 + months // 12, months % 12 + 1, 1)
+    fake_ee.add_synthetic_catalog(datetime.datetime(2017, 1, 1), end)
+    # As esperas (monitor de tarefas, agendador) passam no relógio virtual
+    time.sleep = fake_ee.clock.sleep
+    return fake_ee
+
+
+def _run_script(name):
+    runpy.run_path(os.path.join(REPO_DIR, name), run_name='__main__')
+
+
+def workflow_export_all_images(options):
+    _install_fake(options['months'])
+    _run_script('export_all_images.py')
+    return {}
+
+
+def workflow_projeto_01b(options):
+    _install_fake(options['months'])
+    _run_script('projeto-01b.py')
+    return {}
+
+
+def workflow_export_test(options):
+    fake_ee = _install_fake(options['months'])
+    from fake_http import FileServer
+
+    with open('download.bin', 'wb') as f:
+        f.write(os.urandom(4 * 2 ** 20))
+    fake_ee.CATALOG.setdefault('LANDSAT/LC08/C01/T1', []).append({
+        'id': 'LANDSAT/LC08/C01/T1/LC08_220080_20200420', 'bbox': [-50.5, -29.5, -48.0, -27.5],
+        'bands': ['B1', 'B2', 'B3', 'B4', 'B5', 'B6', 'B7'],
+        'properties': {'system:time_start': 1587340800000, 'CLOUD_COVER': 10.0},
+    })
+    with FileServer('.', fallback='download.bin') as server:
+        fake_ee.download_base = server.url('').rstrip('/')
+        _run_script('export_test.py')
+    return {'downloaded_bytes': sum(os.path.getsize(os.path.join('downloads', name)) for name in os.listdir('downloads'))}
+
+
+WORKFLOWS = {
+    'export_all_images': workflow_export_all_images,
+    'projeto-01b': workflow_projeto_01b,
+    'export_test': workflow_export_test,
+}
+
+
+# -------------------------------------------
+# Etapas locais (rasters sintéticos)
+# -------------------------------------------
+
+def _grid():
+    from raster_io import transform_from_grid
+    return transform_from_grid(-40.0, -8.0, 30 / 111319.49)
+
+
+def _write(path, array, dtype, nodata=None):
+    from raster_io import RasterWriter
+
+    bands = array if array.ndim == 3 else array[None]
+    with RasterWriter(path, bands.shape[2], bands.shape[1], count=bands.shape[0], dtype=dtype,
+                      transform=_grid(), nodata=nodata, block_size=256) as writer:
+        writer.write(bands)
+    return path
+
+
+def _ndvi_scenes(side, count, rng):
+    import numpy as np
+
+    base = rng.uniform(0.2, 0.8, (side, side)).astype(np.float32)
+    paths = []
+    for i in range(count):
+        date = datetime.date(2017, 1, 1) + datetime.timedelta(days=16 * i)
+        scene = base - 0.002 * i + rng.normal(0, 0.05, (side, side)).astype(np.float32)
+        scene[rng.random((side, side)) < 0.1] = np.nan
+        paths.append(_write(f'ndvi_{date:%Y-%m-%d}.tif', scene, 'float32', float('nan')))
+    return paths
+
+
+def _timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        function(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def stage_ndvi(options, rng):
+    import numpy as np
+    from local_ndvi import compute_ndvi
+
+    side = options['side']
+    bands = rng.integers(7000, 30000, (2, side, side)).astype(np.uint16)
+    _write('cena.tif', bands, 'uint16', 0)
+    return {'pixels': side * side, 'seconds': _timed(compute_ndvi, 'cena.tif', 'ndvi.tif', sensor='landsat8')}
+
+
+def stage_cloud_mask(options, rng):
+    import numpy as np
+    from cloud_mask import compute_mask
+
+    side = options['side']
+    _write('qa.tif', rng.integers(0, 65536, (side, side)).astype(np.uint16), 'uint16')
+    return {'pixels': side * side, 'seconds': _timed(compute_mask, 'qa.tif', 'mascara.tif', 'landsat8')}
+
+
+def stage_composite(options, rng):
+    from composite import build_composite
+
+    side = options['side'] // 2
+    paths = _ndvi_scenes(side, 23, rng)
+    return {'pixels': side * side, 'scenes': len(paths),
+            'seconds': _timed(build_composite, paths, 'composicao.tif')}
+
+
+def stage_trend(options, rng):
+    from trend import build_trend
+
+    side = options['side'] // 4
+    paths = _ndvi_scenes(side, 46, rng)
+    return {'pixels': side * side, 'scenes': len(paths), 'seconds': _timed(build_trend, paths, 'tendencia.tif')}
+
+
+def stage_fragmentation(options, rng):
+    import numpy as np
+    from fragmentation import fragmentation_metrics
+
+    side = options['side']
+    # Manchas: ruído suavizado por blocos e limiarizado, com classes do MapBiomas
+    noise = rng.random((side // 8 + 1, side // 8 + 1))
+    field = np.kron(noise, np.ones((8, 8)))[:side, :side]
+    classes = np.where(field > 0.55, 3, 15).astype(np.uint8)
+    _write('classes.tif', classes, 'uint8', 0)
+    return {'pixels': side * side, 'seconds': _timed(fragmentation_metrics, 'classes.tif')}
+
+
+def stage_zonal_stats(options, rng):
+    import numpy as np
+    from zonal_stats import ZoneIndex, zonal_stats
+
+    side = options['side']
+    _write('ndvi.tif', rng.uniform(-1, 1, (side, side)).astype(np.float32), 'float32', float('nan'))
+    x0, pixel = -40.0, 30 / 111319.49
+    step = side * pixel / 8
+    features = [{'type': 'Feature', 'properties': {'name': f'z{i}_{j}'}, 'geometry': {'type': 'Polygon', 'coordinates': [[
+        [x0 + i * step, -8.0 - j * step], [x0 + (i + 1) * step, -8.0 - j * step],
+        [x0 + (i + 0.5) * step, -8.0 - (j + 1) * step], [x0 + i * step, -8.0 - j * step]]]}}
+        for i in range(8) for j in range(8)]
+    with open('zonas.geojson', 'w') as f:
+        json.dump({'type': 'FeatureCollection', 'features': features}, f)
+    build = _timed(ZoneIndex.build, 'zonas.geojson', 'ndvi.tif', cache_dir='zonas_cache')
+    index = ZoneIndex.build('zonas.geojson', 'ndvi.tif', cache_dir='zonas_cache')
+    return {'pixels': side * side, 'seconds': _timed(zonal_stats, index, 'ndvi.tif'), 'rasterize_seconds': build}
+
+
+def stage_mosaic(options, rng):
+    import numpy as np
+    from mosaic import build_cog
+    from raster_io import RasterWriter, transform_from_grid
+
+    side, parts = options['side'], 4
+    tile = side // parts
+    pixel = 30 / 111319.49
+    for i in range(parts):
+        for j in range(parts):
+            with RasterWriter(f'bloco_{i}_{j}.tif', tile, tile, dtype='float32', nodata=float('nan'), block_size=256,
+                              transform=transform_from_grid(-40.0 + j * tile * pixel, -8.0 - i * tile * pixel,
+                                                            pixel)) as writer:
+                writer.write(rng.random((tile, tile)).astype(np.float32))
+    return {'pixels': side * side, 'seconds': _timed(build_cog, 'bloco_*.tif', 'mosaico.tif')}
+
+
+def stage_datacube(options, rng):
+    from datacube import Datacube
+
+    side = options['side'] // 4
+    paths = _ndvi_scenes(side, 24, rng)
+    pixel = 30 / 111319.49
+    cube = Datacube.create('cubo', [-40.0, -8.0 - side * pixel + 1e-9, -40.0 + side * pixel - 1e-9, -8.0])
+    seconds = _timed(cube.append, paths, 'landsat8')
+    return {'pixels': side * side, 'scenes': len(paths), 'seconds': seconds,
+            'compact_seconds': _timed(cube.compact)}
+
+
+def stage_point_samples(options, rng):
+    from datacube import Datacube
+    from point_samples import PointSet, sample_cube
+
+    stage_datacube(options, rng)
+    side, pixel, count = options['side'] // 4, 30 / 111319.49, 20000
+    points = PointSet([str(i) for i in range(count)], -40.0 + rng.random(count) * side * pixel,
+                      -8.0 - rng.random(count) * side * pixel)
+    cube = Datacube('cubo')
+    return {'points': count, 'seconds': _timed(sample_cube, points, cube)}
+
+
+STAGES = {
+    'ndvi': stage_ndvi,
+    'cloud_mask': stage_cloud_mask,
+    'composite': stage_composite,
+    'trend': stage_trend,
+    'fragmentation': stage_fragmentation,
+    'zonal_stats': stage_zonal_stats,
+    'mosaic': stage_mosaic,
+    'datacube': stage_datacube,
+    'point_samples': stage_point_samples,
+}
+
+
+# -------------------------------------------
+# Execução isolada e relatório
+# -------------------------------------------
+
+def _run_case(kind, name, options, queue):
+    workdir = tempfile.mkdtemp(prefix=f'bench_{name}_')
+    sys.path.insert(0, REPO_DIR)
+    os.chdir(workdir)
+    try:
+        if kind == 'workflow':
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                extra = WORKFLOWS[name](options)
+            import fake_ee
+
+            result = dict(extra, **{
+                'wall_seconds': time.perf_counter() - start,
+                'round_trips': dict(fake_ee.calls),
+                'total_round_trips': sum(fake_ee.calls.values()),
+                'operations': dict(fake_ee.operations),
+                'simulated_latency_seconds': fake_ee.simulated_latency(),
+                'tasks': len(fake_ee.TASKS),
+            })
+        else:
+            import numpy as np
+            import fake_ee
+
+            # tiling.py (usado pelo cubo e pela fragmentação) importa ee; o fake garante que nada vá à rede
+            fake_ee.install()
+            result = STAGES[name](options, np.random.default_rng(0))
+            units = result.get('pixels', result.get('points', 0))
+            result['per_second'] = units / max(result['seconds'], 1e-9)
+        result['peak_rss_mb'] = _peak_rss_mb()
+        queue.put(result)
+    except BaseException as error:
+        queue.put({'error': f'{type(error).__name__}: {error}'})
+    finally:
+        os.chdir(REPO_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run_isolated(kind, name, options, timeout=CASE_TIMEOUT):
+    """
+    Executa um caso em um processo novo (spawn) e devolve o resultado. Se o processo morrer sem
+    responder (ex.: OOM killer), sair com erro ou passar de `timeout` segundos, o caso é dado como falho.
+    """
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_run_case, args=(kind, name, options, queue))
+    process.start()
+    deadline = time.monotonic() + timeout
+    result = None
+    while result is None and time.monotonic() < deadline:
+        try:
+            result = queue.get(timeout=POLL_SECONDS)
+        except Empty:
+            if not process.is_alive():
+                # Pode ter saído logo depois de enviar o resultado; confere a fila uma última vez
+                try:
+                    result = queue.get(timeout=POLL_SECONDS)
+                except Empty:
+                    pass
+                break
+    timed_out = result is None and process.is_alive()
+    if timed_out:
+        process.terminate()
+    process.join()
+
+    if timed_out:
+        result = {'error': f'tempo esgotado ({timeout} s)'}
+    elif result is None:
+        result = {'error': f'processo encerrado sem resultado (código de saída {process.exitcode})'}
+    elif process.exitcode != 0 and 'error' not in result:
+        result['error'] = f'processo encerrado com código de saída {process.exitcode}'
+    return result
+
+
+def run_benchmarks(side=RASTER_SIDE, months=CATALOG_MONTHS, workflows=None, stages=None):
+    options = {'side': side, 'months': months}
+    report = {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(), 'machine': platform.machine(), 'cpus': os.cpu_count(),
+        'options': options, 'latency': LATENCY, 'workflows': {}, 'stages': {},
+    }
+    for name in workflows or WORKFLOWS:
+        result = report['workflows'][name] = run_isolated('workflow', name, options)
+        if 'error' in result:
+            print(f"{name}: erro - {result['error']}")
+            continue
+        print(f"{name}: {result['total_round_trips']} idas e voltas, {result['simulated_latency_seconds']:.0f} s de "
+              f"latência simulada, {result['tasks']} tarefas, {result['wall_seconds']:.1f} s reais, "
+              f"{result['peak_rss_mb']:.0f} MB")
+    for name in stages or STAGES:
+        result = report['stages'][name] = run_isolated('stage', name, options)
+        if 'error' in result:
+            print(f"{name}: erro - {result['error']}")
+            continue
+        unit = 'pontos/s' if 'points' in result else 'px/s'
+        print(f"{name}: {result['per_second'] / 1e6:.2f} M{unit} ({result['seconds']:.2f} s), "
+              f"{result['peak_rss_mb']:.0f} MB")
+    return report
+
+
+def compare_reports(baseline, current, tolerance=TOLERANCE):
+    """Lista as regressões do relatório atual em relação à base."""
+    regressions = []
+    for name, new in current.get('workflows', {}).items():
+        old = baseline.get('workflows', {}).get(name)
+        if not old or 'error' in old or 'error' in new:
+            continue
+        if new['total_round_trips'] > old['total_round_trips']:
+            regressions.append(f"{name}: idas e voltas {old['total_round_trips']} -> {new['total_round_trips']}")
+        if new['simulated_latency_seconds'] > old['simulated_latency_seconds'] * (1 + tolerance):
+            regressions.append(f"{name}: latência simulada {old['simulated_latency_seconds']:.0f} s -> "
+                               f"{new['simulated_latency_seconds']:.0f} s")
+    for name, new in current.get('stages', {}).items():
+        old = baseline.get('stages', {}).get(name)
+        if not old or 'error' in old or 'error' in new:
+            continue
+        if new['per_second'] < old['per_second'] * (1 - tolerance):
+            regressions.append(f"{name}: {old['per_second'] / 1e6:.2f} -> {new['per_second'] / 1e6:.2f} M/s")
+    for section in ('workflows', 'stages'):
+        for name, new in current.get(section, {}).items():
+            old = baseline.get(section, {}).get(name)
+            if old and 'peak_rss_mb' in old and new.get('peak_rss_mb', 0) > old['peak_rss_mb'] * (1 + tolerance):
+                regressions.append(f"{name}: pico de memória {old['peak_rss_mb']:.0f} -> {new['peak_rss_mb']:.0f} MB")
+    return regressions
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ('executar', 'comparar'):
+        print("Uso: python benchmark.py executar relatorio.json [lado dos rasters] [meses do catálogo]\n"
+              "     python benchmark.py comparar base.json novo.json")
+        return
+    if sys.argv[1] == 'executar':
+        side = int(sys.argv[3]) if len(sys.argv) > 3 else RASTER_SIDE
+        months = int(sys.argv[4]) if len(sys.argv) > 4 else CATALOG_MONTHS
+        report = run_benchmarks(side, months)
+        with open(sys.argv[2], 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Relatório gravado em {sys.argv[2]}")
+        return
+
+    with open(sys.argv[2]) as f:
+        baseline = json.load(f)
+    with open(sys.argv[3]) as f:
+        current = json.load(f)
+    regressions = compare_reports(baseline, current)
+    for regression in regressions:
+        print(f"Regressão: {regression}")
+    if not regressions:
+        print("Nenhuma regressão encontrada.")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+Linha de comando única do projeto, com subcomandos de início rápido.
+
+Cada subcomando importa apenas os módulos de que precisa, no momento em que
+roda (COMMAND_MODULES): o NDVI e a composição locais não carregam nem o ee,
+a exportação e o monitor não carregam o geemap, e só o `mapa` paga o custo
+dele. A sessão do Earth Engine vem de init.initialize(), que não repete a
+autenticação quando as credenciais já estão salvas.
+
+O subcomando `inicio` mede o tempo de importação de cada subcomando em um
+processo novo (tests/test_cli.py usa a mesma medição para garantir que só o
+`mapa` importa o geemap).
+
+Uso:
+    python cli.py exportar [--incremental] [--trace trace.jsonl]
+    python cli.py ndvi <landsat8|sentinel2> entrada.tif saida.tif [--processos N] [--quantizar int16]
+    python cli.py indices <landsat8|sentinel2> entrada.tif saida.tif [--indices NDVI,EVI] [--quantizar int16]
+    python cli.py composicao saida.tif 'cenas_*.tif' [--processos N]
+    python cli.py pipeline <landsat8|sentinel2> 'cenas/*.tif' [--zonas zonas.geojson] [--qa 3] [--quantizar int16]
+    python cli.py harmonicos resumo.tif 'cenas_*.tif' [--coeficientes coef.tif] [--harmonicos 2]
+    python cli.py monitor [id_tarefa ...]
+    python cli.py mapa LANDSAT/LC08/C02/T1_L2/LC08_217066_20170105 mapa.html [--nir SR_B5 --red SR_B4]
+    python cli.py inicio
+"""
+
+import argparse
+import glob
+import importlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Módulos importados por cada subcomando (só quando ele é executado)
+COMMAND_MODULES = {
+    'exportar': ('ee', 'init', 'export_all_images'),
+    'ndvi': ('local_ndvi',),
+    'indices': ('spectral_indices',),
+    'composicao': ('composite',),
+    'harmonicos': ('harmonics',),
+    'pipeline': ('pipeline',),
+    'monitor': ('ee', 'init', 'task_monitor'),
+    'mapa': ('ee', 'init', 'geemap'),
+}
+
+# Subcomandos que podem importar o geemap
+MAP_COMMANDS = ('mapa',)
+
+
+def load_modules(command):
+    """Importa os módulos de um subcomando e os devolve em um dicionário pelo nome."""
+    return {name: importlib.import_module(name) for name in COMMAND_MODULES[command]}
+
+
+def cmd_export(args):
+    modules = load_modules('exportar')
+    if args.trace:
+        import instrumentation
+
+        instrumentation.enable(args.trace)
+    modules['export_all_images'].main(incremental=args.incremental)
+
+
+def cmd_ndvi(args):
+    modules = load_modules('ndvi')
+    modules['local_ndvi'].compute_ndvi(args.entrada, args.saida, sensor=args.sensor, workers=args.processos,
+                                       apply_scale_factors=args.escala, quantize=args.quantizar)
+
+
+def cmd_indices(args):
+    modules = load_modules('indices')
+    modules['spectral_indices'].compute_indices(args.entrada, args.saida, args.sensor,
+                                                indices=args.indices.split(','), workers=args.processos,
+                                                quantize=args.quantizar)
+
+
+def cmd_composite(args):
+    modules = load_modules('composicao')
+    modules['composite'].build_composite(args.cenas, args.saida, workers=args.processos)
+
+
+def cmd_harmonics(args):
+    modules = load_modules('harmonicos')
+    modules['harmonics'].build_harmonics(args.cenas, args.saida, args.coeficientes, harmonics=args.harmonicos,
+                                         workers=args.processos)
+
+
+def cmd_pipeline(args):
+    modules = load_modules('pipeline')
+    scenes = sorted(glob.glob(args.cenas))
+    pipeline = modules['pipeline'].default_pipeline(scenes, args.sensor, zones=args.zonas, qa_band=args.qa,
+                                                    workers=args.processos, quantize=args.quantizar)
+    pipeline.run()
+
+
+def cmd_monitor(args):
+    modules = load_modules('monitor')
+    ee, task_monitor = modules['ee'], modules['task_monitor']
+    modules['init'].initialize()
+    tasks = args.tarefas
+    if not tasks:
+        # Sem ids, acompanha todas as tarefas ainda ativas do usuário
+        tasks = [status['id'] for status in ee.data.getTaskList() if status['state'] in ('READY', 'RUNNING')]
+    if not tasks:
+        print("Nenhuma tarefa ativa.")
+        return
+    monitor = task_monitor.TaskMonitor(
+        on_change=lambda status, previous: print(f"Tarefa {status['id']}: {status['state']}"))
+    statuses = monitor.wait(tasks)
+    failed = [status for status in statuses.values() if status['state'] != 'COMPLETED']
+    print(f"{len(statuses) - len(failed)} tarefa(s) concluída(s), {len(failed)} com falha ou cancelada(s).")
+
+
+def cmd_map(args):
+    modules = load_modules('mapa')
+    ee, geemap = modules['ee'], modules['geemap']
+    modules['init'].initialize()
+    image = ee.Image(args.imagem)
+    ndvi = image.normalizedDifference([args.nir, args.red]).rename('NDVI')
+    m = geemap.Map()
+    m.centerObject(image, zoom=8)
+    m.addLayer(ndvi, {'min': 0, 'max': 1, 'palette': ['blue', 'white', 'green']}, 'NDVI')
+    m.addLayerControl()
+    m.to_html(args.saida)
+    print(f"Mapa gravado em {args.saida}")
+
+
+_PROBE = (
+    "import sys, time, json\n"
+    "{setup}"
+    "start = time.perf_counter()\n"
+    "import cli\n"
+    "cli.load_modules({command!r})\n"
+    "print(json.dumps({{'seconds': time.perf_counter() - start, 'geemap': 'geemap' in sys.modules, "
+    "'ee': 'ee' in sys.modules, 'modules': len(sys.modules)}}))\n"
+)
+
+
+def startup_report(commands=None, fake_ee=False):
+    """
+    Mede, em um processo novo por subcomando, o tempo de importação e se o geemap foi carregado.
+    Com `fake_ee=True` o módulo ee é o fake_ee (sem o geemap mínimo dele), para medir sem a API instalada.
+    """
+    setup = "import fake_ee\nfake_ee.install(geemap=False)\n" if fake_ee else ""
+    report = {}
+    for command in commands or COMMAND_MODULES:
+        result = subprocess.run([sys.executable, '-c', _PROBE.format(command=command, setup=setup)],
+                                capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        if result.returncode:
+            report[command] = {'error': result.stderr.strip().splitlines()[-1]}
+        else:
+            report[command] = json.loads(result.stdout.strip().splitlines()[-1])
+    return report
+
+
+def cmd_startup(args):
+    for command, result in startup_report().items():
+        if 'error' in result:
+            print(f"{command:<12} erro: {result['error']}")
+            continue
+        print(f"{command:<12} {result['seconds'] * 1000:8.0f} ms  {result['modules']:5d} módulos  "
+              f"ee={'sim' if result['ee'] else 'não'}  geemap={'sim' if result['geemap'] else 'não'}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cli.py',
+                                     description="Ferramentas do projeto (Earth Engine e processamento local).")
+    commands = parser.add_subparsers(dest='comando', required=True)
+
+    export = commands.add_parser('exportar', help="exporta os blocos das cenas Landsat 8 / Sentinel-2 da Caatinga")
+    export.add_argument('--incremental', action='store_true',
+                        help="só as cenas novas ou reprocessadas desde a última execução (export_state.json)")
+    export.add_argument('--trace', help="grava o trace das chamadas ao Earth Engine neste arquivo")
+    export.set_defaults(handler=cmd_export)
+
+    ndvi = commands.add_parser('ndvi', help="NDVI local de um GeoTIFF exportado")
+    ndvi.add_argument('sensor', choices=('landsat8', 'sentinel2'))
+    ndvi.add_argument('entrada')
+    ndvi.add_argument('saida')
+    ndvi.add_argument('--processos', type=int, default=0)
+    ndvi.add_argument('--quantizar', choices=('int16', 'uint8'), help="grava no formato compacto (quantized.py)")
+    ndvi.add_argument('--escala', action='store_true', help="aplica a escala/offset da reflectância")
+    ndvi.set_defaults(handler=cmd_ndvi)
+
+    indices = commands.add_parser('indices', help="NDVI, EVI, SAVI, NBR e NDWI em uma passada pelas bandas")
+    indices.add_argument('sensor', choices=('landsat8', 'sentinel2'))
+    indices.add_argument('entrada')
+    indices.add_argument('saida')
+    indices.add_argument('--indices', default='NDVI,EVI,SAVI,NBR,NDWI')
+    indices.add_argument('--processos', type=int, default=0)
+    indices.add_argument('--quantizar', choices=('int16', 'uint8'), help="grava no formato compacto (quantized.py)")
+    indices.set_defaults(handler=cmd_indices)
+
+    composite = commands.add_parser('composicao', help="composição temporal (mediana, percentis...) das cenas")
+    composite.add_argument('saida')
+    composite.add_argument('cenas', help="padrão glob das cenas, ex.: 'ndvi/Landsat_*.tif'")
+    composite.add_argument('--processos', type=int, default=0)
+    composite.set_defaults(handler=cmd_composite)
+
+    harmonics = commands.add_parser('harmonicos', help="sazonalidade (harmônicos) e tendência residual por pixel")
+    harmonics.add_argument('saida')
+    harmonics.add_argument('cenas', help="padrão glob das cenas de NDVI, ex.: 'ndvi/Landsat_*.tif'")
+    harmonics.add_argument('--coeficientes', help="grava também os coeficientes quantizados (int16)")
+    harmonics.add_argument('--harmonicos', type=int, default=2)
+    harmonics.add_argument('--processos', type=int, default=0)
+    harmonics.set_defaults(handler=cmd_harmonics)
+
+    pipeline = commands.add_parser('pipeline', help="máscara, NDVI, composição, tendência e zonas com cache")
+    pipeline.add_argument('sensor', choices=('landsat8', 'sentinel2'))
+    pipeline.add_argument('cenas', help="padrão glob das cenas exportadas, ex.: 'cenas/*.tif'")
+    pipeline.add_argument('--zonas', help="GeoJSON das zonas para as estatísticas zonais")
+    pipeline.add_argument('--qa', type=int, help="banda de QA das cenas (aplica a máscara de nuvens)")
+    pipeline.add_argument('--processos', type=int, default=0)
+    pipeline.add_argument('--quantizar', choices=('int16', 'uint8'), help="grava no formato compacto (quantized.py)")
+    pipeline.set_defaults(handler=cmd_pipeline)
+
+    monitor = commands.add_parser('monitor', help="acompanha tarefas de exportação até terminarem")
+    monitor.add_argument('tarefas', nargs='*', help="ids das tarefas (padrão: todas as ativas)")
+    monitor.set_defaults(handler=cmd_monitor)
+
+    map_parser = commands.add_parser('mapa', help="mapa HTML do NDVI de uma imagem")
+    map_parser.add_argument('imagem')
+    map_parser.add_argument('saida')
+    map_parser.add_argument('--nir', default='SR_B5')
+    map_parser.add_argument('--red', default='SR_B4')
+    map_parser.set_defaults(handler=cmd_map)
+
+    startup = commands.add_parser('inicio', help="mede a importação de cada subcomando")
+    startup.set_defaults(handler=cmd_startup)
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    start = time.perf_counter()
+    args.handler(args)
+    if args.comando != 'inicio':
+        print(f"Concluído em {time.perf_counter() - start:.1f} s.")
+
+
+if __name__ == "__main__":
+    main()
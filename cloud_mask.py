@@ -0,0 +1,198 @@
+"""
+Máscara local de nuvens/qualidade sobre as bandas de QA exportadas
+(QA_PIXEL do Landsat 8, QA60 e SCL do Sentinel-2), equivalente ao
+mask_s2_clouds() do projeto-01.py/projeto-01b.py, mas processada em disco.
+
+Cada conjunto de regras de bits é convertido uma única vez em uma tabela de
+65536 entradas (uma por valor possível de uma banda de 16 bits) que diz se o
+pixel é limpo; a máscara de um bloco é então uma única indexação na tabela,
+sem testar bit a bit. A banda de QA é lida por memmap quando o arquivo não é
+comprimido, e a saída é gravada com 1 bit por pixel (1 = pixel limpo), 1/8 do
+tamanho de uma máscara uint8.
+
+Uso:
+    python cloud_mask.py landsat8 qa_pixel.tif mascara.tif [banda] [processos]
+"""
+
+import functools
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+from instrumentation import traced
+from raster_io import RasterWriter, grid_windows, map_windows, open_raster
+
+# Bloco padrão de processamento (múltiplo de 8, para o empacotamento de 1 bit)
+BLOCK_SIZE = 512
+
+# Tamanho da tabela de consulta (todos os valores de uma banda de 16 bits)
+LUT_SIZE = 1 << 16
+
+# Regras de cada banda de QA: (bit inicial, largura em bits, valores rejeitados).
+# Um inteiro isolado equivale a (bit, 1, (1,)), ou seja, "rejeita quando o bit está ligado".
+MASK_PRESETS = {
+    # QA_PIXEL (Collection 2): preenchimento, nuvem dilatada, cirrus, nuvem e sombra
+    'landsat8': {'band_name': 'QA_PIXEL', 'rules': (0, 1, 2, 3, 4), 'nodata': None},
+    # QA60: nuvens opacas (bit 10) e cirrus (bit 11), como o mask_s2_clouds()
+    'sentinel2': {'band_name': 'QA60', 'rules': (10, 11), 'nodata': None},
+    # SCL: sem dado, saturado, sombra, nuvem média/alta, cirrus e neve
+    'scl': {'band_name': 'SCL', 'rules': ((0, 8, (0, 1, 3, 8, 9, 10, 11)),), 'nodata': 0},
+}
+
+
+def normalize_rules(rules):
+    """Converte as regras em uma tupla de (bit, largura, valores rejeitados), utilizável como chave."""
+    normalized = []
+    for rule in rules:
+        if isinstance(rule, int):
+            rule = (rule, 1, (1,))
+        bit, width, rejected = rule
+        if bit < 0 or width < 1 or bit + width > 16:
+            raise ValueError(f"Regra de bits inválida: {rule}")
+        rejected = (rejected,) if isinstance(rejected, int) else rejected
+        normalized.append((int(bit), int(width), tuple(sorted(int(value) for value in rejected))))
+    return tuple(normalized)
+
+
+@functools.lru_cache(maxsize=None)
+def _cached_lut(rules, nodata):
+    values = np.arange(LUT_SIZE, dtype=np.uint32)
+    clear = np.ones(LUT_SIZE, dtype=bool)
+    for bit, width, rejected in rules:
+        field = (values >> bit) & ((1 << width) - 1)
+        clear &= ~np.isin(field, rejected)
+    if nodata is not None:
+        clear[nodata] = False
+    clear.setflags(write=False)
+    return clear
+
+
+def build_lut(rules, nodata=None):
+    """Tabela (65536 booleanos, somente leitura) com True nos valores de QA de pixels limpos."""
+    if nodata is not None and (isinstance(nodata, float) and math.isnan(nodata) or not 0 <= nodata < LUT_SIZE):
+        nodata = None
+    return _cached_lut(normalize_rules(rules), None if nodata is None else int(nodata))
+
+
+def mask_block(qa, lut, out=None):
+    """Máscara (True = limpo) de um bloco de QA por indexação direta na tabela."""
+    if out is None:
+        out = np.empty(qa.shape, dtype=bool)
+    if qa.dtype == np.uint8 or qa.dtype == np.uint16:
+        np.take(lut, qa, out=out, mode='clip')
+    elif qa.dtype.kind == 'i' and qa.dtype.itemsize <= 2:
+        np.take(lut, qa.astype(np.uint16, copy=False), out=out, mode='clip')
+    else:
+        # QA exportado como float/int32 (bandas de tipos diferentes no mesmo GeoTIFF)
+        invalid = ~np.isfinite(qa) if qa.dtype.kind == 'f' else (qa < 0) | (qa >= LUT_SIZE)
+        index = np.clip(np.nan_to_num(qa), 0, LUT_SIZE - 1).astype(np.uint16)
+        np.take(lut, index, out=out, mode='clip')
+        out[invalid] = False
+    return out
+
+
+class _QAReader:
+    """Lê a banda de QA de uma janela (por memmap quando possível) e aplica a tabela."""
+
+    def __init__(self, path, band, block_size):
+        self.raster = open_raster(path)
+        self.band = band
+        self.map = self.raster.memmap(band)
+        self.raw = np.empty((1, block_size, block_size), dtype=self.raster.dtype)
+        self.out = np.empty((block_size, block_size), dtype=bool)
+
+    def read(self, window):
+        if self.map is not None:
+            return self.map[window.row_off:window.row_off + window.height,
+                            window.col_off:window.col_off + window.width]
+        raw = self.raw[:, :window.height, :window.width]
+        return self.raster.read(bands=[self.band], window=window, out=raw)[0]
+
+    def mask(self, window, lut):
+        return mask_block(self.read(window), lut, out=self.out[:window.height, :window.width])
+
+    def close(self):
+        self.map = None
+        self.raster.close()
+
+
+# Estado de cada processo do pool (um leitor e uma tabela por processo)
+_worker = {}
+
+
+def _init_worker(path, band, block_size, rules, nodata):
+    _worker['reader'] = _QAReader(path, band, block_size)
+    _worker['lut'] = build_lut(rules, nodata)
+
+
+def _worker_mask(window):
+    return window, _worker['reader'].mask(window, _worker['lut']).copy()
+
+
+@traced('mascara_nuvens')
+def compute_mask(qa_path, dst_path, preset='landsat8', rules=None, band=1, nodata=None,
+                 block_size=BLOCK_SIZE, workers=0, compress='deflate'):
+    """
+    Gera a máscara de pixels limpos de uma banda de QA em `dst_path` (1 bit por pixel).
+
+    As regras vêm do `preset` (MASK_PRESETS) ou de `rules`, no mesmo formato. O
+    nodata do arquivo (ou o do preset) também é marcado como não limpo.
+    """
+    config = MASK_PRESETS.get(preset, {'rules': (), 'nodata': None})
+    rules = normalize_rules(config['rules'] if rules is None else rules)
+    if block_size % 8:
+        raise ValueError("O bloco deve ser múltiplo de 8 para a máscara de 1 bit.")
+
+    start = time.perf_counter()
+    reader = _QAReader(qa_path, band, block_size)
+    raster = reader.raster
+    if nodata is None:
+        nodata = raster.nodata if raster.nodata is not None else config['nodata']
+    lut = build_lut(rules, nodata)
+    windows = grid_windows(raster.width, raster.height, block_size)
+
+    writer = RasterWriter(dst_path, raster.width, raster.height, nbits=1, transform=raster.transform,
+                          epsg=raster.epsg, block_size=block_size, compress=compress,
+                          band_metadata=[{'description': f"mascara {config.get('band_name', 'QA')}"}])
+    clear = 0
+    try:
+        if workers and workers > 1:
+            reader.close()
+            initargs = (qa_path, band, block_size, rules, nodata)
+            for window, block in map_windows(_worker_mask, windows, workers, _init_worker, initargs):
+                clear += int(np.count_nonzero(block))
+                writer.write(block, window)
+        else:
+            for window in windows:
+                block = reader.mask(window, lut)
+                clear += int(np.count_nonzero(block))
+                writer.write(block, window)
+            reader.close()
+        writer.close()
+    except BaseException:
+        reader.close()
+        raise
+
+    seconds = time.perf_counter() - start
+    pixels = raster.width * raster.height
+    size = os.path.getsize(dst_path)
+    print(f"Máscara de {qa_path}: {pixels / 1e6:.1f} Mpx em {seconds:.1f} s "
+          f"({pixels / 1e6 / max(seconds, 1e-9):.1f} Mpx/s), {clear / max(pixels, 1) * 100:.1f}% limpos, "
+          f"{size / 1e6:.1f} MB")
+    return {'pixels': pixels, 'clear': clear, 'seconds': seconds, 'bytes': size}
+
+
+def main():
+    if len(sys.argv) < 4:
+        print(f"Uso: python cloud_mask.py <{'|'.join(MASK_PRESETS)}> qa.tif mascara.tif [banda] [processos]")
+        return
+    band = int(sys.argv[4]) if len(sys.argv) > 4 else 1
+    workers = int(sys.argv[5]) if len(sys.argv) > 5 else 0
+    compute_mask(sys.argv[2], sys.argv[3], preset=sys.argv[1], band=band, workers=workers)
+
+
+if __name__ == "__main__":
+    main()
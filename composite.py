@@ -0,0 +1,233 @@
+"""
+Composição temporal local (mediana, percentis, média e contagem por pixel)
+sobre uma pilha de cenas de NDVI gravadas em disco, equivalente ao
+ndvi_landsat.median() do projeto-01b.py, mas fora do Earth Engine.
+
+A pilha (tempo, linhas, colunas) nunca é carregada inteira: o raster é
+percorrido em blocos espaciais, cada bloco lê a mesma janela de todas as cenas
+e calcula as estatísticas com uma única ordenação ao longo do tempo. Pixels
+NaN (ou nodata) são ignorados. Os blocos podem ser processados em paralelo.
+
+Uso:
+    python composite.py saida.tif 'ndvi/Landsat_*.tif' [processos]
+"""
+
+import glob
+import math
+import sys
+import time
+import warnings
+
+import numpy as np
+
+from instrumentation import traced
+from raster_io import RasterWriter, grid_windows, map_windows, open_raster
+
+# Estatísticas padrão da composição (pNN = percentil NN)
+DEFAULT_STATS = ('median', 'p10', 'p90', 'mean', 'count')
+
+# Memória máxima da pilha de um bloco (tempo x linhas x colunas em float32)
+CHUNK_MEMORY = 256 * 2 ** 20
+
+
+def _percentile(stat):
+    if stat == 'median':
+        return 50.0
+    if stat.startswith('p') and stat[1:].replace('.', '', 1).isdigit():
+        return float(stat[1:])
+    return None
+
+
+def _lerp(low, high, fraction):
+    # Mesma interpolação linear do np.nanpercentile (estável nas duas metades, pesos
+    # calculados em float64 e aplicados no tipo da pilha)
+    diff = high - low
+    weight, complement = fraction.astype(low.dtype), (1 - fraction).astype(low.dtype)
+    return np.where(fraction >= 0.5, high - diff * complement, low + diff * weight)
+
+
+def composite_stack(stack, stats=DEFAULT_STATS, overwrite_input=False):
+    """
+    Estatísticas por pixel de uma pilha (tempo, linhas, colunas) com NaN; retorna (len(stats), linhas, colunas).
+    Com overwrite_input=True os percentis ordenam a própria pilha (reordenada no eixo do tempo), sem cópia.
+    """
+    valid = ~np.isnan(stack)
+    count = valid.sum(axis=0)
+    result = np.empty((len(stats),) + stack.shape[1:], dtype=np.float32)
+    empty = count == 0
+
+    if 'mean' in stats:
+        total = np.where(valid, stack, 0).sum(axis=0, dtype=np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result[stats.index('mean')] = total / count
+
+    percentiles = [(i, _percentile(stat)) for i, stat in enumerate(stats) if _percentile(stat) is not None]
+    if percentiles:
+        # Uma única ordenação serve para todos os percentis (NaN vai para o fim)
+        if overwrite_input:
+            stack.sort(axis=0)
+        else:
+            stack = np.sort(stack, axis=0)
+        last = np.maximum(count - 1, 0)
+        for i, q in percentiles:
+            # Índice virtual do método "linear" do NumPy: n*q + (1 - q) - 1
+            quantile = q / 100
+            position = count * quantile + (1 - quantile) - 1
+            low = np.clip(np.floor(position), 0, last).astype(np.intp)
+            high = np.minimum(low + 1, last)
+            low_values = np.take_along_axis(stack, low[np.newaxis], axis=0)[0]
+            high_values = np.take_along_axis(stack, high[np.newaxis], axis=0)[0]
+            fraction = position - low
+            if q == 50.0:
+                # Mediana: média dos dois valores centrais, como o np.nanmedian
+                result[i] = np.where(fraction > 0, (low_values + high_values) / 2, low_values)
+            else:
+                result[i] = _lerp(low_values, high_values, fraction)
+
+    for i, stat in enumerate(stats):
+        if stat == 'count':
+            result[i] = count
+        elif stat != 'mean' and _percentile(stat) is None:
+            raise ValueError(f"Estatística desconhecida: {stat}")
+        if stat != 'count':
+            result[i][empty] = np.nan
+    return result
+
+
+def reference_composite(paths, stats=DEFAULT_STATS):
+    """Composição em memória com as funções nan* do NumPy (para conferência em entradas pequenas)."""
+    layers = []
+    for path in paths:
+        with open_raster(path) as raster:
+            layers.append(_as_nan(raster))
+    stack = np.stack(layers).astype(np.float32)
+    result = []
+    with warnings.catch_warnings():
+        # Pixels sem nenhuma observação geram avisos de "All-NaN slice"
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for stat in stats:
+            if stat == 'count':
+                result.append((~np.isnan(stack)).sum(axis=0))
+            elif stat == 'mean':
+                result.append(np.nanmean(stack.astype(np.float64), axis=0))
+            elif stat == 'median':
+                result.append(np.nanmedian(stack, axis=0))
+            else:
+                result.append(np.nanpercentile(stack, _percentile(stat), axis=0))
+    return np.stack(result).astype(np.float32)
+
+
+def _as_nan(raster, window=None, out=None):
+    # float32 com NaN; produtos quantizados (int16/uint8) são desquantizados aqui
+    return raster.read_values(1, window, out=out)
+
+
+def chunk_size_for(scenes, memory=CHUNK_MEMORY, block=256):
+    """Maior lado de bloco (múltiplo de `block`) cuja pilha cabe no orçamento de memória."""
+    side = int(math.sqrt(memory / (4 * max(scenes, 1))))
+    return max(block, side // block * block)
+
+
+def stack_grid(paths):
+    """Grade comum das cenas (largura, altura, transformação, EPSG); falha se alguma divergir."""
+    with open_raster(paths[0]) as first:
+        grid = (first.width, first.height, first.transform, first.epsg)
+    for path in paths[1:]:
+        with open_raster(path) as raster:
+            if (raster.width, raster.height, raster.transform) != grid[:3]:
+                raise ValueError(f"A cena {path} não está na mesma grade das demais.")
+    return grid
+
+
+class StackReader:
+    """Mantém as cenas abertas e lê a mesma janela de todas elas em um buffer reutilizado."""
+
+    def __init__(self, paths, chunk):
+        self.rasters = [open_raster(path, cache_blocks=4) for path in paths]
+        self.buffer = np.empty((len(paths), chunk, chunk), dtype=np.float32)
+
+    def read(self, window):
+        stack = self.buffer[:, :window.height, :window.width]
+        for i, raster in enumerate(self.rasters):
+            _as_nan(raster, window, out=stack[i])
+        return stack
+
+    def close(self):
+        for raster in self.rasters:
+            raster.close()
+
+
+# Estado de cada processo do pool
+_worker = {}
+
+
+def _init_worker(paths, chunk, stats):
+    _worker['reader'] = StackReader(paths, chunk)
+    _worker['stats'] = stats
+
+
+def _worker_chunk(window):
+    return window, composite_stack(_worker['reader'].read(window), _worker['stats'], overwrite_input=True)
+
+
+@traced('composicao')
+def build_composite(paths, out_path, stats=DEFAULT_STATS, chunk=None, workers=0, compress='deflate'):
+    """Gera a composição das cenas (mesma grade) em um GeoTIFF com uma banda por estatística."""
+    if isinstance(paths, str):
+        paths = sorted(glob.glob(paths))
+    if not paths:
+        raise ValueError("Nenhuma cena encontrada para a composição.")
+    stats = tuple(stats)
+    width, height, transform, epsg = stack_grid(paths)
+
+    # O bloco precisa ser múltiplo do tile de saída (256) para ser gravado diretamente
+    chunk = math.ceil(chunk / 256) * 256 if chunk else chunk_size_for(len(paths))
+    windows = list(grid_windows(width, height, chunk))
+    print(f"Composição de {len(paths)} cenas ({width}x{height}) em {len(windows)} bloco(s) de {chunk} pixels.")
+
+    start = time.perf_counter()
+    writer = RasterWriter(out_path, width, height, count=len(stats), dtype='float32', transform=transform,
+                          epsg=epsg, nodata=float('nan'), block_size=256, compress=compress,
+                          band_metadata=[{'description': stat} for stat in stats])
+    if workers and workers > 1:
+        for window, block in map_windows(_worker_chunk, windows, workers, _init_worker, (paths, chunk, stats)):
+            writer.write(block, window)
+    else:
+        reader = StackReader(paths, chunk)
+        try:
+            for window in windows:
+                writer.write(composite_stack(reader.read(window), stats, overwrite_input=True), window)
+        finally:
+            reader.close()
+    writer.close()
+
+    seconds = time.perf_counter() - start
+    pixels = width * height
+    print(f"Composição concluída em {seconds:.1f} s ({pixels / max(seconds, 1e-9) / 1e6:.2f} Mpx/s, "
+          f"{pixels * len(paths) / max(seconds, 1e-9) / 1e6:.1f} M observações/s)")
+    return {'pixels': pixels, 'scenes': len(paths), 'seconds': seconds}
+
+
+def benchmark_composite(paths, out_path, stats=DEFAULT_STATS, workers=(0, 2, 4), chunk=None):
+    """Mede pixels/s da composição em blocos para diferentes números de processos."""
+    results = []
+    for count in workers:
+        report = build_composite(paths, out_path, stats=stats, chunk=chunk, workers=count)
+        report['workers'] = count
+        report['pixels_per_second'] = report['pixels'] / max(report['seconds'], 1e-9)
+        results.append(report)
+    for report in results:
+        print(f"processos={report['workers']}: {report['pixels_per_second'] / 1e6:.2f} Mpx/s")
+    return results
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("Uso: python composite.py saida.tif 'cenas_*.tif' [processos]")
+        return
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    build_composite(sys.argv[2], sys.argv[1], workers=workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,418 @@
+"""
+Cubo de dados local (tempo, y, x) com o NDVI do Landsat 8 e do Sentinel-2 na
+mesma grade, para séries temporais alinhadas pixel a pixel.
+
+Cada cena adicionada é reamostrada para a grade do cubo (média das células
+quando a cena é mais fina, como o Sentinel-2 a 10 m numa grade de 30 m;
+vizinho mais próximo nos demais casos) e gravada em blocos (tempo, y, x)
+comprimidos, com muitos instantes e poucos pixels por bloco. Ler a série de
+um pixel ou de uma janela pequena toca só os blocos daquela posição, em vez
+de abrir centenas de GeoTIFFs.
+
+Arquivos do cubo (um diretório):
+    cube.json        grade, tamanho dos blocos, geração atual e lista de cenas (data, sensor, origem)
+    chunks-<n>.idx   índice binário dos blocos (linha, coluna, t0, t1, posição, tamanho)
+    data-<n>.bin     blocos comprimidos
+
+Os blocos e o índice da geração atual só recebem acréscimos: adicionar cenas
+nunca reescreve blocos existentes, apenas grava novos blocos (t0, t1) para
+cada posição. compact() junta depois esses blocos em blocos de até
+`time_chunk` instantes numa nova geração, que só passa a valer quando o
+cube.json é trocado.
+
+Uso:
+    python datacube.py criar cubo/ xmin ymin xmax ymax [escala]
+    python datacube.py adicionar cubo/ <landsat8|sentinel2> 'ndvi_*.tif'
+    python datacube.py compactar cubo/
+    python datacube.py serie cubo/ lon lat
+"""
+
+import datetime
+import glob
+import json
+import math
+import os
+import sys
+import time
+import zlib
+
+import numpy as np
+
+from composite import _as_nan
+from instrumentation import traced
+from raster_io import Window, open_raster
+from tiling import TileGrid
+from trend import date_from_name
+
+# Lado padrão dos blocos, em pixels (pequeno, para que a série de um pixel leia pouco)
+CHUNK_SIZE = 64
+
+# Instantes por bloco depois da compactação
+TIME_CHUNK = 256
+
+# Escala padrão da grade comum (a do Landsat; o Sentinel-2 é agregado por média)
+DEFAULT_SCALE = 30
+
+# Registro do índice de blocos
+INDEX_DTYPE = np.dtype([('row', '<i4'), ('col', '<i4'), ('t0', '<i4'), ('t1', '<i4'),
+                        ('offset', '<i8'), ('size', '<i8')])
+
+# Acima desta razão entre o pixel do cubo e o da cena, a cena é agregada por média
+AVERAGE_FACTOR = 1.5
+
+# Memória máxima dos blocos de uma linha de blocos durante a adição de cenas (cenas do lote x colunas
+# cobertas) e máximo de rasters abertos ao mesmo tempo
+APPEND_MEMORY = 256 * 2 ** 20
+APPEND_FILES = 256
+
+
+def encode_chunk(block):
+    """Comprime um bloco float32 (tempo, y, x): bytes embaralhados por posição + deflate."""
+    raw = np.ascontiguousarray(block, dtype='<f4').view(np.uint8).reshape(-1, 4)
+    return zlib.compress(np.ascontiguousarray(raw.T).tobytes(), 6)
+
+
+def decode_chunk(data, shape):
+    raw = np.frombuffer(zlib.decompress(data), dtype=np.uint8).reshape(4, -1)
+    return np.ascontiguousarray(raw.T).view('<f4').reshape(shape)
+
+
+def resample_rows(raster, transform, row_start, row_end, width, col_start=0):
+    """
+    Linhas [row_start, row_end) e colunas [col_start, col_start + width) da grade do cubo amostradas
+    de uma cena (NaN fora dela).
+    """
+    cx0, cpx, _, cy0, _, cpy = transform
+    sx0, spx, sxr, sy0, syr, spy = raster.transform
+    if sxr or syr:
+        raise ValueError("Cenas rotacionadas não são suportadas.")
+    out = np.full((row_end - row_start, width), np.nan, dtype=np.float32)
+
+    # Janela da cena que cobre as linhas pedidas (com uma linha de folga)
+    top, bottom = cy0 + row_start * cpy, cy0 + row_end * cpy
+    src_row0 = max(0, math.floor((top - sy0) / spy) - 1)
+    src_row1 = min(raster.height, math.ceil((bottom - sy0) / spy) + 1)
+    if src_row0 >= src_row1:
+        return out
+    data = _as_nan(raster, Window(0, src_row0, raster.width, src_row1 - src_row0))
+
+    if abs(cpx) / abs(spx) >= AVERAGE_FACTOR:
+        # Cena mais fina: média das células da cena cujo centro cai em cada pixel do cubo
+        rows = np.floor((sy0 + (np.arange(src_row0, src_row1) + 0.5) * spy - cy0) / cpy).astype(np.int64) - row_start
+        cols = np.floor((sx0 + (np.arange(raster.width) + 0.5) * spx - cx0) / cpx).astype(np.int64) - col_start
+        valid = ~np.isnan(data)
+        valid &= ((rows >= 0) & (rows < out.shape[0]))[:, None]
+        valid &= ((cols >= 0) & (cols < width))[None, :]
+        index = (rows[:, None] * width + cols[None, :])[valid]
+        sums = np.bincount(index, weights=data[valid], minlength=out.size)
+        counts = np.bincount(index, minlength=out.size)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = (sums / counts).reshape(out.shape)
+        covered = counts.reshape(out.shape) > 0
+        out[covered] = mean[covered]
+    else:
+        # Cena de mesma resolução ou mais grossa: vizinho mais próximo
+        rows = np.floor((cy0 + (np.arange(row_start, row_end) + 0.5) * cpy - sy0) / spy).astype(np.int64) - src_row0
+        cols = np.floor((cx0 + (col_start + np.arange(width) + 0.5) * cpx - sx0) / spx).astype(np.int64)
+        row_ok = (rows >= 0) & (rows < data.shape[0])
+        col_ok = (cols >= 0) & (cols < raster.width)
+        if row_ok.any() and col_ok.any():
+            out[np.ix_(row_ok, col_ok)] = data[np.ix_(rows[row_ok], cols[col_ok])]
+    return out
+
+
+class Datacube:
+    """Cubo (tempo, y, x) em disco; abre um cubo existente criado por Datacube.create()."""
+
+    def __init__(self, root):
+        self.root = root
+        with open(os.path.join(root, 'cube.json')) as f:
+            self.meta = json.load(f)
+        self.width, self.height = self.meta['width'], self.meta['height']
+        self.transform = tuple(self.meta['transform'])
+        self.chunk = self.meta['chunk']
+        self.scenes = self.meta['scenes']
+        self._load_index()
+
+    @classmethod
+    def create(cls, root, bounds, scale=DEFAULT_SCALE, chunk=CHUNK_SIZE, time_chunk=TIME_CHUNK):
+        """Cria um cubo vazio sobre um retângulo (lon/lat), com a grade alinhada do TileGrid."""
+        grid = TileGrid(bounds, scale)
+        os.makedirs(root, exist_ok=True)
+        meta = {
+            'version': 1, 'width': grid.width, 'height': grid.height, 'epsg': 4326, 'scale': scale,
+            'transform': [grid.x0, grid.pixel, 0.0, grid.y0, 0.0, -grid.pixel],
+            'chunk': chunk, 'time_chunk': time_chunk, 'generation': 0, 'scenes': [],
+        }
+        for name in _generation_files(0):
+            open(os.path.join(root, name), 'wb').close()
+        _write_json(os.path.join(root, 'cube.json'), meta)
+        return cls(root)
+
+    # ---- índice ----
+
+    def _load_index(self):
+        path = os.path.join(self.root, _generation_files(self.meta.get('generation'))[1])
+        records = np.fromfile(path, dtype=INDEX_DTYPE)
+        # Registros de uma adição interrompida (cenas que não chegaram ao cube.json) são descartados,
+        # para que a próxima adição não reaproveite os mesmos instantes
+        valid = records['t1'] <= len(self.scenes)
+        if not valid.all():
+            records = records[valid]
+            records.tofile(path)
+        self.index = {}
+        for record in records[np.argsort(records['t0'], kind='stable')]:
+            self.index.setdefault((int(record['row']), int(record['col'])), []).append(record)
+
+    @property
+    def dates(self):
+        return [datetime.datetime.fromisoformat(scene['date']) for scene in self.scenes]
+
+    # ---- escrita ----
+
+    def _chunk_rows(self, raster):
+        """Faixa [início, fim) das linhas de blocos do cubo tocadas por uma cena."""
+        _, _, _, cy0, _, cpy = self.transform
+        sy0, spy = raster.transform[3], raster.transform[5]
+        top, bottom = sorted(((sy0 - cy0) / cpy, (sy0 + raster.height * spy - cy0) / cpy))
+        rows = math.ceil(self.height / self.chunk)
+        return max(0, math.floor(top) // self.chunk), min(rows, math.ceil(bottom) // self.chunk + 1)
+
+    def _chunk_cols(self, raster):
+        """Faixa [início, fim) das colunas de blocos do cubo tocadas por uma cena."""
+        cx0, cpx = self.transform[0], self.transform[1]
+        sx0, spx = raster.transform[0], raster.transform[1]
+        left, right = sorted(((sx0 - cx0) / cpx, (sx0 + raster.width * spx - cx0) / cpx))
+        cols = math.ceil(self.width / self.chunk)
+        return max(0, math.floor(left) // self.chunk), min(cols, math.ceil(right) // self.chunk + 1)
+
+    def _batches(self, spans):
+        """
+        Divide as cenas (em ordem) em lotes cujos blocos de uma linha de blocos cabem em APPEND_MEMORY
+        (cenas x colunas cobertas pelo lote) e com no máximo APPEND_FILES rasters abertos.
+        """
+        block_bytes = self.chunk * self.chunk * 4
+        batches, first = [], 0
+        for end in range(1, len(spans) + 1):
+            cols = spans[first:end]
+            width = max(span[1][1] for span in cols) - min(span[1][0] for span in cols)
+            if end - first > 1 and ((end - first) > APPEND_FILES
+                                    or (end - first) * max(width, 1) * block_bytes > APPEND_MEMORY):
+                batches.append((first, end - 1))
+                first = end - 1
+        batches.append((first, len(spans)))
+        return batches
+
+    def _append_batch(self, data, paths, spans, t0, records):
+        """Grava os blocos de um lote de cenas (instantes t0 .. t0 + len(paths)); acrescenta os registros."""
+        size, count = self.chunk, len(paths)
+        rasters = [open_raster(path, cache_blocks=16) for path in paths]
+        try:
+            for chunk_row in range(min(span[0][0] for span in spans), max(span[0][1] for span in spans)):
+                row_start, row_end = chunk_row * size, min(self.height, (chunk_row + 1) * size)
+                # Só os blocos das colunas cobertas por alguma cena, criados quando a primeira cena chega neles
+                blocks = {}
+                for i, (raster, (rows, cols)) in enumerate(zip(rasters, spans)):
+                    if not rows[0] <= chunk_row < rows[1] or cols[0] >= cols[1]:
+                        continue
+                    col_start, col_end = cols[0] * size, min(self.width, cols[1] * size)
+                    values = resample_rows(raster, self.transform, row_start, row_end, col_end - col_start,
+                                           col_start)
+                    for chunk_col in range(cols[0], cols[1]):
+                        part = values[:, (chunk_col - cols[0]) * size:(chunk_col - cols[0] + 1) * size]
+                        if np.isnan(part).all():
+                            continue
+                        if chunk_col not in blocks:
+                            blocks[chunk_col] = np.full((count, size, size), np.nan, dtype=np.float32)
+                        blocks[chunk_col][i, :part.shape[0], :part.shape[1]] = part
+                # Posições fora das cenas não aparecem em `blocks`: nada é gravado
+                for chunk_col in sorted(blocks):
+                    encoded = encode_chunk(blocks[chunk_col])
+                    records.append((chunk_row, chunk_col, t0, t0 + count, data.tell(), len(encoded)))
+                    data.write(encoded)
+        finally:
+            for raster in rasters:
+                raster.close()
+
+    @traced('cubo.append')
+    def append(self, paths, sensor, dates=None):
+        """
+        Adiciona cenas (GeoTIFFs de NDVI) ao fim do cubo, gravando só blocos novos. As cenas são
+        processadas em lotes (_batches) e cada cena só preenche os blocos das colunas que cobre, de
+        modo que a memória acompanha a área das cenas, e não a largura do cubo.
+        """
+        if isinstance(paths, str):
+            paths = sorted(glob.glob(paths))
+        if not paths:
+            return 0
+        dates = dates or [date_from_name(path) for path in paths]
+        start = time.perf_counter()
+        spans = []
+        for path in paths:
+            with open_raster(path) as raster:
+                spans.append((self._chunk_rows(raster), self._chunk_cols(raster)))
+        batches = self._batches(spans)
+        records = []
+        data_name, index_name = _generation_files(self.meta.get('generation'))
+        with open(os.path.join(self.root, data_name), 'ab') as data:
+            for first, end in batches:
+                self._append_batch(data, paths[first:end], spans[first:end], len(self.scenes) + first, records)
+            data.flush()
+            os.fsync(data.fileno())
+
+        # Ordem de gravação: blocos, índice e, por último, a lista de cenas
+        with open(os.path.join(self.root, index_name), 'ab') as index:
+            np.array(records, dtype=INDEX_DTYPE).tofile(index)
+            index.flush()
+            os.fsync(index.fileno())
+        self.scenes.extend({'date': date.isoformat(), 'sensor': sensor, 'source': os.path.basename(path)}
+                           for date, path in zip(dates, paths))
+        _write_json(os.path.join(self.root, 'cube.json'), self.meta)
+        self._load_index()
+        print(f"{len(paths)} cena(s) {sensor} adicionada(s) ao cubo em {len(batches)} lote(s): {len(records)} "
+              f"bloco(s) em {time.perf_counter() - start:.1f} s")
+        return len(records)
+
+    def compact(self, time_chunk=None):
+        """
+        Junta os blocos acumulados de cada posição em blocos de até `time_chunk` instantes. Os blocos
+        e o índice compactados são gravados como uma nova geração (data-<n>.bin, chunks-<n>.idx), que
+        passa a valer com a troca atômica do cube.json; só depois a geração anterior é apagada.
+        """
+        time_chunk = time_chunk or self.meta['time_chunk']
+        size, steps = self.chunk, len(self.scenes)
+        generation = self.meta.get('generation')
+        data_name, index_name = _generation_files(generation)
+        new_generation = (generation or 0) + 1
+        new_data, new_index = _generation_files(new_generation)
+        records = []
+        with open(os.path.join(self.root, data_name), 'rb') as source, \
+                open(os.path.join(self.root, new_data), 'wb') as target:
+            for (row, col), chunks in sorted(self.index.items()):
+                series = self._read_series(source, chunks, (steps, size, size))
+                for t0 in range(0, steps, time_chunk):
+                    t1 = min(steps, t0 + time_chunk)
+                    block = series[t0:t1]
+                    if np.isnan(block).all():
+                        continue
+                    encoded = encode_chunk(block)
+                    records.append((row, col, t0, t1, target.tell(), len(encoded)))
+                    target.write(encoded)
+            target.flush()
+            os.fsync(target.fileno())
+        with open(os.path.join(self.root, new_index), 'wb') as index:
+            np.array(records, dtype=INDEX_DTYPE).tofile(index)
+            index.flush()
+            os.fsync(index.fileno())
+
+        # A troca do cube.json é o ponto de virada: antes dela vale a geração anterior, depois a nova
+        meta = dict(self.meta, generation=new_generation)
+        _write_json(os.path.join(self.root, 'cube.json'), meta)
+        self.meta = meta
+        for name in (data_name, index_name):
+            os.remove(os.path.join(self.root, name))
+        before = sum(len(chunks) for chunks in self.index.values())
+        self._load_index()
+        print(f"Cubo compactado: {before} -> {len(records)} bloco(s), "
+              f"{os.path.getsize(os.path.join(self.root, new_data)) / 1e6:.1f} MB")
+
+    # ---- leitura ----
+
+    @staticmethod
+    def _read_series(data, chunks, shape):
+        series = np.full(shape, np.nan, dtype=np.float32)
+        for record in chunks:
+            data.seek(int(record['offset']))
+            t0, t1 = int(record['t0']), int(record['t1'])
+            series[t0:t1] = decode_chunk(data.read(int(record['size'])), (t1 - t0,) + shape[1:])
+        return series
+
+    def read_chunks(self, keys):
+        """Decodifica cada bloco (linha, coluna) pedido uma única vez; gera (chave, série (tempo, y, x))."""
+        shape = (len(self.scenes), self.chunk, self.chunk)
+        with open(os.path.join(self.root, _generation_files(self.meta.get('generation'))[0]), 'rb') as data:
+            for key in keys:
+                chunks = self.index.get(key)
+                if chunks:
+                    yield key, self._read_series(data, chunks, shape)
+
+    def time_order(self, sensors=None, sort=True):
+        """Índices dos instantes (filtrados por sensor, em ordem de data) e as datas correspondentes."""
+        order = np.arange(len(self.scenes))
+        if sensors:
+            order = np.array([i for i in order if self.scenes[i]['sensor'] in sensors], dtype=np.int64)
+        if sort:
+            dates = [self.scenes[i]['date'] for i in order]
+            order = order[np.argsort(dates, kind='stable')]
+        return order, [datetime.datetime.fromisoformat(self.scenes[i]['date']) for i in order]
+
+    def read(self, window=None, sensors=None, sort=True):
+        """Série (datas, valores (tempo, linhas, colunas)) de uma janela do cubo."""
+        window = window or Window(0, 0, self.width, self.height)
+        size = self.chunk
+        out = np.full((len(self.scenes), window.height, window.width), np.nan, dtype=np.float32)
+        row_end, col_end = window.row_off + window.height, window.col_off + window.width
+        keys = [(row, col) for row in range(window.row_off // size, (row_end - 1) // size + 1)
+                for col in range(window.col_off // size, (col_end - 1) // size + 1)]
+        for (row, col), series in self.read_chunks(keys):
+            ys, ye = max(window.row_off, row * size), min(row_end, (row + 1) * size)
+            xs, xe = max(window.col_off, col * size), min(col_end, (col + 1) * size)
+            out[:, ys - window.row_off:ye - window.row_off, xs - window.col_off:xe - window.col_off] = \
+                series[:, ys - row * size:ye - row * size, xs - col * size:xe - col * size]
+        order, dates = self.time_order(sensors, sort)
+        return dates, out[order]
+
+    def pixel(self, lon, lat):
+        """Linha e coluna do cubo que contêm a coordenada."""
+        x0, px, _, y0, _, py = self.transform
+        row, col = int((lat - y0) // py), int((lon - x0) // px)
+        if not (0 <= row < self.height and 0 <= col < self.width):
+            raise ValueError(f"A coordenada ({lon}, {lat}) está fora do cubo.")
+        return row, col
+
+    def series(self, lon, lat, sensors=None):
+        """Série temporal (datas, valores) do pixel que contém a coordenada."""
+        row, col = self.pixel(lon, lat)
+        dates, values = self.read(Window(col, row, 1, 1), sensors=sensors)
+        return dates, values[:, 0, 0]
+
+
+def _generation_files(generation):
+    """Nomes dos blocos e do índice de uma geração (cubos sem geração usam os nomes antigos)."""
+    if generation is None:
+        return 'data.bin', 'chunks.idx'
+    return f'data-{generation}.bin', f'chunks-{generation}.idx'
+
+
+def _write_json(path, value):
+    # Gravação atômica (arquivo temporário + troca), para não corromper o cubo numa falha
+    with open(path + '.tmp', 'w') as f:
+        json.dump(value, f)
+    os.replace(path + '.tmp', path)
+
+
+def main():
+    commands = ('criar', 'adicionar', 'compactar', 'serie')
+    if len(sys.argv) < 3 or sys.argv[1] not in commands:
+        print("Uso: python datacube.py criar cubo/ xmin ymin xmax ymax [escala]\n"
+              "     python datacube.py adicionar cubo/ <landsat8|sentinel2> 'ndvi_*.tif'\n"
+              "     python datacube.py compactar cubo/\n"
+              "     python datacube.py serie cubo/ lon lat")
+        return
+    command, root = sys.argv[1], sys.argv[2]
+    if command == 'criar':
+        bounds = [float(value) for value in sys.argv[3:7]]
+        scale = float(sys.argv[7]) if len(sys.argv) > 7 else DEFAULT_SCALE
+        Datacube.create(root, bounds, scale)
+    elif command == 'adicionar':
+        Datacube(root).append(sys.argv[4], sys.argv[3])
+    elif command == 'compactar':
+        Datacube(root).compact()
+    else:
+        dates, values = Datacube(root).series(float(sys.argv[3]), float(sys.argv[4]))
+        for date, value in zip(dates, values):
+            print(f"{date:%Y-%m-%d} {value:.4f}")
+
+
+if __name__ == "__main__":
+    main()
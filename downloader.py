@@ -0,0 +1,255 @@
+"""
+Download paralelo e retomável dos arquivos gerados pelo Earth Engine (links de
+getDownloadURL ou exportações publicadas no Cloud Storage).
+
+Os arquivos são baixados em um pool limitado de threads, cada uma com a sua
+requests.Session (conexões reaproveitadas entre os arquivos), e gravados em
+blocos direto no disco em `<nome>.part`. Uma falha (erro 5xx/429, conexão
+cortada, tempo esgotado) leva a uma nova tentativa com espera exponencial, que
+continua do ponto em que parou por meio do cabeçalho HTTP Range. No fim, o
+tamanho é conferido com o informado pelo servidor (e o hash, quando
+conhecido) antes de o arquivo receber o nome final.
+
+Uso:
+    results = download_files([url1, (url2, 'cena.zip')], 'downloads', workers=4)
+    python downloader.py downloads/ url1 url2 ...
+"""
+
+import base64
+import concurrent.futures
+import hashlib
+import os
+import re
+import sys
+import threading
+import time
+from dataclasses import dataclass
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from instrumentation import traced
+
+# Tamanho dos blocos gravados no disco
+CHUNK_SIZE = 1024 * 1024
+
+# Número de tentativas e espera inicial/máxima entre elas (segundos)
+RETRIES = 5
+BACKOFF = 1.0
+MAX_BACKOFF = 30.0
+
+# Tempo máximo de conexão e de leitura (segundos)
+TIMEOUT = (10, 60)
+
+# Respostas que justificam uma nova tentativa
+RETRY_STATUS = (408, 429, 500, 502, 503, 504)
+
+_CONTENT_RANGE = re.compile(r'bytes (\d+)-(\d+)/(\d+|\*)')
+
+
+class DownloadError(Exception):
+    pass
+
+
+@dataclass
+class Download:
+    """Um arquivo a baixar: URL, destino e, opcionalmente, tamanho e SHA-256 esperados."""
+    url: str
+    path: str
+    size: int = None
+    sha256: str = None
+
+
+def _storage_url(url):
+    # gs://bucket/objeto -> URL pública do Cloud Storage
+    if url.startswith('gs://'):
+        return 'https://storage.googleapis.com/' + url[len('gs://'):]
+    return url
+
+
+def _file_name(url):
+    name = os.path.basename(url.split('?')[0].rstrip('/'))
+    return name or hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+
+
+def _file_digest(path, algorithm):
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest
+
+
+def _goog_md5(headers):
+    # Cloud Storage informa o MD5 do objeto em x-goog-hash: md5=<base64>
+    for part in headers.get('x-goog-hash', '').split(','):
+        name, _, value = part.strip().partition('=')
+        if name == 'md5':
+            return base64.b64decode(value).hex()
+    return None
+
+
+class Downloader:
+    """Pool de downloads com sessões persistentes, novas tentativas e retomada por Range."""
+
+    def __init__(self, dest_dir, workers=4, retries=RETRIES, backoff=BACKOFF, max_backoff=MAX_BACKOFF,
+                 chunk_size=CHUNK_SIZE, timeout=TIMEOUT, sleep=None):
+        self.dest_dir = dest_dir
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.sleep = sleep or time.sleep
+        self._local = threading.local()
+        self._sessions = []
+        self._lock = threading.Lock()
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._local.session = session
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def _wait(self, attempt, response=None):
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+        if response is not None and response.headers.get('Retry-After', '').isdigit():
+            delay = min(self.max_backoff, float(response.headers['Retry-After']))
+        self.sleep(delay)
+
+    def _verify(self, item, part, expected_size, md5):
+        size = os.path.getsize(part)
+        if expected_size is not None and size != expected_size:
+            raise DownloadError(f"{item.url}: tamanho {size} bytes, esperado {expected_size}")
+        if item.sha256 and _file_digest(part, 'sha256').hexdigest() != item.sha256.lower():
+            raise DownloadError(f"{item.url}: SHA-256 não confere")
+        if md5 and _file_digest(part, 'md5').hexdigest() != md5:
+            raise DownloadError(f"{item.url}: MD5 não confere")
+
+    @traced('download')
+    def fetch(self, item):
+        """Baixa um arquivo (retomando um .part existente); retorna um resumo do download."""
+        start = time.perf_counter()
+        if os.path.exists(item.path) and (item.size is None or os.path.getsize(item.path) == item.size):
+            return {'url': item.url, 'path': item.path, 'bytes': 0, 'attempts': 0, 'status': 'existente',
+                    'seconds': 0.0}
+        part = item.path + '.part'
+        received, attempts = 0, 0
+        session = self._session()
+        while True:
+            attempts += 1
+            offset = os.path.getsize(part) if os.path.exists(part) else 0
+            headers = {'Range': f'bytes={offset}-'} if offset else {}
+            response = None
+            try:
+                response = session.get(item.url, headers=headers, stream=True, timeout=self.timeout)
+                if response.status_code == 416 and offset:
+                    # O .part já tem o arquivo inteiro (ou é maior que ele)
+                    total = response.headers.get('Content-Range', '').rpartition('/')[2]
+                    if total.isdigit() and int(total) == offset:
+                        expected_size = item.size if item.size is not None else offset
+                        md5 = None
+                        break
+                    os.remove(part)
+                    continue
+                if response.status_code in RETRY_STATUS:
+                    raise DownloadError(f"{item.url}: HTTP {response.status_code}")
+                response.raise_for_status()
+
+                md5 = _goog_md5(response.headers)
+                if response.status_code == 206:
+                    match = _CONTENT_RANGE.match(response.headers.get('Content-Range', ''))
+                    if not match or int(match.group(1)) != offset:
+                        raise DownloadError(f"{item.url}: Content-Range inesperado")
+                    expected_size = None if match.group(3) == '*' else int(match.group(3))
+                    mode = 'ab'
+                else:
+                    # Servidor sem suporte a Range (ou primeira tentativa): recomeça do zero, e os bytes das
+                    # tentativas anteriores deixam de contar
+                    length = response.headers.get('Content-Length')
+                    expected_size = int(length) if length is not None else None
+                    offset, mode, received = 0, 'wb', 0
+                expected_size = item.size if item.size is not None else expected_size
+
+                with open(part, mode) as f:
+                    for block in response.iter_content(self.chunk_size):
+                        f.write(block)
+                        received += len(block)
+                if expected_size is not None and os.path.getsize(part) < expected_size:
+                    raise DownloadError(f"{item.url}: conexão encerrada antes do fim")
+                break
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError,
+                    DownloadError) as error:
+                if attempts > self.retries:
+                    raise DownloadError(f"{item.url}: falhou após {attempts} tentativa(s): {error}") from error
+                self._wait(attempts - 1, response)
+            finally:
+                if response is not None:
+                    response.close()
+
+        try:
+            self._verify(item, part, expected_size, md5)
+        except DownloadError:
+            # Um .part corrompido não deve ser retomado na próxima execução
+            os.remove(part)
+            raise
+        os.replace(part, item.path)
+        return {'url': item.url, 'path': item.path, 'bytes': received, 'attempts': attempts, 'status': 'baixado',
+                'seconds': time.perf_counter() - start}
+
+    def run(self, items):
+        """Baixa todos os itens no pool; mostra e retorna os resumos (inclusive as falhas)."""
+        os.makedirs(self.dest_dir, exist_ok=True)
+        start = time.perf_counter()
+        results = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self.fetch, item): item for item in items}
+            for future in concurrent.futures.as_completed(futures):
+                item = futures[future]
+                try:
+                    result = future.result()
+                except Exception as error:
+                    result = {'url': item.url, 'path': item.path, 'bytes': 0, 'status': 'falhou', 'error': str(error)}
+                    print(f"Falha no download de {item.url}: {error}")
+                results.append(result)
+        for session in self._sessions:
+            session.close()
+        self._sessions.clear()
+
+        seconds = time.perf_counter() - start
+        total = sum(result['bytes'] for result in results)
+        failed = sum(1 for result in results if result['status'] == 'falhou')
+        print(f"Downloads: {len(results) - failed} de {len(results)} arquivo(s), {total / 1e6:.1f} MB em "
+              f"{seconds:.1f} s ({total / 1e6 / max(seconds, 1e-9):.1f} MB/s)")
+        return results
+
+
+def download_files(entries, dest_dir, workers=4, **kwargs):
+    """Baixa URLs (ou pares (URL, nome do arquivo), ou objetos Download) para `dest_dir`."""
+    items = []
+    for entry in entries:
+        if isinstance(entry, Download):
+            items.append(entry)
+            continue
+        url, name = (entry, None) if isinstance(entry, str) else entry
+        url = _storage_url(url)
+        items.append(Download(url, os.path.join(dest_dir, name or _file_name(url))))
+    return Downloader(dest_dir, workers=workers, **kwargs).run(items)
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("Uso: python downloader.py pasta_destino/ url1 [url2 ...]")
+        return
+    download_files(sys.argv[2:], sys.argv[1])
+
+
+if __name__ == "__main__":
+    main()
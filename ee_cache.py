@@ -0,0 +1,179 @@
+"""
+Cache persistente dos resultados de getInfo().
+
+Cada resultado é indexado pelo hash do grafo de expressões serializado do
+objeto (obj.serialize()), de modo que a mesma consulta, montada de novo em
+outra execução ou em outra volta de um laço, não gera uma nova ida e volta ao
+servidor. Há dois níveis: um LRU em memória e um arquivo SQLite em disco com
+tempo de validade (TTL) por entrada.
+
+Uso:
+    from ee_cache import get_info
+    area = get_info(caatinga.geometry().area())            # 1ª vez vai ao servidor
+    area = get_info(caatinga.geometry().area())            # depois vem do cache
+
+    cache = GetInfoCache()
+    caatinga = cache.wrap(ee.FeatureCollection(CAATINGA_ASSET))
+    bounds = caatinga.geometry().bounds().getInfo()        # getInfo com cache
+
+O local do arquivo pode ser alterado com a variável de ambiente EE_CACHE_PATH
+(EE_CACHE_PATH=off desliga o nível em disco).
+"""
+
+import collections
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Arquivo padrão do cache em disco
+CACHE_PATH = os.environ.get('EE_CACHE_PATH', '.ee_cache.sqlite')
+
+# Validade padrão das entradas (segundos)
+DEFAULT_TTL = 7 * 24 * 3600
+
+
+def expression_key(obj, namespace=''):
+    """Chave do cache: SHA-256 do grafo de expressões serializado."""
+    serialized = obj.serialize() if hasattr(obj, 'serialize') else json.dumps(obj, sort_keys=True, default=str)
+    return hashlib.sha256(f'{namespace}\n{serialized}'.encode('utf-8')).hexdigest()
+
+
+class GetInfoCache:
+    """Cache de getInfo() com LRU em memória e armazenamento em disco com TTL."""
+
+    def __init__(self, path=CACHE_PATH, max_items=256, ttl=DEFAULT_TTL, namespace='', clock=None):
+        self.path = None if path in (None, 'off') else path
+        self.max_items = max_items
+        self.ttl = ttl
+        self.namespace = namespace
+        self.clock = clock or time.time
+        self.memory = collections.OrderedDict()
+        self.stats = collections.Counter()
+        self._lock = threading.Lock()
+        self._db = None
+        if self.path:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT, expires REAL)')
+            self._db.commit()
+
+    def _remember(self, key, value, expires):
+        self.memory[key] = (value, expires)
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.max_items:
+            self.memory.popitem(last=False)
+
+    def _lookup(self, key):
+        now = self.clock()
+        entry = self.memory.get(key)
+        if entry is not None:
+            if entry[1] > now:
+                self.memory.move_to_end(key)
+                self.stats['memory'] += 1
+                return True, entry[0]
+            del self.memory[key]
+        if self._db is not None:
+            row = self._db.execute('SELECT value, expires FROM results WHERE key = ?', (key,)).fetchone()
+            if row is not None and row[1] > now:
+                value = json.loads(row[0])
+                self._remember(key, value, row[1])
+                self.stats['disk'] += 1
+                return True, value
+        return False, None
+
+    def get_info(self, obj, ttl=None, refresh=False):
+        """Resultado de obj.getInfo(), consultando o servidor só quando não há entrada válida."""
+        key = expression_key(obj, self.namespace)
+        with self._lock:
+            if not refresh:
+                found, value = self._lookup(key)
+                if found:
+                    return value
+
+        value = obj.getInfo()
+        self.stats['miss'] += 1
+        expires = self.clock() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._remember(key, value, expires)
+            if self._db is not None:
+                self._db.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?)', (key, json.dumps(value), expires))
+                self._db.commit()
+        return value
+
+    def invalidate(self, obj=None):
+        """Remove a entrada de um objeto (ou todas, sem argumento)."""
+        with self._lock:
+            if obj is None:
+                self.memory.clear()
+                if self._db is not None:
+                    self._db.execute('DELETE FROM results')
+            else:
+                key = expression_key(obj, self.namespace)
+                self.memory.pop(key, None)
+                if self._db is not None:
+                    self._db.execute('DELETE FROM results WHERE key = ?', (key,))
+            if self._db is not None:
+                self._db.commit()
+
+    def purge_expired(self):
+        """Apaga do disco as entradas vencidas."""
+        if self._db is not None:
+            with self._lock:
+                self._db.execute('DELETE FROM results WHERE expires <= ?', (self.clock(),))
+                self._db.commit()
+
+    def wrap(self, obj, ttl=None):
+        """Envolve um objeto ee: getInfo() passa pelo cache, inclusive nos objetos derivados."""
+        return CachedObject(obj, self, ttl)
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+class CachedObject:
+    """Proxy de um objeto ee cujo getInfo() (e o dos objetos derivados dele) usa o cache."""
+
+    def __init__(self, obj, cache, ttl=None):
+        self._obj = obj
+        self._cache = cache
+        self._ttl = ttl
+
+    def getInfo(self):
+        return self._cache.get_info(self._obj, self._ttl)
+
+    def unwrap(self):
+        return self._obj
+
+    def __getattr__(self, name):
+        attribute = getattr(self._obj, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            args = [arg.unwrap() if isinstance(arg, CachedObject) else arg for arg in args]
+            kwargs = {k: v.unwrap() if isinstance(v, CachedObject) else v for k, v in kwargs.items()}
+            result = attribute(*args, **kwargs)
+            return CachedObject(result, self._cache, self._ttl) if hasattr(result, 'getInfo') else result
+        return call
+
+
+_default_cache = None
+
+
+def default_cache():
+    """Cache compartilhado pelos scripts (criado na primeira utilização)."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = GetInfoCache()
+    return _default_cache
+
+
+def get_info(obj, ttl=None, refresh=False):
+    """Atalho para default_cache().get_info(obj)."""
+    if isinstance(obj, CachedObject):
+        obj = obj.unwrap()
+    return default_cache().get_info(obj, ttl=ttl, refresh=refresh)
@@ -1,41 +1,49 @@
 import ee
-import geemap
-import time
-import math
 import datetime
+import functools
+import sys
+
+import instrumentation
+from ee_cache import get_info
+from init import initialize
+from export_scheduler import ExportScheduler
+from task_monitor import TaskMonitor
+from scene_manifest import SENSORS, build_scene_manifest, scene_image
+from scene_selection import select_scenes, selection_report
+from temporal_bins import bin_scenes
+from tiling import TileGrid, bbox_of, intersecting_tiles, tiles_for_bbox
 
 # Função para exportar uma única imagem para o Google Drive
-def export_image(image, description, folder, region, scale):
+# (parâmetros extras, como crs/crsTransform/dimensions de um bloco, são repassados ao Export)
+def export_image(image, description, folder, region=None, scale=None, **params):
     task = ee.batch.Export.image.toDrive(
         image=image,
         description=description,
         folder=folder,
         region=region,
         scale=scale,
-        fileFormat='GeoTIFF'
+        fileFormat='GeoTIFF',
+        **params
     )
     task.start()
     return task
 
-# Função para calcular a escala com base na área (Redução para 500 Kp)
-def calculate_scale(area_m2, max_pixels=5e6):
-    return math.sqrt(area_m2 / max_pixels)
-
 def monitor_tasks(tasks):
-    """Verifica o status das tarefas até que sejam concluídas."""
-    while any([task.active() for task in tasks]):
-        print("Aguardando conclusão das tarefas...")
-        time.sleep(30)  # Verifica o status a cada 30 segundos
-        for task in tasks:
-            status = task.status()
-            print(f"Tarefa {task.id}: {status['state']}")
+    """Verifica o status das tarefas (uma consulta em lote por ciclo) até que sejam concluídas."""
+    monitor = TaskMonitor(on_change=lambda status, previous: print(f"Tarefa {status['id']}: {status['state']}"))
+    monitor.wait(tasks)
     print("Todas as tarefas foram concluídas!")
 
-def main():
+def main(incremental=False):
+    # EE_TRACE=trace.jsonl liga a medição das chamadas ao servidor e das etapas
+    instrumentation.enable_from_env()
     try:
         # Define o período de tempo (inicio e fim)
         DATE_START = datetime.datetime(2017, 1, 1)
         DATE_END = datetime.datetime(2024, 1, 1)
+        if incremental:
+            # A série cresce a cada execução: vai até o início do mês corrente
+            DATE_END = datetime.datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
 
         # Ponto central da Caatinga
         CENTRAL_POINTS = [-39.5, -8.5]
@@ -43,108 +51,111 @@ def main():
         # Porcentagem máxima de cobertura de nuvens
         CLOUDY_PIXEL_PERCENTAGE = 20
 
-        # Inicializa o GEE
-        ee.Authenticate()
-        ee.Initialize(project='analise-satelite-projeto-01')
+        # Período de agrupamento das cenas ('month', 'year', 'week' ou '16d', o ciclo do Landsat)
+        TIME_WINDOW = 'month'
 
-        # Definir uma área de interesse (Caatinga)
-        caatinga = ee.FeatureCollection('projects/ee-maxwellamaral-proj01/assets/MAPBIOMAS/caatinga')
+        # Melhores cenas exportadas por período e por posição WRS/MGRS (None exporta todas)
+        SCENES_PER_BIN = 2
 
-        # Calcula a área da região de interesse em metros quadrados
-        area_m2 = caatinga.geometry().area().getInfo()
+        # Número máximo de tarefas de exportação simultâneas no servidor
+        MAX_IN_FLIGHT = 10
 
-        # Gerar o timestamp para nomeação dos arquivos
-        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        # Diário das exportações (permite retomar após uma falha)
+        JOURNAL_PATH = 'export_journal.json'
 
-        # Calcula a escala com base no limite de pixels
-        scale = calculate_scale(area_m2)
-        print(f"Área da região: {area_m2} metros quadrados. Escala calculada: {scale} metros.")
+        # Estado das execuções incrementais (cenas já exportadas e suas versões)
+        STATE_PATH = 'export_state.json'
+
+        # Inicializa o GEE (sem repetir a autenticação se as credenciais já estão salvas)
+        initialize()
+
+        # Definir uma área de interesse (Caatinga)
+        caatinga = ee.FeatureCollection('projects/ee-maxwellamaral-proj01/assets/MAPBIOMAS/caatinga')
 
         # Pasta no Google Drive
         folder_drive = 'analise-satelite-projeto-01'
 
-        # Lista de tarefas para monitoramento
-        tasks = []
+        # Retângulo envolvente do bioma (calculado uma única vez)
+        bounds = bbox_of(get_info(caatinga.geometry().bounds())['coordinates'])
 
-        # -------------------------------------------
-        # Landsat 8 - Exportação de 2 imagens por mês
-        # -------------------------------------------
-        
-        current_date = DATE_START
-
-        while current_date < DATE_END:
-            start_date = current_date.strftime('%Y-%m-%d')
-            next_month = (current_date + datetime.timedelta(days=31)).replace(day=1)
-            end_date = next_month.strftime('%Y-%m-%d')
-
-            # Filtra as imagens Landsat 8 por mês
-            datasetLangSat = ee.ImageCollection('LANDSAT/LC08/C02/T1_L2') \
-                .filterDate(start_date, end_date) \
-                .filterBounds(caatinga) \
-                .filter(ee.Filter.lt('CLOUD_COVER', CLOUDY_PIXEL_PERCENTAGE)) \
-                .select(['SR_B5', 'SR_B4'])  # Seleciona apenas as bandas NIR e Red
-
-            # Limita a 2 imagens por mês
-            filtered_images = datasetLangSat  #.limit(2)
-            landsat_count = filtered_images.size().getInfo()
-
-            if landsat_count > 0:
-                # Exporta cada uma das duas imagens de Landsat 8
-                for i in range(landsat_count):
-                    landsat_image = ee.Image(filtered_images.toList(landsat_count).get(i)).clip(caatinga)
-                    landsat_task = export_image(
-                        image=landsat_image,
-                        description=f'Landsat_Image_{start_date}_{i}_{timestamp}',
-                        folder=folder_drive,
-                        region=caatinga.geometry().bounds().getInfo()['coordinates'],
-                        scale=scale
-                    )
-                    tasks.append(landsat_task)
-
-            current_date = next_month
+        # Grade de blocos na escala nativa de cada sensor (30 m Landsat, 10 m Sentinel-2),
+        # mantendo apenas os blocos que tocam o bioma
+        tiles = {}
+        for sensor, config in SENSORS.items():
+            grid = TileGrid(bounds, config['scale'])
+            with instrumentation.span('blocos', sensor=sensor):
+                tiles[sensor] = intersecting_tiles(grid, caatinga)
+            print(f"{config['label']}: {len(tiles[sensor])} de {grid.rows * grid.cols} blocos de "
+                  f"{grid.tile_px}x{grid.tile_px} pixels a {config['scale']} m.")
+
+        # Agendador das tarefas de exportação
+        scheduler = ExportScheduler(JOURNAL_PATH, max_in_flight=MAX_IN_FLIGHT)
 
         # -------------------------------------------
-        # Sentinel-2 - Exportação de 2 imagens por mês
+        # Manifesto das cenas Landsat 8 e Sentinel-2
         # -------------------------------------------
-        
-        current_date = DATE_START
-
-        while current_date < DATE_END:
-            start_date = current_date.strftime('%Y-%m-%d')
-            next_month = (current_date + datetime.timedelta(days=31)).replace(day=1)
-            end_date = next_month.strftime('%Y-%m-%d')
-
-            # Filtra as imagens Sentinel-2 por mês
-            datasetSentinel2 = ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED') \
-                .filterDate(start_date, end_date) \
-                .filterBounds(caatinga) \
-                .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', CLOUDY_PIXEL_PERCENTAGE)) \
-                .select(['B8', 'B4'])  # Seleciona apenas as bandas NIR e Red
-
-            # Limita a 2 imagens por mês
-            filtered_images = datasetSentinel2 #.limit(2)
-            sentinel_count = filtered_images.size().getInfo()
-
-            if sentinel_count > 0:
-                # Exporta cada uma das duas imagens de Sentinel-2
-                for i in range(sentinel_count):
-                    sentinel_image = ee.Image(filtered_images.toList(sentinel_count).get(i)).clip(caatinga)
-                    sentinel_task = export_image(
-                        image=sentinel_image,
-                        description=f'Sentinel_Image_{start_date}_{i}_{timestamp}',
-                        folder=folder_drive,
-                        region=caatinga.geometry().bounds().getInfo()['coordinates'],
-                        scale=10  # Escala padrão para Sentinel-2
-                    )
-                    tasks.append(sentinel_task)
-
-            current_date = next_month
-
-        # Monitoramento das tarefas
-        # monitor_tasks(tasks)
+
+        # Uma única consulta por sensor para todo o período; no modo incremental, só as cenas
+        # ingeridas ou reprocessadas depois da última execução
+        reprocessed = []
+        with instrumentation.span('manifesto'):
+            if incremental:
+                # Importado só aqui: o módulo traz o numpy e os produtos locais, desnecessários na exportação completa
+                from incremental import RunState, delta_scenes, finish_run, split_delta
+
+                state = RunState(STATE_PATH)
+                queried = delta_scenes(caatinga, state, DATE_START, DATE_END, CLOUDY_PIXEL_PERCENTAGE)
+                scenes, reprocessed = split_delta(queried, state)
+                print(f"Cenas novas: {len(scenes)}. Reprocessadas: {len(reprocessed)}.")
+            else:
+                scenes = build_scene_manifest(caatinga, DATE_START, DATE_END, CLOUDY_PIXEL_PERCENTAGE)
+        print(f"Cenas encontradas: {len(scenes)}")
+
+        # Mantém só as melhores cenas de cada período que, juntas, cobrem o bioma
+        if SCENES_PER_BIN:
+            with instrumentation.span('selecao', cenas=len(scenes)):
+                selected = select_scenes(scenes, tiles, DATE_START, DATE_END, TIME_WINDOW, SCENES_PER_BIN)
+            selection_report(scenes, selected, tiles)
+            scenes = selected
+
+        # Cenas já exportadas e reprocessadas são exportadas de novo, sem passar pela seleção
+        scenes = scenes + reprocessed
+
+        # Agenda cada bloco de cada imagem, período a período (agrupamento local, sem novas consultas)
+        scenes_keys = []
+        for sensor, config in SENSORS.items():
+            label = config['label']
+            sensor_scenes = [scene for scene in scenes if scene.sensor == sensor]
+            for time_bin in bin_scenes(sensor_scenes, DATE_START, DATE_END, TIME_WINDOW, keep_empty=False):
+                print(f"{label} {time_bin.label}: {time_bin.count} cena(s)")
+                for scene in time_bin.scenes:
+                    image = scene_image(scene, caatinga)
+                    scene_tiles = tiles_for_bbox(tiles[sensor], scene.bbox) if scene.bbox else tiles[sensor]
+                    # Uma cena reprocessada recebe o sufixo da nova versão (novo arquivo e nova entrada no diário)
+                    version = state.version_suffix(scene) if incremental else ''
+                    keys = []
+                    # A descrição é fixa por cena e bloco (sem timestamp), para que o diário possa retomar
+                    for tile in scene_tiles:
+                        keys.append(f'{scene.id}{version}/{tile.id}')
+                        scheduler.add(keys[-1], functools.partial(
+                            export_image,
+                            image=image,
+                            description=f'{label}_{scene.id.split("/")[-1]}_{tile.id}{version}',
+                            folder=folder_drive,
+                            **tile.export_params()
+                        ))
+                    scenes_keys.append((scene, keys))
+
+        # Submissão e monitoramento das tarefas
+        with instrumentation.span('exportacao'):
+            scheduler.run()
+
+        if incremental:
+            finish_run(state, scenes_keys, queried, scheduler.journal)
 
     except Exception as e:
         print(f"Ocorreu um erro: {str(e)}")
+        instrumentation.error(e)
 
 if __name__ == "__main__":
-    main()
+    main(incremental='--incremental' in sys.argv[1:])
@@ -0,0 +1,155 @@
+"""
+Agendador de exportações com janela limitada de tarefas em execução e diário
+(journal) em disco, para que uma nova execução após uma falha só submeta
+novamente as cenas que ainda não foram concluídas.
+
+Uso:
+    scheduler = ExportScheduler('export_journal.json', max_in_flight=10)
+    scheduler.add('LANDSAT/LC08/C02/T1_L2/LC08_217066_20170105',
+                  functools.partial(export_image, image=..., description=..., ...))
+    scheduler.run()
+"""
+
+import collections
+import json
+import os
+import time
+
+from task_monitor import TERMINAL_STATES, TaskMonitor
+
+# Estados de cada cena no diário
+PENDING = 'pending'
+SUBMITTED = 'submitted'
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+
+class ExportJournal:
+    """Diário em JSON com o estado de exportação de cada cena."""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        # Há alterações ainda não gravadas no disco
+        self.dirty = False
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.entries = json.load(f)
+
+    def state(self, key):
+        return self.entries.get(key, {}).get('state', PENDING)
+
+    def update(self, key, **fields):
+        entry = self.entries.setdefault(key, {'state': PENDING, 'attempts': 0})
+        entry.update(fields)
+        entry['updated'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self.dirty = True
+
+    def save(self):
+        """Grava o diário se houve alteração desde a última gravação; retorna se gravou."""
+        if not self.dirty:
+            return False
+        # Grava em arquivo temporário e substitui, para não corromper o diário em caso de queda
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+        return True
+
+    def summary(self, keys):
+        return collections.Counter(self.state(key) for key in keys)
+
+
+class ExportScheduler:
+    """Submete exportações mantendo no máximo `max_in_flight` tarefas ativas no servidor."""
+
+    def __init__(self, journal_path, max_in_flight=10, max_attempts=3, monitor=None):
+        self.journal = ExportJournal(journal_path)
+        self.max_in_flight = max_in_flight
+        self.max_attempts = max_attempts
+        self.monitor = monitor or TaskMonitor()
+        self.jobs = collections.OrderedDict()
+        self.in_flight = {}
+
+    def add(self, key, submit):
+        """Registra uma exportação; `submit` cria e inicia a tarefa (ex.: export_image)."""
+        self.jobs[key] = submit
+
+    def _queue(self):
+        queue = collections.deque()
+        for key in self.jobs:
+            entry = self.journal.entries.get(key, {})
+            state = entry.get('state', PENDING)
+            if state == SUBMITTED and entry.get('task_id'):
+                # Tarefa submetida em uma execução anterior: volta a ser acompanhada
+                self.in_flight[entry['task_id']] = key
+            elif state == PENDING or (state == FAILED and entry.get('attempts', 0) < self.max_attempts):
+                queue.append(key)
+        return queue
+
+    def _submit(self, key):
+        attempts = self.journal.entries.get(key, {}).get('attempts', 0) + 1
+        try:
+            task = self.jobs[key]()
+        except Exception as e:
+            state = FAILED if attempts >= self.max_attempts else PENDING
+            self.journal.update(key, state=state, attempts=attempts, error=str(e))
+            print(f"Erro ao submeter {key}: {str(e)}")
+            return False
+        self.in_flight[task.id] = key
+        self.journal.update(key, state=SUBMITTED, attempts=attempts, task_id=task.id, error=None)
+        return True
+
+    def _record(self, status):
+        key = self.in_flight.pop(status['id'])
+        if status['state'] == 'COMPLETED':
+            self.journal.update(key, state=COMPLETED)
+        else:
+            self.journal.update(key, state=FAILED, error=status.get('error_message', status['state']))
+            print(f"Tarefa {status['id']} ({key}) falhou: {status.get('error_message', status['state'])}")
+        return key
+
+    def _refresh(self):
+        """Atualiza o estado das tarefas em andamento; retorna as chaves que falharam."""
+        if not self.in_flight:
+            return []
+        failed = []
+        # Uma única consulta em lote para todas as tarefas da janela (as que não estão na listagem são
+        # consultadas pelo id; as que o servidor não reconhece acabam como UNKNOWN e contam como falha)
+        for task_id, status in self.monitor.poll(list(self.in_flight)).items():
+            if status['state'] not in TERMINAL_STATES:
+                continue
+            key = self._record(status)
+            if status['state'] != 'COMPLETED':
+                failed.append(key)
+        return failed
+
+    def run(self):
+        """Executa até que todas as exportações estejam concluídas ou esgotem as tentativas."""
+        queue = self._queue()
+        print(f"Exportações pendentes: {len(queue)}. Em andamento: {len(self.in_flight)}.")
+
+        while True:
+            for key in self._refresh():
+                if self.journal.entries[key]['attempts'] < self.max_attempts:
+                    queue.append(key)
+
+            while queue and len(self.in_flight) < self.max_in_flight:
+                key = queue.popleft()
+                if not self._submit(key) and self.journal.state(key) == PENDING:
+                    # Falha na submissão (ex.: limite de tarefas): tenta novamente no próximo ciclo
+                    queue.append(key)
+                    break
+            # Uma gravação por ciclo, e só se _refresh ou _submit alteraram alguma entrada
+            self.journal.save()
+
+            if not queue and not self.in_flight:
+                break
+
+            print(f"Em andamento: {len(self.in_flight)}. Na fila: {len(queue)}.")
+            self.monitor.sleep(self.monitor.interval)
+
+        summary = self.journal.summary(self.jobs)
+        print(f"Exportações concluídas: {summary[COMPLETED]}. Com falha: {summary[FAILED]}.")
+        return summary
@@ -1,12 +1,12 @@
 import ee
-import geemap
-import time  # Importa a função sleep
-from init import GEE
+from init import initialize
 import datetime
+from task_monitor import TaskMonitor
+from downloader import download_files
+from ee_cache import get_info
 
-# Inicializa o GEE
-gee = GEE()
-ee.Initialize(gee.credentials)
+# Inicializa o GEE (conta de serviço)
+initialize(service_account=True)
 
 
 # Função para aplicar fatores de escala
@@ -29,7 +29,7 @@ image = image.toInt16()
 image = image.select(["B2", "B3", "B4"])
 
 # Defina uma região de exportação com base nos limites da imagem
-region = image.geometry().bounds().getInfo()["coordinates"]
+region = get_info(image.geometry().bounds())["coordinates"]
 
 study_area = ee.Geometry.Rectangle([-49.7, -28.3, -49.3, -28.7])
 
@@ -37,19 +37,19 @@ study_area = ee.Geometry.Rectangle([-49.7, -28.3, -49.3, -28.7])
 image = image.clip(study_area)
 
 # Reduz a imagem para obter os valores mínimos e máximos, utilizando maxPixels ou bestEffort
-stats = image.reduceRegion(
+stats = get_info(image.reduceRegion(
     reducer=ee.Reducer.minMax(),
     geometry=study_area,
     scale=30,
     maxPixels=1e8,  # Aumenta o limite de pixels para 100 milhões
     bestEffort=True  # Ajusta a escala automaticamente para não exceder o limite de pixels
-).getInfo()
+))
 
 print(f"Estatísticas da imagem (mínimo/máximo): {stats}")
 
 # Verifique se a área tem dados válidos (máscara da imagem)
 mask = image.mask().reduce(ee.Reducer.min())
-mask_value = mask.reduceRegion(reducer=ee.Reducer.min(), geometry=study_area, scale=30).getInfo()
+mask_value = get_info(mask.reduceRegion(reducer=ee.Reducer.min(), geometry=study_area, scale=30))
 print(f"Máscara da imagem na área de estudo: {mask_value}")
 
 
@@ -69,7 +69,9 @@ print(image.getThumbURL({"min": 5000, "max": 23000}))
 if stats['B2_min'] is None or stats['B2_max'] is None:
     print("A área de estudo não contém dados válidos para a imagem selecionada.")
 else:
-    # Visualização da Imagem usando geemap
+    # Visualização da Imagem usando geemap (pesado; só é importado aqui, onde o mapa é gerado)
+    import geemap
+
     m = geemap.Map()
 
     # Definir visualização das bandas RGB (B4, B3, B2)
@@ -107,19 +109,18 @@ else:
         # crsTransform=projection['transform'],
         # fileFormat='GeoTIFF',
         # formatOptions={'cloudOptimized': True},
-        region=study_area.getInfo()["coordinates"],
+        region=get_info(study_area)["coordinates"],
         maxPixels=1e13,
     )
 
     taskGoogleDrive.start()
 
-    # Monitoramento da tarefa com sleep
-    while taskGoogleDrive.active():
-        print(f"Imagem id: {taskGoogleDrive.id}. Aguardando conclusão da exportação...")
-        time.sleep(10)  # Espera 30 segundos entre verificações
+    # Monitoramento das tarefas (uma consulta em lote por ciclo, com intervalo adaptativo)
+    print(f"Imagem id: {taskGoogleDrive.id}. Aguardando conclusão da exportação...")
+    statuses = TaskMonitor().wait([taskGoogleDrive])
 
     # Verifica o status final da tarefa
-    status = taskGoogleDrive.status()
+    status = statuses[taskGoogleDrive.id]
 
     if status["state"] == "COMPLETED":
         print(f"Exportação Concluída: {status}")
@@ -135,3 +136,6 @@ else:
     )
 
     print(download_url)
+
+    # Baixa o arquivo (com novas tentativas e retomada, se a conexão cair)
+    download_files([(download_url, f"{image_file_name}_down.zip")], "downloads")
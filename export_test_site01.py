@@ -6,11 +6,11 @@ Funcionou
 import ee
 import time
 
-from init import GEE
+from downloader import download_files
+from init import initialize
 
-# Inicializa o GEE
-gee = GEE()
-ee.Initialize(gee.credentials)
+# Inicializa o GEE (conta de serviço)
+initialize(service_account=True)
 
 area_estudo = ee.Geometry.Rectangle([-49.7, -28.3, -49.3, -28.7])
 img_landsat = ee.Image('LANDSAT/LC08/C01/T1/LC08_220080_20200420')\
@@ -39,4 +39,7 @@ download_url = img_landsat.getDownloadURL({
     'name': 'img_B2E_down',
 })
  
-print(download_url)
\ No newline at end of file
+print(download_url)
+
+# Baixa o arquivo (com novas tentativas e retomada, se a conexão cair)
+download_files([(download_url, 'img_B2E_down.zip')], 'downloads')
\ No newline at end of file
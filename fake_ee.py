@@ -0,0 +1,962 @@
+"""
+Substituto local (fake) do módulo `ee` do Google Earth Engine.
+
+Permite executar os scripts do projeto sem credenciais e sem rede, contando
+cada ida e volta ao servidor (getInfo, task.start, consultas de status...).
+
+Uso:
+    import fake_ee
+    fake_ee.install()          # registra o fake em sys.modules['ee']
+    fake_ee.add_synthetic_catalog('2017-01-01', '2018-01-01')
+    import export_all_images
+    export_all_images.main()
+    print(fake_ee.calls)       # Counter com as idas e voltas por tipo
+"""
+
+import collections
+import datetime
+import json
+import math
+import random
+import sys
+import types
+import zlib
+
+# Contador de idas e voltas ao "servidor", por tipo de chamada
+calls = collections.Counter()
+
+# Operações montadas no grafo de expressões (size, toList...), mesmo sem ida ao servidor
+operations = collections.Counter()
+
+# Latência simulada (segundos) por tipo de chamada; 'default' vale para as demais
+latency = {'default': 0.0}
+
+# Catálogo de coleções de imagens: id da coleção -> lista de cenas
+CATALOG = {}
+
+# Assets de FeatureCollection: id do asset -> lista de (bbox, propriedades)
+ASSETS = {}
+
+# Tarefas de exportação submetidas ao "servidor", por id
+TASKS = collections.OrderedDict()
+
+# Tempo de fila e de execução (segundos simulados) das tarefas de exportação
+task_timing = {'queue': 5.0, 'run': 60.0, 'max_running': 3000}
+
+# Descrições de tarefas que devem falhar (predicado sobre a descrição)
+task_failures = []
+
+# Endereço base dos links de getDownloadURL (pode apontar para o fake_http.FileServer)
+download_base = 'https://earthengine.fake/download'
+
+
+class FakeClock:
+    """Relógio virtual usado para simular latência e o progresso das tarefas."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(0.0, seconds)
+
+
+clock = FakeClock()
+
+
+def reset():
+    """Limpa contadores, catálogo, assets e tarefas."""
+    global download_base
+    calls.clear()
+    operations.clear()
+    CATALOG.clear()
+    ASSETS.clear()
+    TASKS.clear()
+    task_failures.clear()
+    latency.clear()
+    latency['default'] = 0.0
+    task_timing.update({'queue': 5.0, 'run': 60.0, 'max_running': 3000})
+    clock.now = 0.0
+    download_base = 'https://earthengine.fake/download'
+
+
+def simulated_latency():
+    """Latência total simulada acumulada (segundos)."""
+    return sum(calls[kind] * latency.get(kind, latency['default']) for kind in calls)
+
+
+def _round_trip(kind):
+    calls[kind] += 1
+    clock.sleep(latency.get(kind, latency['default']))
+
+
+def _millis(value):
+    if isinstance(value, ComputedObject):
+        value = value._value()
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, datetime.datetime):
+        return int(value.replace(tzinfo=datetime.timezone.utc).timestamp() * 1000)
+    date = datetime.datetime.strptime(str(value)[:10], '%Y-%m-%d')
+    return int(date.replace(tzinfo=datetime.timezone.utc).timestamp() * 1000)
+
+
+def _expr(value):
+    """Representação serializável de um argumento do grafo de expressões."""
+    if isinstance(value, ComputedObject):
+        return value._expr
+    if isinstance(value, (list, tuple)):
+        return [_expr(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _expr(v) for k, v in value.items()}
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if callable(value):
+        return getattr(value, '__name__', 'function')
+    return value
+
+
+def _evaluate(value):
+    if isinstance(value, ComputedObject):
+        return value._value()
+    if isinstance(value, (list, tuple)):
+        return [_evaluate(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _evaluate(v) for k, v in value.items()}
+    return value
+
+
+# -------------------------------------------
+# Geometrias (representadas pelo retângulo envolvente)
+# -------------------------------------------
+
+def _bbox_of_coords(coords):
+    points = []
+
+    def walk(c):
+        if c and isinstance(c[0], (int, float)):
+            points.append(c)
+        else:
+            for item in c:
+                walk(item)
+
+    walk(coords)
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    return [min(xs), min(ys), max(xs), max(ys)]
+
+
+def _bbox_intersects(a, b):
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def _bbox_area_m2(bbox):
+    # Área aproximada (esfera) do retângulo em graus
+    radius = 6371008.8
+    lon = math.radians(bbox[2] - bbox[0])
+    return radius ** 2 * lon * abs(math.sin(math.radians(bbox[3])) - math.sin(math.radians(bbox[1])))
+
+
+def _bbox_polygon(bbox):
+    xmin, ymin, xmax, ymax = bbox
+    return [[[xmin, ymin], [xmax, ymin], [xmax, ymax], [xmin, ymax], [xmin, ymin]]]
+
+
+class ComputedObject:
+    """Objeto calculado no "servidor": guarda o grafo de expressões e a avaliação local."""
+
+    def __init__(self, expr, fn):
+        self._expr = expr
+        self._fn = fn
+
+    def _value(self):
+        return self._fn()
+
+    def getInfo(self):
+        _round_trip('getInfo')
+        return self._value()
+
+    def serialize(self, for_cloud_api=True):
+        return json.dumps(self._expr, sort_keys=True, default=str)
+
+    def _call(self, cls, name, fn, *args):
+        return cls([name, self._expr] + [_expr(a) for a in args], fn)
+
+
+class Number(ComputedObject):
+    def __init__(self, expr, fn=None):
+        if fn is None:
+            value = expr
+            expr, fn = ['Number', value], (lambda: value)
+        super().__init__(expr, fn)
+
+
+class String(ComputedObject):
+    def __init__(self, expr, fn=None):
+        if fn is None:
+            value = expr
+            expr, fn = ['String', value], (lambda: value)
+        super().__init__(expr, fn)
+
+
+class List(ComputedObject):
+    def __init__(self, expr, fn=None):
+        if fn is None:
+            value = expr
+            expr, fn = ['List', _expr(value)], (lambda: _evaluate(value))
+        super().__init__(expr, fn)
+
+    def get(self, index):
+        return self._call(ComputedObject, 'List.get', lambda: self._value()[_evaluate(index)], index)
+
+    def size(self):
+        operations['size'] += 1
+        return self._call(Number, 'List.size', lambda: len(self._value()))
+
+
+class Dictionary(ComputedObject):
+    def __init__(self, expr, fn=None):
+        if fn is None:
+            value = expr
+            expr, fn = ['Dictionary', _expr(value)], (lambda: _evaluate(value))
+        super().__init__(expr, fn)
+
+    def get(self, key):
+        return self._call(ComputedObject, 'Dictionary.get', lambda: self._value()[key], key)
+
+
+class Geometry(ComputedObject):
+    def __init__(self, geo_json, opt_proj=None, opt_geodesic=None, expr=None, fn=None):
+        if fn is None:
+            value = geo_json
+            expr, fn = ['Geometry', _expr(value)], (lambda: value)
+        super().__init__(expr, fn)
+
+    def _bbox(self):
+        return _bbox_of_coords(self._value()['coordinates'])
+
+    def bounds(self, maxError=None, proj=None):
+        def fn():
+            return {'type': 'Polygon', 'coordinates': _bbox_polygon(self._bbox())}
+        return Geometry(None, expr=['Geometry.bounds', self._expr], fn=fn)
+
+    def area(self, maxError=None, proj=None):
+        return self._call(Number, 'Geometry.area', lambda: _bbox_area_m2(self._bbox()))
+
+    def coordinates(self):
+        return self._call(List, 'Geometry.coordinates', lambda: self._value()['coordinates'])
+
+    def intersects(self, other, maxError=None, proj=None):
+        return self._call(ComputedObject, 'Geometry.intersects',
+                          lambda: _bbox_intersects(self._bbox(), _geometry_of(other)._bbox()), other)
+
+    @staticmethod
+    def Rectangle(coords, proj=None, geodesic=None, evenOdd=None):
+        xmin, ymin, xmax, ymax = _evaluate(coords)
+        bbox = [min(xmin, xmax), min(ymin, ymax), max(xmin, xmax), max(ymin, ymax)]
+        return Geometry({'type': 'Polygon', 'coordinates': _bbox_polygon(bbox)})
+
+    @staticmethod
+    def BBox(west, south, east, north):
+        return Geometry.Rectangle([west, south, east, north])
+
+    @staticmethod
+    def Point(coords, proj=None):
+        return Geometry({'type': 'Point', 'coordinates': list(_evaluate(coords))})
+
+    @staticmethod
+    def MultiPoint(coords, proj=None):
+        return Geometry({'type': 'MultiPoint', 'coordinates': _evaluate(coords)})
+
+    @staticmethod
+    def Polygon(coords, proj=None, geodesic=None, maxError=None, evenOdd=None):
+        return Geometry({'type': 'Polygon', 'coordinates': _evaluate(coords)})
+
+
+def _geometry_of(obj):
+    if isinstance(obj, Geometry):
+        return obj
+    return obj.geometry()
+
+
+# -------------------------------------------
+# Filtros e redutores
+# -------------------------------------------
+
+class Filter(ComputedObject):
+    def __init__(self, expr, predicate=None):
+        super().__init__(expr, lambda: None)
+        self._predicate = predicate
+
+    def matches(self, properties):
+        return self._predicate(properties)
+
+    @staticmethod
+    def lt(name, value):
+        return Filter(['Filter.lt', name, _expr(value)], lambda p: p.get(name) is not None and p[name] < value)
+
+    @staticmethod
+    def lte(name, value):
+        return Filter(['Filter.lte', name, _expr(value)], lambda p: p.get(name) is not None and p[name] <= value)
+
+    @staticmethod
+    def gt(name, value):
+        return Filter(['Filter.gt', name, _expr(value)], lambda p: p.get(name) is not None and p[name] > value)
+
+    @staticmethod
+    def gte(name, value):
+        return Filter(['Filter.gte', name, _expr(value)], lambda p: p.get(name) is not None and p[name] >= value)
+
+    @staticmethod
+    def eq(name, value):
+        return Filter(['Filter.eq', name, _expr(value)], lambda p: p.get(name) == value)
+
+    @staticmethod
+    def inList(name, values):
+        values = _evaluate(values)
+        return Filter(['Filter.inList', name, _expr(values)], lambda p: p.get(name) in values)
+
+    @staticmethod
+    def And(*filters):
+        return Filter(['Filter.and'] + [f._expr for f in filters], lambda p: all(f.matches(p) for f in filters))
+
+    @staticmethod
+    def date(start, end=None):
+        start_ms = _millis(start)
+        end_ms = _millis(end) if end is not None else start_ms + 86400000
+        return Filter(['Filter.date', start_ms, end_ms],
+                      lambda p: start_ms <= p['system:time_start'] < end_ms)
+
+
+class Reducer(ComputedObject):
+    def __init__(self, expr, kind=None, count=1):
+        super().__init__(expr, lambda: None)
+        self.kind = kind
+        self.count = count
+
+    @staticmethod
+    def toList(numOptionalParameters=None, tupleSize=None):
+        size = tupleSize or numOptionalParameters or 1
+        return Reducer(['Reducer.toList', size], 'toList', size)
+
+    @staticmethod
+    def minMax():
+        return Reducer(['Reducer.minMax'], 'minMax')
+
+    @staticmethod
+    def min():
+        return Reducer(['Reducer.min'], 'min')
+
+    @staticmethod
+    def max():
+        return Reducer(['Reducer.max'], 'max')
+
+    @staticmethod
+    def first():
+        return Reducer(['Reducer.first'], 'first')
+
+    @staticmethod
+    def mean():
+        return Reducer(['Reducer.mean'], 'mean')
+
+    @staticmethod
+    def median():
+        return Reducer(['Reducer.median'], 'median')
+
+
+# -------------------------------------------
+# Imagens e coleções
+# -------------------------------------------
+
+class Image(ComputedObject):
+    """Imagem sem pixels: guarda apenas id, bandas e propriedades."""
+
+    def __init__(self, args=None, expr=None, info=None, info_fn=None):
+        if isinstance(args, Image):
+            expr, info, info_fn = args._expr, args._info_cache, args._info_fn
+        elif isinstance(args, ComputedObject):
+            source = args
+            expr = ['Image', args._expr]
+            info_fn = lambda: _evaluate(source)._info
+        elif isinstance(args, str):
+            expr = ['Image.load', args]
+            info = _scene_by_id(args) or {'id': args, 'properties': {}, 'bands': []}
+        elif expr is None:
+            expr = ['Image.constant', _expr(args)]
+            info = {'id': None, 'properties': {}, 'bands': ['constant']}
+        super().__init__(expr, self._info_value)
+        self._info_cache = info
+        self._info_fn = info_fn
+
+    @property
+    def _info(self):
+        if self._info_cache is None:
+            self._info_cache = self._info_fn()
+        return self._info_cache
+
+    def _info_value(self):
+        return {
+            'type': 'Image',
+            'id': self._info.get('id'),
+            'bands': [{'id': b} for b in self._info.get('bands', [])],
+            'properties': dict(self._info.get('properties', {})),
+        }
+
+    def _derive(self, name, *args, bands=None):
+        def info_fn():
+            info = dict(self._info)
+            if bands is not None:
+                info['bands'] = bands
+            return info
+        return Image(expr=[name, self._expr] + [_expr(a) for a in args], info_fn=info_fn)
+
+    def get(self, name):
+        return self._call(ComputedObject, 'Image.get', lambda: self._info['properties'].get(name), name)
+
+    def select(self, *bands):
+        selected = list(bands[0]) if len(bands) == 1 and isinstance(bands[0], (list, tuple)) else list(bands)
+        return self._derive('Image.select', selected, bands=selected)
+
+    def rename(self, *names):
+        names = list(names[0]) if len(names) == 1 and isinstance(names[0], (list, tuple)) else list(names)
+        return self._derive('Image.rename', names, bands=names)
+
+    def normalizedDifference(self, bands=None):
+        return self._derive('Image.normalizedDifference', bands, bands=['nd'])
+
+    def clip(self, geometry):
+        return self._derive('Image.clip', geometry)
+
+    def updateMask(self, mask):
+        return self._derive('Image.updateMask', mask)
+
+    def unmask(self, value=None, sameFootprint=True):
+        return self._derive('Image.unmask', value, sameFootprint)
+
+    def multiply(self, value):
+        return self._derive('Image.multiply', value)
+
+    def divide(self, value):
+        return self._derive('Image.divide', value)
+
+    def add(self, value):
+        return self._derive('Image.add', value)
+
+    def addBands(self, srcImg, names=None, overwrite=False):
+        return self._derive('Image.addBands', srcImg, names, overwrite)
+
+    def toInt16(self):
+        return self._derive('Image.toInt16')
+
+    def toFloat(self):
+        return self._derive('Image.toFloat')
+
+    def set(self, *args):
+        return self._derive('Image.set', *args)
+
+    def mask(self):
+        return self._derive('Image.mask')
+
+    def reduce(self, reducer):
+        return self._derive('Image.reduce', reducer)
+
+    def geometry(self):
+        def fn():
+            bbox = (self._info or {}).get('bbox') or [-180, -90, 180, 90]
+            return {'type': 'Polygon', 'coordinates': _bbox_polygon(bbox)}
+        return Geometry(None, expr=['Image.geometry', self._expr], fn=fn)
+
+    def date(self):
+        return self._call(Number, 'Image.date', lambda: self._info['properties']['system:time_start'])
+
+    def projection(self):
+        return self._call(ComputedObject, 'Image.projection',
+                          lambda: {'type': 'Projection', 'crs': 'EPSG:4326', 'transform': [1, 0, 0, 0, 1, 0]})
+
+    def reduceRegion(self, reducer=None, geometry=None, scale=None, maxPixels=None, bestEffort=None, **kwargs):
+        def fn():
+            return {f'{band}_{suffix}' if reducer.kind == 'minMax' else band: 0
+                    for band in self._info.get('bands', [])
+                    for suffix in (('min', 'max') if reducer.kind == 'minMax' else ('',))}
+        return self._call(Dictionary, 'Image.reduceRegion', fn, reducer, geometry, scale)
+
+    def reduceRegions(self, collection, reducer, scale=None, **kwargs):
+        def fn():
+            image_id = self._info.get('id')
+            return [Feature(f.geometry(), dict(f._properties, **{reducer.kind: _synthetic_value(image_id, f)}))
+                    for f in collection._features()]
+        return FeatureCollection(expr=['Image.reduceRegions', self._expr, collection._expr, reducer._expr, scale],
+                                 fn=fn)
+
+    def getThumbURL(self, params=None):
+        _round_trip('getThumbURL')
+        return 'https://earthengine.fake/thumbnail'
+
+    def getDownloadURL(self, params=None):
+        _round_trip('getDownloadURL')
+        name = (params or {}).get('name', 'download')
+        return f'{download_base}/{name}'
+
+
+def _synthetic_value(image_id, feature):
+    # Valor determinístico por imagem e geometria (permite conferir a montagem das tabelas)
+    key = json.dumps([image_id, feature.geometry()._value()], sort_keys=True)
+    return (zlib.crc32(key.encode('utf-8')) % 2000 - 1000) / 1000
+
+
+def _scene_by_id(scene_id):
+    for scenes in CATALOG.values():
+        for scene in scenes:
+            if scene['id'] == scene_id:
+                return scene
+    return None
+
+
+class ImageCollection(ComputedObject):
+    def __init__(self, args, expr=None, scenes=None):
+        if isinstance(args, str):
+            collection_id = args
+            expr = ['ImageCollection.load', collection_id]
+            scenes = lambda: list(CATALOG.get(collection_id, []))
+        elif isinstance(args, (list, tuple)):
+            images = list(args)
+            expr = ['ImageCollection.fromImages', _expr(images)]
+            scenes = lambda: [img._info for img in images]
+        super().__init__(expr, self._info_value)
+        self._scenes = scenes
+
+    def _info_value(self):
+        features = [Image(expr=['Image.load', s['id']], info=s)._info_value() for s in self._scenes()]
+        return {'type': 'ImageCollection', 'features': features}
+
+    def _derive(self, name, args, fn):
+        return ImageCollection(None, expr=[name, self._expr] + [_expr(a) for a in args], scenes=fn)
+
+    def filterDate(self, start, end=None):
+        date_filter = Filter.date(start, end)
+        return self._derive('ImageCollection.filterDate', [start, end],
+                            lambda: [s for s in self._scenes() if date_filter.matches(s['properties'])])
+
+    def filterBounds(self, geometry):
+        def fn():
+            bbox = _geometry_of(geometry)._bbox()
+            return [s for s in self._scenes() if _bbox_intersects(s['bbox'], bbox)]
+        return self._derive('ImageCollection.filterBounds', [geometry], fn)
+
+    def filter(self, ee_filter):
+        return self._derive('ImageCollection.filter', [ee_filter],
+                            lambda: [s for s in self._scenes() if ee_filter.matches(_filter_properties(s))])
+
+    def select(self, *bands):
+        selected = list(bands[0]) if len(bands) == 1 and isinstance(bands[0], (list, tuple)) else list(bands)
+        return self._derive('ImageCollection.select', [selected],
+                            lambda: [dict(s, bands=selected) for s in self._scenes()])
+
+    def map(self, algorithm):
+        return self._derive('ImageCollection.map', [algorithm], lambda: list(self._scenes()))
+
+    def sort(self, prop, ascending=True):
+        return self._derive('ImageCollection.sort', [prop, ascending],
+                            lambda: sorted(self._scenes(), key=lambda s: s['properties'].get(prop),
+                                           reverse=not ascending))
+
+    def limit(self, maximum, opt_property=None, opt_ascending=True):
+        def fn():
+            scenes = self._scenes()
+            if opt_property is not None:
+                scenes = sorted(scenes, key=lambda s: s['properties'].get(opt_property), reverse=not opt_ascending)
+            return scenes[:maximum]
+        return self._derive('ImageCollection.limit', [maximum, opt_property, opt_ascending], fn)
+
+    def size(self):
+        operations['size'] += 1
+        return self._call(Number, 'ImageCollection.size', lambda: len(self._scenes()))
+
+    def toList(self, count, offset=0):
+        operations['toList'] += 1
+        return self._call(List, 'ImageCollection.toList',
+                          lambda: [Image(expr=['Image.load', s['id']], info=s)
+                                   for s in self._scenes()[offset:offset + count]], count, offset)
+
+    def first(self):
+        return Image(expr=['ImageCollection.first', self._expr], info_fn=lambda: self._scenes()[0])
+
+    def aggregate_array(self, prop):
+        return self._call(List, 'ImageCollection.aggregate_array',
+                          lambda: [_scene_property(s, prop) for s in self._scenes()], prop)
+
+    def reduceColumns(self, reducer, selectors, weightSelectors=None):
+        def fn():
+            rows = [[_scene_property(s, p) for p in selectors] for s in self._scenes()]
+            return {'list': rows if len(selectors) > 1 else [r[0] for r in rows]}
+        return self._call(Dictionary, 'ImageCollection.reduceColumns', fn, reducer, selectors)
+
+    def _composite(self, name):
+        def fn():
+            scenes = self._scenes()
+            bands = scenes[0].get('bands', []) if scenes else []
+            return {'id': None, 'properties': {}, 'bands': bands}
+        return Image(expr=[name, self._expr], info_fn=fn)
+
+    def median(self):
+        return self._composite('ImageCollection.median')
+
+    def mean(self):
+        return self._composite('ImageCollection.mean')
+
+    def mosaic(self):
+        return self._composite('ImageCollection.mosaic')
+
+
+def _filter_properties(scene):
+    # Propriedades visíveis aos filtros, incluindo as de sistema derivadas do id
+    return dict(scene['properties'], **{'system:id': scene['id'], 'system:index': scene['id'].split('/')[-1]})
+
+
+def _scene_property(scene, prop):
+    if prop == 'system:id':
+        return scene['id']
+    if prop == 'system:index':
+        return scene['id'].split('/')[-1]
+    if prop == 'system:footprint':
+        return {'type': 'Polygon', 'coordinates': _bbox_polygon(scene['bbox'])}
+    return scene['properties'].get(prop)
+
+
+class Feature(ComputedObject):
+    def __init__(self, geom, opt_properties=None):
+        if isinstance(geom, Feature):
+            opt_properties, geom = geom._properties, geom._geometry
+        self._geometry = geom if geom is None or isinstance(geom, Geometry) else Geometry(geom)
+        self._properties = dict(opt_properties or {})
+        super().__init__(['Feature', _expr(self._geometry), _expr(self._properties)], self._info_value)
+
+    def _info_value(self):
+        return {'type': 'Feature',
+                'geometry': self._geometry._value() if self._geometry is not None else None,
+                'properties': _evaluate(self._properties)}
+
+    def geometry(self):
+        return self._geometry
+
+    def get(self, prop):
+        return self._call(ComputedObject, 'Feature.get', lambda: self._properties.get(prop), prop)
+
+    def set(self, *args):
+        props = dict(self._properties)
+        if len(args) == 1:
+            props.update(args[0])
+        else:
+            props.update(dict(zip(args[::2], args[1::2])))
+        return Feature(self._geometry, props)
+
+
+class FeatureCollection(ComputedObject):
+    def __init__(self, args=None, opt_column=None, expr=None, fn=None):
+        if fn is None:
+            if isinstance(args, str):
+                asset_id = args
+                expr = ['FeatureCollection.load', asset_id]
+                fn = lambda: [Feature(Geometry.Rectangle(bbox), props) for bbox, props in ASSETS.get(asset_id, [])]
+            else:
+                features = [f if isinstance(f, (Feature, FeatureCollection)) else Feature(f) for f in (args or [])]
+                expr = ['FeatureCollection', [f._expr for f in features]]
+                fn = lambda: features
+        super().__init__(expr, lambda: {'type': 'FeatureCollection',
+                                        'features': [f._info_value() for f in self._features()]})
+        self._features = fn
+
+    def geometry(self, maxError=None):
+        def fn():
+            boxes = [f.geometry()._bbox() for f in self._features()]
+            bbox = [min(b[0] for b in boxes), min(b[1] for b in boxes),
+                    max(b[2] for b in boxes), max(b[3] for b in boxes)]
+            return {'type': 'Polygon', 'coordinates': _bbox_polygon(bbox)}
+        return Geometry(None, expr=['FeatureCollection.geometry', self._expr], fn=fn)
+
+    def filterBounds(self, geometry):
+        def fn():
+            bbox = _geometry_of(geometry)._bbox()
+            return [f for f in self._features() if _bbox_intersects(f.geometry()._bbox(), bbox)]
+        return FeatureCollection(expr=['FeatureCollection.filterBounds', self._expr, _expr(geometry)], fn=fn)
+
+    def filter(self, ee_filter):
+        return FeatureCollection(expr=['FeatureCollection.filter', self._expr, ee_filter._expr],
+                                 fn=lambda: [f for f in self._features() if ee_filter.matches(f._properties)])
+
+    def map(self, algorithm):
+        return FeatureCollection(expr=['FeatureCollection.map', self._expr, _expr(algorithm)],
+                                 fn=lambda: [algorithm(f) for f in self._features()])
+
+    def flatten(self):
+        return FeatureCollection(expr=['FeatureCollection.flatten', self._expr],
+                                 fn=lambda: [f for fc in self._features() for f in fc._features()])
+
+    def select(self, propertySelectors, newProperties=None, retainGeometry=True):
+        def fn():
+            names = newProperties or propertySelectors
+            return [Feature(f.geometry() if retainGeometry else None,
+                            {new: f._properties[old] for old, new in zip(propertySelectors, names)
+                             if old in f._properties})
+                    for f in self._features()]
+        return FeatureCollection(expr=['FeatureCollection.select', self._expr, _expr(propertySelectors),
+                                       _expr(newProperties), retainGeometry], fn=fn)
+
+    def size(self):
+        operations['size'] += 1
+        return self._call(Number, 'FeatureCollection.size', lambda: len(self._features()))
+
+    def aggregate_array(self, prop):
+        return self._call(List, 'FeatureCollection.aggregate_array',
+                          lambda: [f._properties.get(prop) for f in self._features()], prop)
+
+    def reduceColumns(self, reducer, selectors, weightSelectors=None):
+        def fn():
+            rows = [[_evaluate(f._properties.get(p)) for p in selectors] for f in self._features()]
+            return {'list': rows if len(selectors) > 1 else [r[0] for r in rows]}
+        return self._call(Dictionary, 'FeatureCollection.reduceColumns', fn, reducer, selectors)
+
+
+# -------------------------------------------
+# Exportação (ee.batch)
+# -------------------------------------------
+
+class Task:
+    """Tarefa de exportação simulada; o estado evolui com o relógio virtual."""
+
+    class State:
+        UNSUBMITTED = 'UNSUBMITTED'
+        READY = 'READY'
+        RUNNING = 'RUNNING'
+        COMPLETED = 'COMPLETED'
+        FAILED = 'FAILED'
+        CANCEL_REQUESTED = 'CANCEL_REQUESTED'
+        CANCELLED = 'CANCELLED'
+
+    _next_id = 0
+
+    def __init__(self, task_type, config):
+        self.task_type = task_type
+        self.config = config
+        self.id = None
+        self.submitted_at = None
+        self.started_at = None
+        self.cancelled = False
+
+    def start(self):
+        _round_trip('task.start')
+        Task._next_id += 1
+        self.id = f'FAKETASK{Task._next_id:08d}'
+        self.submitted_at = clock.time()
+        TASKS[self.id] = self
+
+    def _state(self):
+        if self.id is None:
+            return Task.State.UNSUBMITTED
+        if self.cancelled:
+            return Task.State.CANCELLED
+        now = clock.time()
+        if self.started_at is None:
+            if now - self.submitted_at < task_timing['queue']:
+                return Task.State.READY
+            running = sum(1 for t in TASKS.values() if t.started_at is not None
+                          and now - t.started_at < task_timing['run'] and not t.cancelled)
+            if running >= task_timing['max_running']:
+                return Task.State.READY
+            self.started_at = max(self.submitted_at + task_timing['queue'], now - task_timing['run'] + 1e-9)
+        if now - self.started_at < task_timing['run']:
+            return Task.State.RUNNING
+        description = self.config.get('description', '')
+        if any(predicate(description) for predicate in task_failures):
+            return Task.State.FAILED
+        return Task.State.COMPLETED
+
+    def _status(self):
+        state = self._state()
+        status = {
+            'id': self.id,
+            'state': state,
+            'description': self.config.get('description'),
+            'task_type': self.task_type,
+            'creation_timestamp_ms': int((self.submitted_at or 0) * 1000),
+            'update_timestamp_ms': int(clock.time() * 1000),
+        }
+        if self.started_at is not None:
+            status['start_timestamp_ms'] = int(self.started_at * 1000)
+        if state == Task.State.FAILED:
+            status['error_message'] = 'Falha simulada.'
+        return status
+
+    def status(self):
+        _round_trip('task.status')
+        return self._status()
+
+    def active(self):
+        return self.status()['state'] in (Task.State.READY, Task.State.RUNNING, Task.State.UNSUBMITTED)
+
+    def cancel(self):
+        _round_trip('task.cancel')
+        self.cancelled = True
+
+    @staticmethod
+    def list():
+        _round_trip('task.list')
+        return list(TASKS.values())
+
+
+class _ExportImage:
+    @staticmethod
+    def toDrive(image, description='myExportImageTask', folder=None, fileNamePrefix=None, dimensions=None,
+                region=None, scale=None, crs=None, crsTransform=None, maxPixels=None, shardSize=None,
+                fileDimensions=None, skipEmptyTiles=None, fileFormat=None, formatOptions=None, **kwargs):
+        config = {k: v for k, v in locals().items() if k not in ('kwargs',) and v is not None}
+        config.update(kwargs)
+        return Task('EXPORT_IMAGE', config)
+
+    @staticmethod
+    def toAsset(image, description='myExportImageTask', assetId=None, pyramidingPolicy=None, dimensions=None,
+                region=None, scale=None, crs=None, crsTransform=None, maxPixels=None, **kwargs):
+        config = {k: v for k, v in locals().items() if k not in ('kwargs',) and v is not None}
+        config.update(kwargs)
+        return Task('EXPORT_IMAGE', config)
+
+
+class _Export:
+    image = _ExportImage
+
+
+batch = types.SimpleNamespace(Export=_Export, Task=Task)
+
+
+class EEException(Exception):
+    """Erro retornado pelo servidor do Earth Engine."""
+
+
+def _unknown_task(task_id):
+    return {'id': task_id, 'state': 'UNKNOWN'}
+
+
+def getTaskStatus(taskId):
+    """Status de uma ou mais tarefas em uma única ida ao servidor."""
+    _round_trip('getTaskStatus')
+    ids = [taskId] if isinstance(taskId, str) else list(taskId)
+    return [TASKS[i]._status() if i in TASKS else _unknown_task(i) for i in ids]
+
+
+def getTaskList():
+    """Listagem de todas as tarefas do usuário em uma única ida ao servidor."""
+    _round_trip('getTaskList')
+    return [task._status() for task in reversed(TASKS.values())]
+
+
+data = types.SimpleNamespace(getTaskStatus=getTaskStatus, getTaskList=getTaskList)
+
+
+# -------------------------------------------
+# Autenticação e inicialização
+# -------------------------------------------
+
+def Authenticate(*args, **kwargs):
+    calls['Authenticate'] += 1
+
+
+def Initialize(*args, **kwargs):
+    calls['Initialize'] += 1
+
+
+def ServiceAccountCredentials(email, key_file=None, key_data=None):
+    return types.SimpleNamespace(service_account_email=email, key_file=key_file)
+
+
+# -------------------------------------------
+# Catálogo sintético
+# -------------------------------------------
+
+# Retângulo envolvente aproximado da Caatinga (lon/lat)
+CAATINGA_BBOX = [-45.0, -17.0, -35.0, -2.8]
+CAATINGA_ASSET = 'projects/ee-maxwellamaral-proj01/assets/MAPBIOMAS/caatinga'
+
+
+def add_synthetic_catalog(start='2017-01-01', end='2024-01-01', bbox=None, seed=0,
+                          landsat_grid=(4, 4), sentinel_grid=(6, 6)):
+    """Gera cenas Landsat 8 (revisita de 16 dias) e Sentinel-2 (5 dias) sobre a região."""
+    bbox = bbox or CAATINGA_BBOX
+    rng = random.Random(seed)
+    start_ms, end_ms = _millis(start), _millis(end)
+    ASSETS.setdefault(CAATINGA_ASSET, [(bbox, {'bioma': 'Caatinga'})])
+
+    def tiles(grid):
+        nx, ny = grid
+        width = (bbox[2] - bbox[0]) / nx
+        height = (bbox[3] - bbox[1]) / ny
+        for j in range(ny):
+            for i in range(nx):
+                x0, y0 = bbox[0] + i * width, bbox[1] + j * height
+                yield i, j, [x0, y0, x0 + width, y0 + height]
+
+    landsat = CATALOG.setdefault('LANDSAT/LC08/C02/T1_L2', [])
+    for i, j, tile_bbox in tiles(landsat_grid):
+        path, row = 214 + i, 62 + j
+        t = start_ms + rng.randrange(16) * 86400000
+        while t < end_ms:
+            date = datetime.datetime.fromtimestamp(t / 1000, datetime.timezone.utc).strftime('%Y%m%d')
+            landsat.append({
+                'id': f'LANDSAT/LC08/C02/T1_L2/LC08_{path:03d}{row:03d}_{date}',
+                'bbox': tile_bbox,
+                'bands': ['SR_B1', 'SR_B2', 'SR_B3', 'SR_B4', 'SR_B5', 'SR_B6', 'SR_B7', 'QA_PIXEL'],
+                'properties': {'system:time_start': t, 'CLOUD_COVER': round(rng.uniform(0, 100), 2),
+                               'WRS_PATH': path, 'WRS_ROW': row, 'system:version': 1},
+            })
+            t += 16 * 86400000
+
+    sentinel = CATALOG.setdefault('COPERNICUS/S2_SR_HARMONIZED', [])
+    for i, j, tile_bbox in tiles(sentinel_grid):
+        mgrs = f'{23 + i // 2}L{"ABCDEFGH"[j]}{"KLMNPQ"[i % 6]}'
+        t = start_ms + rng.randrange(5) * 86400000
+        while t < end_ms:
+            date = datetime.datetime.fromtimestamp(t / 1000, datetime.timezone.utc).strftime('%Y%m%dT%H%M%S')
+            sentinel.append({
+                'id': f'COPERNICUS/S2_SR_HARMONIZED/{date}_{date}_T{mgrs}',
+                'bbox': tile_bbox,
+                'bands': ['B2', 'B3', 'B4', 'B8', 'B11', 'B12', 'QA60', 'SCL'],
+                'properties': {'system:time_start': t, 'CLOUDY_PIXEL_PERCENTAGE': round(rng.uniform(0, 100), 2),
+                               'MGRS_TILE': mgrs, 'system:version': 1},
+            })
+            t += 5 * 86400000
+
+
+# -------------------------------------------
+# Registro do fake
+# -------------------------------------------
+
+class _FakeMap:
+    """Mapa do geemap que apenas registra as camadas (não gera HTML)."""
+
+    def __init__(self, *args, **kwargs):
+        self.layers = []
+
+    def set_center(self, *args, **kwargs):
+        pass
+
+    def centerObject(self, *args, **kwargs):
+        pass
+
+    def addLayer(self, ee_object, vis_params=None, name=None, *args, **kwargs):
+        self.layers.append(name)
+
+    def addLayerControl(self, *args, **kwargs):
+        pass
+
+    def to_html(self, filename=None, *args, **kwargs):
+        calls['geemap.to_html'] += 1
+
+
+def install(geemap=True):
+    """Registra este módulo como `ee` (e, opcionalmente, um `geemap` mínimo) em sys.modules."""
+    module = sys.modules[__name__]
+    sys.modules['ee'] = module
+    if geemap:
+        sys.modules['geemap'] = types.SimpleNamespace(Map=_FakeMap, __name__='geemap', __fake__=True)
+    return module
@@ -0,0 +1,161 @@
+"""
+Servidor HTTP local (fake) que serve os arquivos de um diretório, para testar
+o downloader.py sem rede.
+
+Atende GET/HEAD com HTTP/1.1 (conexões persistentes) e cabeçalho Range, e
+pode simular falhas: respostas 503 a cada N requisições e conexões cortadas
+depois de um certo número de bytes, para exercitar as novas tentativas e a
+retomada de arquivos parciais. Com `fallback`, qualquer nome inexistente
+recebe o mesmo arquivo (útil para os links gerados pelo fake_ee), e com
+`goog_hash` as respostas trazem o MD5 do arquivo em x-goog-hash, como o Cloud
+Storage.
+
+Uso:
+    with FileServer('exportados', error_every=5, drop_after=2 ** 20) as server:
+        download_files([server.url('cena.tif')], 'downloads')
+        print(server.requests, server.connections)
+"""
+
+import base64
+import collections
+import hashlib
+import http.server
+import os
+import re
+import threading
+import time
+
+_RANGE = re.compile(r'bytes=(\d+)-(\d*)$')
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.server.owner._count('connections')
+
+    def do_HEAD(self):
+        self._serve(body=False)
+
+    def do_GET(self):
+        self._serve(body=True)
+
+    def _serve(self, body):
+        owner = self.server.owner
+        number = owner._count('requests')
+        if owner.latency:
+            time.sleep(owner.latency)
+        path = os.path.join(owner.directory, os.path.basename(self.path.split('?')[0]))
+        if not os.path.isfile(path) and owner.fallback:
+            path = os.path.join(owner.directory, owner.fallback)
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+        if owner.error_every and number % owner.error_every == 0:
+            owner._count('errors')
+            self.send_response(503)
+            self.send_header('Retry-After', '0')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        match = _RANGE.match(self.headers.get('Range', ''))
+        if match and owner.ranges:
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else size - 1
+            if start >= size:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        else:
+            self.send_response(200)
+        length = end - start + 1
+        self.send_header('Content-Length', str(length))
+        self.send_header('Accept-Ranges', 'bytes' if owner.ranges else 'none')
+        if owner.goog_hash:
+            with open(path, 'rb') as f:
+                md5 = base64.b64encode(hashlib.md5(f.read()).digest()).decode('ascii')
+            self.send_header('x-goog-hash', f'md5={md5}')
+        self.end_headers()
+        if not body:
+            return
+
+        limit = owner.drop_after if owner.drop_after and owner._should_drop(path) else None
+        with open(path, 'rb') as f:
+            f.seek(start)
+            sent = 0
+            while sent < length:
+                data = f.read(min(64 * 1024, length - sent))
+                if limit is not None and sent + len(data) > limit:
+                    # Corta a conexão no meio da resposta
+                    self.wfile.write(data[:limit - sent])
+                    self.wfile.flush()
+                    owner._count('dropped')
+                    self.close_connection = True
+                    return
+                self.wfile.write(data)
+                sent += len(data)
+
+
+class FileServer:
+    """Servidor de arquivos em uma thread, em 127.0.0.1 e porta livre."""
+
+    def __init__(self, directory, error_every=0, drop_after=None, drops_per_file=1, latency=0.0, ranges=True,
+                 fallback=None, goog_hash=False):
+        self.directory = directory
+        self.goog_hash = goog_hash
+        self.fallback = fallback
+        self.error_every = error_every
+        self.drop_after = drop_after
+        self.drops_per_file = drops_per_file
+        self.latency = latency
+        self.ranges = ranges
+        self.stats = collections.Counter()
+        self._dropped = collections.Counter()
+        self._lock = threading.Lock()
+        self._server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.owner = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+            return self.stats[name]
+
+    def _should_drop(self, path):
+        with self._lock:
+            if self._dropped[path] >= self.drops_per_file:
+                return False
+            self._dropped[path] += 1
+            return True
+
+    @property
+    def requests(self):
+        return self.stats['requests']
+
+    @property
+    def connections(self):
+        return self.stats['connections']
+
+    def url(self, name):
+        host, port = self._server.server_address
+        return f'http://{host}:{port}/{name}'
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,314 @@
+"""
+Métricas de fragmentação da paisagem (equivalentes às do Fragstats, nível de
+classe) calculadas diretamente sobre os rasters de classes do MapBiomas ou da
+Scene Classification Layer (SCL) do Sentinel-2 (etapa 4 do projeto).
+
+O raster é percorrido uma única vez em blocos: cada bloco rotula as manchas
+da classe de interesse por segmentos de linha (run-length) e union-find, e
+devolve apenas a área de cada mancha, o comprimento de borda e os rótulos das
+suas bordas. Depois, as manchas que atravessam as bordas dos blocos são unidas
+em um union-find global. Blocos (e anos) podem ser processados em paralelo.
+
+Métricas (mesmas definições do Fragstats, com pixels em hectares reais, inclusive
+em EPSG:4326):
+    NP        número de manchas
+    PD        densidade de manchas (manchas / 100 ha)
+    PLAND     porcentagem da paisagem ocupada pela classe
+    LPI       índice da maior mancha (% da paisagem)
+    ED        densidade de borda (m/ha)
+    AREA_MN   área média das manchas (ha)
+    AREA_SD   desvio padrão da área das manchas (ha)
+
+Uso:
+    python fragmentation.py mapbiomas metricas.csv 2017=mapbiomas_2017.tif 2023=mapbiomas_2023.tif
+"""
+
+import concurrent.futures
+import csv
+import sys
+import time
+
+import numpy as np
+
+from instrumentation import traced
+from raster_io import Window, grid_windows, open_raster
+from tiling import METERS_PER_DEGREE
+
+# Classes de interesse e valor sem dado de cada fonte
+CLASS_PRESETS = {
+    # MapBiomas: formação florestal, savânica, mangue, floresta alagável e restinga arborizada
+    'mapbiomas': {'classes': (3, 4, 5, 6, 49), 'nodata': 0},
+    # SCL do Sentinel-2: vegetação
+    'scl': {'classes': (4,), 'nodata': 0},
+}
+
+# Lado do bloco de rotulagem, em pixels
+TILE_SIZE = 1024
+
+METRICS = ('NP', 'PD', 'PLAND', 'LPI', 'ED', 'AREA_MN', 'AREA_SD')
+
+
+def _union_find(count, left, right):
+    """
+    Componentes de um grafo com `count` nós e arestas (left, right); retorna a raiz de cada nó
+    (o menor nó do componente). Vetorizado: a cada rodada, a raiz maior de cada aresta passa a
+    apontar para a menor, e os ponteiros são encurtados (parent[parent]) até chegarem às raízes.
+    """
+    parent = np.arange(count, dtype=np.int64)
+    left = np.asarray(left, dtype=np.int64)
+    right = np.asarray(right, dtype=np.int64)
+    while len(left):
+        root_left, root_right = parent[left], parent[right]
+        pending = root_left != root_right
+        if not pending.any():
+            break
+        # Arestas já internas a um componente não precisam voltar nas próximas rodadas
+        left, right = left[pending], right[pending]
+        low = np.minimum(root_left[pending], root_right[pending])
+        high = np.maximum(root_left[pending], root_right[pending])
+        np.minimum.at(parent, high, low)
+        while True:
+            jumped = parent[parent]
+            if np.array_equal(jumped, parent):
+                break
+            parent = jumped
+    return parent
+
+
+def _runs(mask):
+    """Segmentos de pixels verdadeiros de cada linha: (linha, início, fim exclusivo), em ordem."""
+    height, width = mask.shape
+    padded = np.zeros((height, width + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    change = np.diff(padded, axis=1)
+    start_rows, starts = np.nonzero(change == 1)
+    _, ends = np.nonzero(change == -1)
+    return start_rows, starts, ends
+
+
+def _run_edges(rows, starts, ends, width, connectivity):
+    """Pares de segmentos de linhas consecutivas que se tocam (busca binária vetorizada)."""
+    stride = width + 2
+    reach = 1 if connectivity == 8 else 0
+    key_start = rows * stride + starts
+    key_end = rows * stride + ends
+    previous = (rows - 1) * stride
+    low = np.searchsorted(key_end, previous + starts - reach, side='right')
+    high = np.searchsorted(key_start, previous + ends + reach, side='left')
+    counts = np.maximum(high - low, 0)
+    current = np.repeat(np.arange(len(rows)), counts)
+    first = np.repeat(low, counts)
+    step = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return current, first + step
+
+
+def _row_geometry(transform, epsg, row_off, rows):
+    """Área do pixel (ha) no centro de cada linha e largura (m) na borda inferior de cada linha."""
+    x0, dx, _, y0, _, dy = transform
+    if epsg == 4326:
+        centers = np.radians(y0 + (row_off + np.arange(rows) + 0.5) * dy)
+        bottoms = np.radians(y0 + (row_off + np.arange(rows) + 1) * dy)
+        width_m = abs(dx) * METERS_PER_DEGREE
+        height_m = abs(dy) * METERS_PER_DEGREE
+        return width_m * height_m * np.cos(centers) / 1e4, width_m * np.cos(bottoms), height_m
+    return np.full(rows, abs(dx * dy) / 1e4), np.full(rows, abs(dx)), abs(dy)
+
+
+def _border(labels, rows, starts, ends, row, size):
+    """Rótulos dos pixels de uma linha do bloco (-1 fora da classe)."""
+    line = np.full(size, -1, dtype=np.int64)
+    selected = rows == row
+    for label, start, end in zip(labels[selected], starts[selected], ends[selected]):
+        line[start:end] = label
+    return line
+
+
+def label_tile(values, classes, nodata, connectivity, transform, epsg, window):
+    """
+    Rotula as manchas de um bloco (com uma linha e uma coluna extras à direita/abaixo,
+    usadas só para contar bordas) e resume o que é preciso para a junção global.
+    """
+    height, width = window.height, window.width
+    mask = np.isin(values, classes)
+    valid = values != nodata if nodata is not None else np.ones(values.shape, dtype=bool)
+    pixel_area, boundary_width, pixel_height = _row_geometry(transform, epsg, window.row_off, values.shape[0])
+
+    # Bordas classe/não classe entre pixels válidos (o pixel da esquerda/de cima pertence ao bloco)
+    horizontal = (mask[:height, :-1] != mask[:height, 1:]) & valid[:height, :-1] & valid[:height, 1:]
+    vertical = (mask[:-1, :width] != mask[1:, :width]) & valid[:-1, :width] & valid[1:, :width]
+    edge = horizontal.sum() * pixel_height + (vertical.sum(axis=1) * boundary_width[:vertical.shape[0]]).sum()
+
+    core = mask[:height, :width]
+    rows, starts, ends = _runs(core)
+    current, previous = _run_edges(rows, starts, ends, width, connectivity)
+    roots = _union_find(len(rows), current, previous)
+    _, labels = np.unique(roots, return_inverse=True)
+    labels = labels.reshape(-1)
+    areas = np.bincount(labels, weights=(ends - starts) * pixel_area[rows], minlength=labels.max() + 1 if len(labels) else 0)
+
+    left = np.full(height, -1, dtype=np.int64)
+    right = np.full(height, -1, dtype=np.int64)
+    left[rows[starts == 0]] = labels[starts == 0]
+    right[rows[ends == width]] = labels[ends == width]
+    landscape = (valid[:height, :width].sum(axis=1) * pixel_area[:height]).sum()
+    return {
+        'window': window,
+        'areas': areas,
+        'top': _border(labels, rows, starts, ends, 0, width),
+        'bottom': _border(labels, rows, starts, ends, height - 1, width),
+        'left': left,
+        'right': right,
+        'edge': float(edge),
+        'landscape': float(landscape),
+    }
+
+
+# Rasters abertos em cada processo (um por arquivo/ano)
+_open = {}
+
+
+def _tile_task(task):
+    year, path, window, classes, nodata, connectivity = task
+    if path not in _open:
+        _open[path] = open_raster(path, cache_blocks=16)
+    raster = _open[path]
+    extended = Window(window.col_off, window.row_off, min(window.width + 1, raster.width - window.col_off),
+                      min(window.height + 1, raster.height - window.row_off))
+    values = raster.read(bands=[1], window=extended)[0]
+    return year, label_tile(values, classes, nodata, connectivity, raster.transform, raster.epsg, window)
+
+
+def _border_pairs(a, b, connectivity):
+    """Pares de rótulos que se tocam entre duas bordas adjacentes (mesmo comprimento)."""
+    shifts = (0, -1, 1) if connectivity == 8 else (0,)
+    pairs = []
+    for shift in shifts:
+        if shift == 0:
+            first, second = a, b
+        elif shift < 0:
+            first, second = a[1:], b[:-1]
+        else:
+            first, second = a[:-1], b[1:]
+        touching = (first >= 0) & (second >= 0)
+        pairs.append(np.stack([first[touching], second[touching]], axis=1))
+    return np.unique(np.concatenate(pairs), axis=0)
+
+
+def merge_tiles(tiles, tile_size, connectivity=8):
+    """Junta os resultados dos blocos de um raster e calcula as métricas da paisagem."""
+    grid = {(t['window'].row_off // tile_size, t['window'].col_off // tile_size): t for t in tiles}
+    offsets, total = {}, 0
+    for key in sorted(grid):
+        offsets[key] = total
+        total += len(grid[key]['areas'])
+
+    left, right = [], []
+
+    def connect(key_a, key_b, side_a, side_b, index_a=None, index_b=None):
+        if key_b not in grid:
+            return
+        a, b = grid[key_a][side_a], grid[key_b][side_b]
+        if index_a is not None:
+            a, b = a[[index_a]], b[[index_b]]
+            pairs = np.array([[a[0], b[0]]]) if a[0] >= 0 and b[0] >= 0 else np.empty((0, 2), dtype=np.int64)
+        else:
+            pairs = _border_pairs(a, b, connectivity)
+        left.append(pairs[:, 0] + offsets[key_a])
+        right.append(pairs[:, 1] + offsets[key_b])
+
+    for (row, col) in grid:
+        connect((row, col), (row, col + 1), 'right', 'left')
+        connect((row, col), (row + 1, col), 'bottom', 'top')
+        if connectivity == 8:
+            connect((row, col), (row + 1, col + 1), 'bottom', 'top', -1, 0)
+            connect((row, col), (row + 1, col - 1), 'bottom', 'top', 0, -1)
+
+    areas = np.concatenate([grid[key]['areas'] for key in sorted(grid)]) if total else np.zeros(0)
+    edges = (np.concatenate(left), np.concatenate(right)) if left else (np.zeros(0, int), np.zeros(0, int))
+    roots = _union_find(total, *edges)
+    patches = np.bincount(roots, weights=areas, minlength=total)[np.unique(roots)] if total else np.zeros(0)
+
+    landscape = sum(t['landscape'] for t in tiles)
+    edge = sum(t['edge'] for t in tiles)
+    return landscape_metrics(patches, edge, landscape)
+
+
+def landscape_metrics(patches, edge, landscape):
+    """Métricas de classe a partir das áreas das manchas (ha), borda total (m) e área da paisagem (ha)."""
+    count = len(patches)
+    covered = float(patches.sum())
+    return {
+        'NP': count,
+        'PD': count / landscape * 100 if landscape else float('nan'),
+        'PLAND': covered / landscape * 100 if landscape else float('nan'),
+        'LPI': float(patches.max()) / landscape * 100 if count and landscape else 0.0,
+        'ED': edge / landscape if landscape else float('nan'),
+        'AREA_MN': covered / count if count else 0.0,
+        'AREA_SD': float(patches.std()) if count else 0.0,
+        'landscape_ha': landscape,
+    }
+
+
+@traced('fragmentacao')
+def fragmentation_by_year(paths_by_year, preset='mapbiomas', classes=None, nodata=None, connectivity=8,
+                          tile_size=TILE_SIZE, workers=0):
+    """
+    Métricas de fragmentação de vários anos ({ano: raster}); os blocos de todos os
+    anos entram no mesmo pool de processos. Retorna {ano: métricas}.
+    """
+    settings = CLASS_PRESETS[preset]
+    classes = tuple(classes or settings['classes'])
+    nodata = settings['nodata'] if nodata is None else nodata
+
+    tasks = []
+    for year, path in paths_by_year.items():
+        with open_raster(path) as raster:
+            for window in grid_windows(raster.width, raster.height, tile_size):
+                tasks.append((year, path, window, classes, nodata, connectivity))
+
+    start = time.perf_counter()
+    results = {year: [] for year in paths_by_year}
+    if workers and workers > 1:
+        with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+            for year, tile in pool.map(_tile_task, tasks, chunksize=4):
+                results[year].append(tile)
+    else:
+        for task in tasks:
+            year, tile = _tile_task(task)
+            results[year].append(tile)
+        for raster in _open.values():
+            raster.close()
+        _open.clear()
+
+    metrics = {year: merge_tiles(tiles, tile_size, connectivity) for year, tiles in results.items()}
+    seconds = time.perf_counter() - start
+    print(f"Fragmentação de {len(paths_by_year)} ano(s), {len(tasks)} bloco(s), em {seconds:.1f} s.")
+    return metrics
+
+
+def fragmentation_metrics(path, preset='mapbiomas', **options):
+    """Métricas de fragmentação de um único raster de classes."""
+    return fragmentation_by_year({None: path}, preset, **options)[None]
+
+
+def write_metrics_csv(metrics_by_year, csv_path):
+    with open(csv_path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(('ano',) + METRICS)
+        for year, metrics in sorted(metrics_by_year.items()):
+            writer.writerow((year,) + tuple(metrics[name] for name in METRICS))
+
+
+def main():
+    if len(sys.argv) < 4:
+        print("Uso: python fragmentation.py <mapbiomas|scl> metricas.csv ano=raster.tif [...]")
+        return
+    paths = dict(argument.split('=', 1) for argument in sys.argv[3:])
+    metrics = fragmentation_by_year(paths, preset=sys.argv[1])
+    for year, values in sorted(metrics.items()):
+        print(year, ', '.join(f"{name}={values[name]:.4g}" for name in METRICS))
+    write_metrics_csv(metrics, sys.argv[2])
+
+
+if __name__ == "__main__":
+    main()
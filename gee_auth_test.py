@@ -1,3 +1,4 @@
-import ee
-ee.Authenticate()  # Inicia o processo de autenticação (com force=True ele força a reautenticação)
-ee.Initialize(project='analise-satelite-projeto-01')    # Inicializa a sessão do GEE
+from init import initialize
+
+# Autentica (só se ainda não há credenciais salvas; com force=True força a reautenticação) e inicializa a sessão
+initialize()
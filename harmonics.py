@@ -0,0 +1,290 @@
+"""
+Modelo harmônico (série de Fourier) por pixel para separar a sazonalidade do
+NDVI da tendência de degradação.
+
+Cada série é ajustada por mínimos quadrados a
+
+    ndvi(t) = c0 + trend * (t - t0) + soma_k [cos_k * cos(2πkt) + sin_k * sin(2πkt)]
+
+com t em anos decimais e k = 1..harmônicos (ciclo anual, semestral...), a
+mesma base de cossenos da planilha "Cossenos discretos.xlsx". Como as datas
+são irregulares e cada pixel tem suas falhas (nuvens), não há uma DCT direta:
+a matriz de projeto X e os produtos x_t x_tᵀ de cada data são calculados uma
+vez por conjunto de datas, e as equações normais de todos os pixels de um
+lote saem de dois produtos de matrizes (validade @ XX e série @ X), resolvidas
+em lote. A inclinação `trend` já descontada a sazonalidade é a tendência
+residual.
+
+Saídas: um raster de resumo (summary_bands(): nível, tendência residual e seu
+erro padrão, amplitude e fase de cada harmônico, RMSE e contagem) e,
+opcionalmente, os coeficientes em int16 quantizado (quantized.py), que
+reconstroem a série em qualquer data com reconstruct() ocupando uma fração
+da pilha original. Coeficientes fora da faixa do int16 (±3,2767, por exemplo
+a tendência de séries muito curtas) são saturados; o relatório de
+build_harmonics() conta quantos pixels de cada coeficiente foram afetados.
+
+Uso:
+    python harmonics.py resumo.tif 'ndvi/Landsat_*.tif' [coeficientes.tif] [harmônicos] [processos]
+"""
+
+import datetime
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+
+from composite import StackReader, stack_grid
+from instrumentation import traced
+from quantized import count_saturated, quantize, writer_options
+from raster_io import RasterWriter, grid_windows, map_windows, open_raster
+from trend import MIN_OBSERVATIONS, date_from_name, decimal_year
+
+# Número padrão de harmônicos (anual e semestral)
+HARMONICS = 2
+
+# Memória máxima dos arrays de um lote (datas x pixels e equações normais em float64)
+FIT_MEMORY = 128 * 2 ** 20
+
+# Janela de leitura e tile dos rasters de saída
+BLOCK_SIZE = 256
+
+# Esquema de quantização dos coeficientes
+COEFFICIENT_SCHEME = 'int16'
+
+
+def coefficient_names(harmonics):
+    names = ['c0', 'trend']
+    for k in range(1, harmonics + 1):
+        names += [f'cos_{k}', f'sin_{k}']
+    return names
+
+
+def summary_bands(harmonics):
+    """Bandas do raster de resumo."""
+    bands = ['mean', 'trend', 'trend_se']
+    for k in range(1, harmonics + 1):
+        bands += [f'amplitude_{k}', f'phase_{k}']
+    return bands + ['rmse', 'count']
+
+
+def design_matrix(years, harmonics, t0):
+    """Matriz de projeto (datas x coeficientes) na ordem de coefficient_names()."""
+    years = np.asarray(years, dtype=np.float64)
+    columns = [np.ones_like(years), years - t0]
+    for k in range(1, harmonics + 1):
+        angle = 2 * np.pi * k * years
+        columns += [np.cos(angle), np.sin(angle)]
+    return np.stack(columns, axis=1)
+
+
+def batch_size_for(steps, coefficients, memory=FIT_MEMORY):
+    """Pixels por lote: série e pesos (datas) mais as equações normais (coeficientes²), em float64."""
+    per_pixel = 8 * (3 * steps + 3 * coefficients * coefficients)
+    return max(1024, memory // per_pixel)
+
+
+def fit_batch(values, X, XX, min_observations):
+    """
+    Ajusta o modelo a um lote de séries `values` (datas x pixels, NaN = sem dado).
+    Retorna (coeficientes (pixels x P), erro padrão da tendência, RMSE, contagem).
+    """
+    steps, count = values.shape
+    P = X.shape[1]
+    valid = ~np.isnan(values)
+    weights = valid.astype(np.float64)
+    series = np.where(valid, values, 0.0)
+    observations = weights.sum(axis=0)
+
+    # Equações normais de todos os pixels de uma vez: XᵀWX = validade @ (x_t x_tᵀ) e XᵀWy = y @ X
+    normal = (weights.T @ XX).reshape(count, P, P)
+    rhs = series.T @ X
+    enough = observations >= min_observations
+    normal[~enough] = np.eye(P)
+    try:
+        inverse = np.linalg.inv(normal)
+    except np.linalg.LinAlgError:
+        # Algum pixel com datas degeneradas (ex.: todas na mesma época do ano)
+        inverse = np.linalg.pinv(normal, hermitian=True)
+    coefficients = np.einsum('npq,nq->np', inverse, rhs)
+
+    residuals = np.where(valid, series - X @ coefficients.T, 0.0)
+    rss = (residuals * residuals).sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = rss / (observations - P)
+        trend_se = np.sqrt(variance * inverse[:, 1, 1])
+        rmse = np.sqrt(rss / observations)
+    coefficients[~enough] = np.nan
+    trend_se[~enough] = np.nan
+    rmse[~enough] = np.nan
+    return coefficients, trend_se, rmse, observations
+
+
+def summarize(coefficients, trend_se, rmse, observations, harmonics):
+    """Bandas de resumo (bandas x pixels) a partir dos coeficientes."""
+    rows = [coefficients[:, 0], coefficients[:, 1], trend_se]
+    for k in range(harmonics):
+        a, b = coefficients[:, 2 + 2 * k], coefficients[:, 3 + 2 * k]
+        rows += [np.hypot(a, b), np.arctan2(b, a)]
+    return np.stack(rows + [rmse, observations])
+
+
+def harmonic_window(stack, X, XX, batch, harmonics, min_observations):
+    """Resumo e coeficientes de uma janela (datas x linhas x colunas), em lotes de `batch` pixels."""
+    steps, height, width = stack.shape
+    series = stack.reshape(steps, -1)
+    P = X.shape[1]
+    summary = np.empty((len(summary_bands(harmonics)), height * width), dtype=np.float32)
+    coefficients = np.empty((P, height * width), dtype=np.float32)
+    for start in range(0, height * width, batch):
+        part = slice(start, start + batch)
+        values = series[:, part].astype(np.float64)
+        coef, trend_se, rmse, observations = fit_batch(values, X, XX, min_observations)
+        summary[:, part] = summarize(coef, trend_se, rmse, observations, harmonics)
+        coefficients[:, part] = coef.T
+    return summary.reshape(-1, height, width), coefficients.reshape(P, height, width)
+
+
+# Estado de cada processo do pool
+_worker = {}
+
+
+def _init_worker(paths, X, XX, batch, harmonics, min_observations):
+    _worker['reader'] = StackReader(paths, BLOCK_SIZE)
+    _worker['params'] = (X, XX, batch, harmonics, min_observations)
+
+
+def _worker_window(window):
+    return (window,) + harmonic_window(_worker['reader'].read(window), *_worker['params'])
+
+
+@traced('harmonicos')
+def build_harmonics(paths, out_path, coefficients_path=None, dates=None, harmonics=HARMONICS, workers=0,
+                    min_observations=None, memory=FIT_MEMORY, compress='deflate'):
+    """
+    Ajusta o modelo harmônico às cenas de NDVI (mesma grade) e grava o resumo em `out_path`
+    (bandas de summary_bands()) e, se pedido, os coeficientes quantizados em `coefficients_path`.
+    As datas vêm de `dates` ou do nome de cada arquivo.
+    """
+    if isinstance(paths, str):
+        paths = sorted(glob.glob(paths))
+    if not paths:
+        raise ValueError("Nenhuma cena encontrada para o modelo harmônico.")
+    dates = list(dates) if dates is not None else [date_from_name(path) for path in paths]
+    order = sorted(range(len(paths)), key=lambda i: dates[i])
+    paths = [paths[i] for i in order]
+    years = np.array([decimal_year(dates[i]) for i in order])
+
+    # t0 no meio do período: c0 é o nível médio e a matriz fica bem condicionada
+    t0 = round(float(years.mean()), 4)
+    X = design_matrix(years, harmonics, t0)
+    P = X.shape[1]
+    XX = (X[:, :, None] * X[:, None, :]).reshape(len(years), P * P)
+    if min_observations is None:
+        min_observations = max(MIN_OBSERVATIONS, P + 2)
+    batch = batch_size_for(len(paths), P, memory)
+
+    width, height, transform, epsg = stack_grid(paths)
+    print(f"Modelo harmônico ({harmonics} harmônico(s), {P} coeficientes) de {len(paths)} cenas "
+          f"({years[0]:.2f} a {years[-1]:.2f}), {width}x{height} pixels, lotes de {batch} pixels.")
+
+    start = time.perf_counter()
+    model = {'t0': t0, 'harmonics': harmonics,
+             'model': 'c0 + trend * (t - t0) + sum_k(cos_k * cos(2 pi k t) + sin_k * sin(2 pi k t))'}
+    bands, names = summary_bands(harmonics), coefficient_names(harmonics)
+    writer = RasterWriter(out_path, width, height, count=len(bands), dtype='float32', transform=transform,
+                          epsg=epsg, nodata=float('nan'), block_size=BLOCK_SIZE, compress=compress, metadata=model,
+                          band_metadata=[{'description': band} for band in bands])
+    coefficient_writer = None
+    if coefficients_path:
+        coefficient_writer = RasterWriter(coefficients_path, width, height, count=P, transform=transform, epsg=epsg,
+                                          block_size=BLOCK_SIZE, compress=compress, metadata=model,
+                                          **writer_options(COEFFICIENT_SCHEME, names))
+    saturated = np.zeros(P, dtype=np.int64)
+
+    def write(window, summary, coefficients):
+        writer.write(summary, window)
+        if coefficient_writer is not None:
+            saturated[:] += count_saturated(coefficients, COEFFICIENT_SCHEME, axis=(1, 2))
+            coefficient_writer.write(quantize(coefficients, COEFFICIENT_SCHEME), window)
+
+    windows = grid_windows(width, height, BLOCK_SIZE)
+    params = (X, XX, batch, harmonics, min_observations)
+    if workers and workers > 1:
+        for result in map_windows(_worker_window, windows, workers, _init_worker, (paths,) + params):
+            write(*result)
+    else:
+        reader = StackReader(paths, BLOCK_SIZE)
+        try:
+            for window in windows:
+                write(window, *harmonic_window(reader.read(window), *params))
+        finally:
+            reader.close()
+    writer.close()
+
+    seconds = time.perf_counter() - start
+    pixels = width * height
+    report = {'pixels': pixels, 'scenes': len(paths), 'seconds': seconds}
+    print(f"Modelo harmônico concluído em {seconds:.1f} s ({pixels / max(seconds, 1e-9):,.0f} pixels/s).")
+    if coefficient_writer is not None:
+        coefficient_writer.close()
+        stack_bytes = sum(os.path.getsize(path) for path in paths)
+        report['stack_bytes'] = stack_bytes
+        report['coefficient_bytes'] = os.path.getsize(coefficients_path)
+        # Pixels em que cada coeficiente saiu da faixa do esquema e foi gravado saturado
+        report['saturated'] = dict(zip(names, saturated.tolist()))
+        print(f"Coeficientes em {coefficients_path}: {report['coefficient_bytes'] / 1e6:.1f} MB "
+              f"(pilha de {stack_bytes / 1e6:.1f} MB, {stack_bytes / max(report['coefficient_bytes'], 1):.0f}x menor)")
+        if saturated.any():
+            counts = ', '.join(f'{name}: {count}' for name, count in report['saturated'].items() if count)
+            print(f"Aviso: coeficientes fora da faixa do {COEFFICIENT_SCHEME} foram saturados ({counts} pixels).")
+    return report
+
+
+def reconstruct(coefficients_path, date, out_path=None, seasonal_only=False, block_size=BLOCK_SIZE,
+                compress='deflate'):
+    """
+    NDVI modelado em uma data a partir dos coeficientes. Com `seasonal_only=True` fica só a
+    sazonalidade (sem nível nem tendência). Sem `out_path`, retorna o array.
+    """
+    if isinstance(date, str):
+        date = datetime.datetime.fromisoformat(date)
+    with open_raster(coefficients_path) as raster:
+        t0, harmonics = float(raster.metadata['t0']), int(raster.metadata['harmonics'])
+        x = design_matrix([decimal_year(date)], harmonics, t0)[0].astype(np.float32)
+        if seasonal_only:
+            x[:2] = 0
+        result = None if out_path else np.empty((raster.height, raster.width), dtype=np.float32)
+        writer = None
+        if out_path:
+            writer = RasterWriter(out_path, raster.width, raster.height, dtype='float32', transform=raster.transform,
+                                  epsg=raster.epsg, nodata=float('nan'), block_size=block_size, compress=compress,
+                                  band_metadata=[{'description': f'NDVI {date:%Y-%m-%d}'}])
+        for window in grid_windows(raster.width, raster.height, block_size):
+            block = np.zeros((window.height, window.width), dtype=np.float32)
+            for band in range(raster.count):
+                if x[band]:
+                    block += x[band] * raster.read_values(band + 1, window)
+            if writer is not None:
+                writer.write(block, window)
+            else:
+                result[window.row_off:window.row_off + window.height,
+                       window.col_off:window.col_off + window.width] = block
+        if writer is not None:
+            writer.close()
+    return result
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("Uso: python harmonics.py resumo.tif 'ndvi_*.tif' [coeficientes.tif] [harmônicos] [processos]")
+        return
+    coefficients_path = sys.argv[3] if len(sys.argv) > 3 else None
+    harmonics = int(sys.argv[4]) if len(sys.argv) > 4 else HARMONICS
+    workers = int(sys.argv[5]) if len(sys.argv) > 5 else 0
+    build_harmonics(sys.argv[2], sys.argv[1], coefficients_path, harmonics=harmonics, workers=workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,51 @@
+"""
+Credenciais e inicialização do Earth Engine.
+
+initialize() inicializa a sessão uma única vez por processo: chamadas
+seguintes (de outros módulos ou subcomandos) não repetem o trabalho, e
+ee.Authenticate() só roda quando ainda não há credenciais salvas pelo
+`earthengine authenticate`, em vez de a cada execução.
+
+Uso:
+    from init import initialize
+    initialize()                          # credenciais do usuário (projeto padrão)
+    initialize(service_account=True)      # conta de serviço (arquivo de chave)
+"""
+
+import os
+
 import ee
 
+# Projeto do Google Cloud usado nas inicializações
+PROJECT = 'analise-satelite-projeto-01'
+
+# Conta de serviço e arquivo de chave
+SERVICE_ACCOUNT = "analise-satelite@analise-satelite-projeto-01.iam.gserviceaccount.com"
+KEY_FILE = ".analise-satelite-projeto-01-e926fdb56ea9.json"
+
+# Credenciais do usuário gravadas pelo ee.Authenticate() (earthengine authenticate)
+CREDENTIALS_PATH = os.path.expanduser(os.path.join('~', '.config', 'earthengine', 'credentials'))
+
+_session = None
+
 
 class GEE:
     def __init__(self):
-        self.service_account = (
-            "analise-satelite@analise-satelite-projeto-01.iam.gserviceaccount.com"
-        )
-        self.credentials = ee.ServiceAccountCredentials(
-            self.service_account, ".analise-satelite-projeto-01-e926fdb56ea9.json"
-        )
+        self.service_account = SERVICE_ACCOUNT
+        self.credentials = ee.ServiceAccountCredentials(self.service_account, KEY_FILE)
+
+
+def initialize(project=PROJECT, service_account=False, force=False):
+    """Inicializa o Earth Engine uma vez por processo; retorna a forma usada ('service_account' ou 'user')."""
+    global _session
+    mode = 'service_account' if service_account else 'user'
+    if _session == mode and not force:
+        return _session
+    if service_account:
+        ee.Initialize(GEE().credentials)
+    else:
+        if force or not os.path.exists(CREDENTIALS_PATH):
+            ee.Authenticate(force=force)
+        ee.Initialize(project=project)
+    _session = mode
+    return _session
@@ -0,0 +1,336 @@
+"""
+Instrumentação das chamadas ao Earth Engine e das etapas de processamento local.
+
+Quando ligada, as chamadas do cliente ee que vão ao servidor (getInfo,
+getDownloadURL, task.start, getTaskList...) passam a ser medidas em spans, com
+o tamanho da requisição e da resposta; as tarefas que chegam a um estado final
+têm o tempo de fila e de execução registrado a partir dos próprios status. As
+etapas locais são medidas com `span()` ou com o decorador `traced()`. Cada span
+vira uma linha JSON no arquivo de trace e, na saída do programa, uma tabela
+resume contagens, tempos e bytes por nome.
+
+Desligada (o padrão), nada é substituído no módulo ee e `span()`/`traced()`
+custam apenas a verificação de uma variável global.
+
+Uso:
+    EE_TRACE=trace.jsonl python export_all_images.py
+
+    instrumentation.enable('trace.jsonl')
+    with instrumentation.span('selecao', cenas=len(scenes)):
+        ...
+
+    @instrumentation.traced('ndvi')
+    def compute_ndvi(...):
+        ...
+"""
+
+import atexit
+import collections
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+
+# Arquivo de trace lido do ambiente por enable_from_env() (vazio: desligado)
+TRACE_PATH = os.environ.get('EE_TRACE')
+
+# Chamadas do cliente ee que vão ao servidor: (objeto dentro do módulo ee, método, nome do span)
+EE_CALLS = (
+    ('ComputedObject', 'getInfo', 'ee.getInfo'),
+    ('Image', 'getDownloadURL', 'ee.getDownloadURL'),
+    ('Image', 'getThumbURL', 'ee.getThumbURL'),
+    ('batch.Task', 'start', 'ee.task.start'),
+    ('batch.Task', 'status', 'ee.task.status'),
+    ('batch.Task', 'cancel', 'ee.task.cancel'),
+    ('data', 'getTaskList', 'ee.getTaskList'),
+    ('data', 'getTaskStatus', 'ee.getTaskStatus'),
+)
+
+# Estados finais das tarefas (a partir dos quais os tempos de fila/execução são registrados)
+TERMINAL_STATES = ('COMPLETED', 'FAILED', 'CANCELLED')
+
+_tracer = None
+
+
+def _payload_size(value):
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return None
+
+
+class _Stat:
+    __slots__ = ('count', 'errors', 'total', 'max', 'bytes')
+
+    def __init__(self):
+        self.count = self.errors = self.bytes = 0
+        self.total = self.max = 0.0
+
+    def add(self, seconds, error=False, size=0):
+        self.count += 1
+        self.errors += bool(error)
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.bytes += size or 0
+
+
+class Span:
+    """Intervalo medido; atributos extras podem ser acrescentados com set() antes do fim."""
+
+    __slots__ = ('tracer', 'name', 'kind', 'attrs', 'id', 'parent', 'start')
+
+    def __init__(self, tracer, name, kind, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.kind = kind
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.id, self.parent = self.tracer._push()
+        self.start = self.tracer.clock()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = self.tracer.clock() - self.start
+        self.tracer._pop()
+        if exc is not None:
+            self.attrs['error'] = f'{exc_type.__name__}: {exc}'
+        self.tracer.record(self.name, self.kind, self.start, seconds, span_id=self.id, parent=self.parent,
+                           **self.attrs)
+        return False
+
+
+class _NullSpan:
+    """Span usado com a instrumentação desligada."""
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """Coleta os spans, grava o trace em JSON lines e mantém o resumo por nome."""
+
+    def __init__(self, path=None, clock=None):
+        self.path = path
+        self.clock = clock or time.perf_counter
+        self.origin = self.clock()
+        self.stats = collections.defaultdict(_Stat)
+        self.tasks_seen = set()
+        self._file = open(path, 'w', encoding='utf-8') if path else None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._next_id = 0
+        self._patched = []
+
+    def _push(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        with self._lock:
+            self._next_id += 1
+            span_id = self._next_id
+        parent = stack[-1] if stack else None
+        stack.append(span_id)
+        return span_id, parent
+
+    def _pop(self):
+        self._local.stack.pop()
+
+    def record(self, name, kind, start, seconds, **attrs):
+        size = (attrs.get('request_bytes') or 0) + (attrs.get('response_bytes') or 0) + (attrs.get('bytes') or 0)
+        with self._lock:
+            self.stats[(kind, name)].add(seconds, 'error' in attrs, size)
+            if self._file is not None:
+                entry = {'name': name, 'kind': kind, 'start': round(start - self.origin, 6),
+                         'seconds': round(seconds, 6), 'thread': threading.current_thread().name}
+                entry.update(attrs)
+                self._file.write(json.dumps(entry, default=str) + '\n')
+
+    def event(self, name, kind='event', **attrs):
+        """Registro pontual (sem duração), como um erro ou uma marca no trace."""
+        self.record(name, kind, self.clock(), 0.0, **attrs)
+
+    def observe_tasks(self, statuses):
+        """Registra fila e execução das tarefas que chegaram a um estado final (uma vez por tarefa)."""
+        for status in statuses:
+            task_id = status.get('id')
+            if status.get('state') not in TERMINAL_STATES or task_id in self.tasks_seen:
+                continue
+            self.tasks_seen.add(task_id)
+            created = status.get('creation_timestamp_ms')
+            started = status.get('start_timestamp_ms')
+            updated = status.get('update_timestamp_ms')
+            attrs = {'task': task_id, 'state': status['state'], 'description': status.get('description')}
+            if status['state'] != 'COMPLETED':
+                attrs['error'] = status.get('error_message', status['state'])
+            if created and started:
+                self.record('task.queue', 'task', self.clock(), (started - created) / 1000, **attrs)
+            if started and updated:
+                self.record('task.run', 'task', self.clock(), (updated - started) / 1000, **attrs)
+
+    def patch_ee(self, ee_module):
+        """Substitui as chamadas de EE_CALLS por versões medidas (desfeito em unpatch_ee)."""
+        for owner_path, method, name in EE_CALLS:
+            owner = ee_module
+            for part in owner_path.split('.'):
+                owner = getattr(owner, part, None)
+            original = getattr(owner, method, None) if owner is not None else None
+            if original is None or getattr(original, '_traced', False):
+                continue
+            wrapper = self._wrap_ee(original, name, is_method=not owner_path == 'data')
+            setattr(owner, method, wrapper)
+            self._patched.append((owner, method, original))
+
+    def _wrap_ee(self, function, name, is_method):
+        tracer = self
+
+        @functools.wraps(function)
+        def call(*args, **kwargs):
+            with Span(tracer, name, 'ee', {}) as span:
+                if is_method and name == 'ee.getInfo' and hasattr(args[0], 'serialize'):
+                    span.set(request_bytes=len(args[0].serialize()))
+                result = function(*args, **kwargs)
+                span.set(response_bytes=_payload_size(result))
+            if name in ('ee.getTaskList', 'ee.getTaskStatus'):
+                tracer.observe_tasks(result)
+            elif name == 'ee.task.status':
+                tracer.observe_tasks([result])
+            return result
+
+        call._traced = True
+        return call
+
+    def unpatch_ee(self):
+        for owner, method, original in reversed(self._patched):
+            setattr(owner, method, original)
+        self._patched.clear()
+
+    def summary_rows(self):
+        rows = []
+        for (kind, name), stat in self.stats.items():
+            rows.append({'name': name, 'kind': kind, 'count': stat.count, 'errors': stat.errors,
+                         'total_seconds': stat.total, 'mean_seconds': stat.total / stat.count,
+                         'max_seconds': stat.max, 'bytes': stat.bytes})
+        rows.sort(key=lambda row: -row['total_seconds'])
+        return rows
+
+    def print_summary(self, file=None):
+        file = file or sys.stdout
+        rows = self.summary_rows()
+        if not rows:
+            return
+        print(f"{'Nome':<28} {'Tipo':<6} {'Chamadas':>9} {'Erros':>6} {'Total (s)':>10} {'Média (s)':>10} "
+              f"{'Máx. (s)':>10} {'MB':>8}", file=file)
+        for row in rows:
+            print(f"{row['name'][:28]:<28} {row['kind']:<6} {row['count']:>9} {row['errors']:>6} "
+                  f"{row['total_seconds']:>10.2f} {row['mean_seconds']:>10.3f} "
+                  f"{row['max_seconds']:>10.3f} {row['bytes'] / 1e6:>8.2f}", file=file)
+
+    def close(self):
+        self.unpatch_ee()
+        if self._file is not None:
+            with self._lock:
+                self._file.write(json.dumps({'summary': self.summary_rows()}) + '\n')
+                self._file.close()
+                self._file = None
+
+
+def enable(path=None, clock=None, ee_module=None, summary=True):
+    """Liga a instrumentação (substitui as chamadas do ee) e retorna o Tracer."""
+    global _tracer
+    if _tracer is not None:
+        return _tracer
+    if ee_module is None:
+        import ee as ee_module
+    _tracer = Tracer(path, clock)
+    _tracer.patch_ee(ee_module)
+    atexit.register(disable, summary)
+    return _tracer
+
+
+def enable_from_env():
+    """Liga a instrumentação se EE_TRACE estiver definida; senão não faz nada."""
+    if TRACE_PATH:
+        return enable(TRACE_PATH)
+    return None
+
+
+def disable(summary=False):
+    """Desliga a instrumentação, fecha o trace e, opcionalmente, mostra o resumo."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is None:
+        return
+    tracer.close()
+    if summary:
+        tracer.print_summary()
+        if tracer.path:
+            print(f"Trace gravado em {tracer.path}")
+
+
+def enabled():
+    return _tracer is not None
+
+
+def span(name, kind='stage', **attrs):
+    """Context manager que mede um trecho; sem custo além de um teste quando desligado."""
+    if _tracer is None:
+        return _NULL_SPAN
+    return Span(_tracer, name, kind, attrs)
+
+
+def traced(name=None, kind='stage'):
+    """Decorador que mede cada chamada da função como um span."""
+    def decorator(function):
+        span_name = name or function.__qualname__
+
+        @functools.wraps(function)
+        def call(*args, **kwargs):
+            if _tracer is None:
+                return function(*args, **kwargs)
+            with Span(_tracer, span_name, kind, {}):
+                return function(*args, **kwargs)
+        return call
+    return decorator
+
+
+def error(exc, **attrs):
+    """Registra uma exceção (tipo, mensagem e traceback) no trace."""
+    if _tracer is not None:
+        _tracer.event('erro', kind='error', error=f'{type(exc).__name__}: {exc}',
+                      traceback=''.join(traceback.format_exception(type(exc), exc, exc.__traceback__)), **attrs)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Uso: python instrumentation.py trace.jsonl  (mostra o resumo de um trace gravado)")
+        return
+    tracer = Tracer()
+    with open(sys.argv[1], encoding='utf-8') as f:
+        for line in f:
+            entry = json.loads(line)
+            if 'summary' in entry:
+                continue
+            tracer.stats[(entry['kind'], entry['name'])].add(
+                entry['seconds'], 'error' in entry,
+                sum(entry.get(key) or 0 for key in ('request_bytes', 'response_bytes', 'bytes')))
+    tracer.print_summary()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+NDVI local sobre GeoTIFFs exportados, equivalente ao calculate_ndvi() do
+projeto-01b.py ((NIR - Red) / (NIR + Red)), processado em janelas alinhadas.
+
+As duas bandas são lidas janela a janela (por memmap quando o arquivo não é
+comprimido, ou bloco a bloco pelo raster_io), o cálculo é feito em float32
+sobre buffers pré-alocados e o resultado é gravado direto no disco. O pico de
+memória depende do tamanho do bloco, não do tamanho da cena.
+
+Uso:
+    python local_ndvi.py landsat8 cena.tif ndvi.tif [processos]
+"""
+
+import math
+import sys
+import time
+
+import numpy as np
+
+from instrumentation import traced
+from quantized import quantize as quantize_block, writer_options
+from raster_io import RasterWriter, grid_windows, map_windows, open_raster
+
+# Bloco padrão de processamento (também o tile interno do arquivo de saída)
+BLOCK_SIZE = 512
+
+# Posição das bandas NIR/Red nos arquivos exportados (ordem de SENSORS[...]['bands'] do scene_manifest)
+# e fatores de escala da reflectância de superfície de cada coleção
+NDVI_PRESETS = {
+    'landsat8': {'nir_band': 1, 'red_band': 2, 'scale': 0.0000275, 'offset': -0.2},
+    'sentinel2': {'nir_band': 1, 'red_band': 2, 'scale': 0.0001, 'offset': 0.0},
+}
+
+
+class _Workspace:
+    """Buffers reutilizados em todos os blocos (nenhum temporário float64)."""
+
+    def __init__(self, block_size, dtype):
+        shape = (block_size, block_size)
+        self.raw = np.empty((2,) + shape, dtype=dtype)
+        self.nir = np.empty(shape, dtype=np.float32)
+        self.red = np.empty(shape, dtype=np.float32)
+        self.total = np.empty(shape, dtype=np.float32)
+        self.invalid = np.empty(shape, dtype=bool)
+        self.out = np.empty(shape, dtype=np.float32)
+
+    def view(self, name, height, width):
+        return getattr(self, name)[:height, :width]
+
+
+def ndvi_block(nir, red, out, workspace, nodata=None, scale=None, offset=None):
+    """Calcula o NDVI de um bloco em `out` (float32); pixels sem dado ficam NaN."""
+    height, width = out.shape
+    nir32, red32 = workspace.view('nir', height, width), workspace.view('red', height, width)
+    total, invalid = workspace.view('total', height, width), workspace.view('invalid', height, width)
+
+    if nodata is not None and not (isinstance(nodata, float) and math.isnan(nodata)):
+        np.equal(nir, nodata, out=invalid)
+        invalid |= red == nodata
+    else:
+        invalid.fill(False)
+
+    np.copyto(nir32, nir, casting='unsafe')
+    np.copyto(red32, red, casting='unsafe')
+    if scale is not None:
+        for band in (nir32, red32):
+            band *= np.float32(scale)
+            band += np.float32(offset or 0.0)
+
+    np.add(nir32, red32, out=total)
+    np.subtract(nir32, red32, out=out)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        np.divide(out, total, out=out)
+    # NaN de entrada se propaga; soma zero e nodata viram NaN
+    invalid |= total == 0
+    out[invalid] = np.nan
+    return out
+
+
+class _BandReader:
+    """Lê as bandas NIR/Red de uma janela, por memmap quando possível."""
+
+    def __init__(self, path, bands, block_size):
+        self.raster = open_raster(path)
+        self.bands = bands
+        maps = [self.raster.memmap(band) for band in bands]
+        self.maps = maps if all(m is not None for m in maps) else None
+        self.workspace = _Workspace(block_size, self.raster.dtype)
+
+    def read(self, window):
+        if self.maps:
+            rows = slice(window.row_off, window.row_off + window.height)
+            cols = slice(window.col_off, window.col_off + window.width)
+            return [band_map[rows, cols] for band_map in self.maps]
+        raw = self.workspace.raw[:, :window.height, :window.width]
+        self.raster.read(bands=self.bands, window=window, out=raw)
+        return raw
+
+    def ndvi(self, window, nodata, scale, offset):
+        nir, red = self.read(window)
+        out = self.workspace.view('out', window.height, window.width)
+        return ndvi_block(nir, red, out, self.workspace, nodata=nodata, scale=scale, offset=offset)
+
+    def close(self):
+        self.maps = None
+        self.raster.close()
+
+
+# Estado de cada processo do pool (um leitor aberto por processo)
+_worker = {}
+
+
+def _init_worker(path, bands, block_size, nodata, scale, offset):
+    _worker['reader'] = _BandReader(path, bands, block_size)
+    _worker['params'] = (nodata, scale, offset)
+
+
+def _worker_ndvi(window):
+    return window, _worker['reader'].ndvi(window, *_worker['params']).copy()
+
+
+@traced('ndvi')
+def compute_ndvi(src_path, dst_path, sensor=None, nir_band=None, red_band=None, apply_scale_factors=False,
+                 nodata=None, block_size=BLOCK_SIZE, workers=0, compress='deflate', quantize=None):
+    """
+    Gera o NDVI de um GeoTIFF exportado em `dst_path` (float32, nodata NaN).
+
+    Por padrão o cálculo usa os valores brutos, como o calculate_ndvi() do
+    projeto-01b.py; `apply_scale_factors=True` aplica antes a escala/offset da
+    reflectância (como LandSat8.apply_scale_factors do projeto-01.py). Se o
+    arquivo não define nodata, o valor 0 das bandas inteiras é tratado como
+    pixel mascarado (é o que o Earth Engine grava fora da máscara). Com `quantize='int16'` ou
+    `'uint8'` o NDVI é gravado no formato compacto do quantized.py.
+    """
+    preset = NDVI_PRESETS.get(sensor, {'nir_band': 1, 'red_band': 2, 'scale': None, 'offset': None})
+    bands = [nir_band or preset['nir_band'], red_band or preset['red_band']]
+    scale, offset = (preset['scale'], preset['offset']) if apply_scale_factors else (None, None)
+
+    start = time.perf_counter()
+    reader = _BandReader(src_path, bands, block_size)
+    raster = reader.raster
+    if nodata is None:
+        nodata = raster.nodata
+        if nodata is None and raster.dtype.kind in 'ui':
+            nodata = 0
+    windows = grid_windows(raster.width, raster.height, block_size)
+
+    if quantize:
+        options = writer_options(quantize, ['NDVI'])
+    else:
+        options = {'dtype': 'float32', 'nodata': float('nan'), 'band_metadata': [{'description': 'NDVI'}]}
+    writer = RasterWriter(dst_path, raster.width, raster.height, transform=raster.transform, epsg=raster.epsg,
+                          block_size=block_size, compress=compress, **options)
+
+    def write(block, window):
+        writer.write(quantize_block(block, quantize) if quantize else block, window)
+
+    try:
+        if workers and workers > 1:
+            reader.close()
+            initargs = (src_path, bands, block_size, nodata, scale, offset)
+            for window, block in map_windows(_worker_ndvi, windows, workers, _init_worker, initargs):
+                write(block, window)
+        else:
+            for window in windows:
+                write(reader.ndvi(window, nodata, scale, offset), window)
+            reader.close()
+        writer.close()
+    except BaseException:
+        reader.close()
+        raise
+
+    seconds = time.perf_counter() - start
+    pixels = raster.width * raster.height
+    print(f"NDVI de {src_path}: {pixels / 1e6:.1f} Mpx em {seconds:.1f} s ({pixels / 1e6 / max(seconds, 1e-9):.1f} Mpx/s)")
+    return {'pixels': pixels, 'seconds': seconds}
+
+
+def main():
+    if len(sys.argv) < 4:
+        print("Uso: python local_ndvi.py <landsat8|sentinel2> entrada.tif saida.tif [processos]")
+        return
+    workers = int(sys.argv[4]) if len(sys.argv) > 4 else 0
+    compute_ndvi(sys.argv[2], sys.argv[3], sensor=sys.argv[1], workers=workers)
+
+
+if __name__ == "__main__":
+    main()
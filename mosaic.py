@@ -0,0 +1,168 @@
+"""
+Mosaico local dos blocos exportados pelo Earth Engine em um único
+Cloud-Optimized GeoTIFF (COG), com tiles internos comprimidos e overviews.
+
+Os blocos são combinados bloco a bloco de saída, lendo apenas as janelas
+necessárias de cada arquivo de entrada; a memória usada depende do tamanho
+do bloco de saída, não do tamanho do bioma.
+
+Uso:
+    python mosaic.py saida.tif 'downloads/Landsat_NDVI_Export_*_r*_c*.tif'
+"""
+
+import collections
+import glob
+import math
+import sys
+
+import numpy as np
+
+from instrumentation import traced
+from raster_io import RasterWriter, Window, open_raster, transform_from_grid
+
+# Tamanho do tile interno do COG
+COG_BLOCK_SIZE = 512
+
+
+class _SourceTile:
+    """Posição de um arquivo de entrada na grade do mosaico."""
+
+    def __init__(self, path, raster):
+        self.path = path
+        self.width, self.height = raster.width, raster.height
+        self.transform = raster.transform
+        self.col_off = self.row_off = 0
+
+    def window_in(self, window):
+        """Interseção com uma janela do mosaico: (janela na fonte, fatia no destino) ou None."""
+        col_start = max(window.col_off, self.col_off)
+        row_start = max(window.row_off, self.row_off)
+        col_end = min(window.col_off + window.width, self.col_off + self.width)
+        row_end = min(window.row_off + window.height, self.row_off + self.height)
+        if col_start >= col_end or row_start >= row_end:
+            return None
+        source = Window(col_start - self.col_off, row_start - self.row_off, col_end - col_start, row_end - row_start)
+        target = (slice(row_start - window.row_off, row_end - window.row_off),
+                  slice(col_start - window.col_off, col_end - window.col_off))
+        return source, target
+
+
+class _OpenFiles:
+    """Mantém abertos apenas os arquivos usados mais recentemente."""
+
+    def __init__(self, limit=32):
+        self.limit = limit
+        self.files = collections.OrderedDict()
+
+    def get(self, path):
+        if path in self.files:
+            self.files.move_to_end(path)
+            return self.files[path]
+        raster = open_raster(path)
+        self.files[path] = raster
+        if len(self.files) > self.limit:
+            self.files.popitem(last=False)[1].close()
+        return raster
+
+    def close(self):
+        for raster in self.files.values():
+            raster.close()
+        self.files.clear()
+
+
+def _overview_levels(width, height, block_size):
+    levels = 0
+    while max(width, height) / 2 ** levels > block_size:
+        levels += 1
+    return levels
+
+
+def _is_nodata(values, nodata):
+    if nodata is None or (isinstance(nodata, float) and math.isnan(nodata)):
+        return np.isnan(values) if values.dtype.kind == 'f' else np.zeros(values.shape, dtype=bool)
+    return values == nodata
+
+
+@traced('mosaico')
+def build_cog(tile_paths, out_path, block_size=COG_BLOCK_SIZE, overviews=None,
+              resampling='average', compress='deflate'):
+    """Combina os blocos em um COG; retorna o número de pixels do mosaico."""
+    if isinstance(tile_paths, str):
+        tile_paths = sorted(glob.glob(tile_paths))
+    if not tile_paths:
+        raise ValueError("Nenhum bloco de entrada encontrado.")
+
+    # Lê apenas os cabeçalhos para montar a grade do mosaico
+    tiles = []
+    for path in tile_paths:
+        with open_raster(path) as raster:
+            if not tiles:
+                count, dtype, nodata, epsg = raster.count, raster.dtype, raster.nodata, raster.epsg
+                band_metadata = raster.band_metadata
+            elif raster.count != count or raster.dtype != dtype:
+                raise ValueError(f"O bloco {path} tem bandas/tipo diferentes dos demais.")
+            tiles.append(_SourceTile(path, raster))
+
+    pixel_x, pixel_y = tiles[0].transform[1], tiles[0].transform[5]
+    for tile in tiles:
+        if not math.isclose(tile.transform[1], pixel_x, rel_tol=1e-6):
+            raise ValueError(f"O bloco {tile.path} tem resolução diferente dos demais.")
+    x0 = min(tile.transform[0] for tile in tiles)
+    y0 = max(tile.transform[3] for tile in tiles)
+    for tile in tiles:
+        tile.col_off = int(round((tile.transform[0] - x0) / pixel_x))
+        tile.row_off = int(round((tile.transform[3] - y0) / pixel_y))
+    width = max(tile.col_off + tile.width for tile in tiles)
+    height = max(tile.row_off + tile.height for tile in tiles)
+    if nodata is None and dtype.kind == 'f':
+        nodata = float('nan')
+    fill = 0 if nodata is None else nodata
+
+    # Índice espacial simples: blocos de saída -> arquivos de entrada que os tocam
+    index = collections.defaultdict(list)
+    for tile in tiles:
+        for block_row in range(tile.row_off // block_size, (tile.row_off + tile.height - 1) // block_size + 1):
+            for block_col in range(tile.col_off // block_size, (tile.col_off + tile.width - 1) // block_size + 1):
+                index[block_row, block_col].append(tile)
+
+    if overviews is None:
+        overviews = _overview_levels(width, height, block_size)
+    print(f"Mosaico de {len(tiles)} blocos: {width}x{height} pixels, {count} banda(s), {overviews} overview(s).")
+
+    files = _OpenFiles()
+    writer = RasterWriter(out_path, width, height, count=count, dtype=dtype, epsg=epsg, nodata=nodata,
+                          transform=transform_from_grid(x0, y0, pixel_x, -pixel_y), block_size=block_size,
+                          compress=compress, overviews=overviews, resampling=resampling, cog=True,
+                          band_metadata=band_metadata)
+    try:
+        buffer = np.empty((count, block_size, block_size), dtype=dtype)
+        for block_row in range(math.ceil(height / block_size)):
+            for block_col in range(math.ceil(width / block_size)):
+                window = Window(block_col * block_size, block_row * block_size,
+                                min(block_size, width - block_col * block_size),
+                                min(block_size, height - block_row * block_size))
+                block = buffer[:, :window.height, :window.width]
+                block.fill(fill)
+                for tile in index.get((block_row, block_col), []):
+                    source, target = tile.window_in(window)
+                    values = files.get(tile.path).read(window=source)
+                    # Em áreas sobrepostas, mantém o primeiro valor válido
+                    empty = _is_nodata(block[(slice(None),) + target], nodata)
+                    np.copyto(block[(slice(None),) + target], values, where=empty)
+                writer.write(block, window)
+        writer.close()
+    finally:
+        files.close()
+    return width * height
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("Uso: python mosaic.py saida.tif 'blocos_*.tif' [...]")
+        return
+    paths = sorted(path for pattern in sys.argv[2:] for path in glob.glob(pattern))
+    build_cog(paths, sys.argv[1])
+
+
+if __name__ == "__main__":
+    main()
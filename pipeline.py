@@ -0,0 +1,393 @@
+"""
+Pipeline local em DAG (máscara -> NDVI -> composição -> tendência,
+modelo harmônico, fragmentação, estatísticas zonais) com cache de etapas por hash.
+
+Cada etapa declara as entradas (arquivos externos ou saídas de outras etapas,
+com Output('nome')) e os parâmetros. A chave de uma saída é o SHA-256 do nome
+e da função da etapa, dos parâmetros e das chaves das entradas (assinatura
+tamanho/mtime para arquivos externos), e o arquivo fica em
+`<cache>/<etapa>/<nome>-<chave><sufixo>`. Se o arquivo já existe, a etapa
+não roda: mudar um parâmetro muda só as chaves daquela etapa e das que
+dependem dela.
+
+Etapas com `each` rodam uma tarefa por item (uma cena, por exemplo). Tarefas
+de etapas independentes e os itens de uma mesma etapa vão para um pool de
+processos, limitados por um orçamento de memória (MB estimados por tarefa).
+
+Uso:
+    python pipeline.py <landsat8|sentinel2> 'cenas/*.tif' [zonas.geojson] [ano=classes.tif ...]
+
+    pipeline = default_pipeline(scenes, 'landsat8', zones='zonas.geojson', workers=4)
+    pipeline.set_params('composicao', stats=['median', 'mean'])   # só composição e zonas são refeitas
+    outputs = pipeline.run()
+"""
+
+import concurrent.futures
+import glob
+import hashlib
+import json
+import math
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from cloud_mask import compute_mask
+from composite import DEFAULT_STATS, build_composite
+from harmonics import HARMONICS, build_harmonics
+from local_ndvi import compute_ndvi
+from quantized import quantize as quantize_block, writer_options
+from raster_io import RasterWriter, grid_windows, open_raster
+from trend import MIN_OBSERVATIONS, build_trend
+from zonal_stats import ZoneIndex, write_stats_csv, zonal_table
+
+# Diretório padrão do cache das etapas
+CACHE_DIR = '.pipeline_cache'
+
+# Orçamento de memória das tarefas simultâneas (MB) e memória padrão de uma tarefa
+MEMORY_BUDGET = 2048
+DEFAULT_MEMORY = 256
+
+# Tamanho do trecho do nome original mantido no nome das saídas (as datas vêm dele)
+_STEM_LENGTH = 80
+
+
+@dataclass(frozen=True)
+class Output:
+    """Referência à saída de outra etapa."""
+    stage: str
+
+
+@dataclass
+class Stage:
+    """Uma etapa: função(caminho_de_saída, **entradas, **parâmetros) que grava um arquivo."""
+    name: str
+    function: object
+    inputs: dict
+    params: dict = field(default_factory=dict)
+    suffix: str = '.tif'
+    each: tuple = ()
+    memory: int = DEFAULT_MEMORY
+
+    @property
+    def dependencies(self):
+        return [value.stage for value in self.inputs.values() if isinstance(value, Output)]
+
+
+def _hash(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def _file_key(path):
+    stat = os.stat(path)
+    return _hash('arquivo', os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+
+def _external_key(value):
+    """Chave de uma entrada externa: assinatura dos arquivos (listas e dicionários percorridos)."""
+    if isinstance(value, dict):
+        return _hash({str(k): _external_key(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return _hash([_external_key(v) for v in value])
+    if isinstance(value, str) and os.path.exists(value):
+        return _file_key(value)
+    return _hash(value)
+
+
+def _stem(value):
+    name = os.path.splitext(os.path.basename(str(value)))[0]
+    # Saídas do próprio cache já têm uma chave no fim: só o nome original é mantido
+    if len(name) > 17 and name[-17] == '-' and all(c in '0123456789abcdef' for c in name[-16:]):
+        name = name[:-17]
+    return name[:_STEM_LENGTH]
+
+
+def _run_job(function, out_path, kwargs):
+    # Grava em um arquivo parcial e renomeia: uma tarefa interrompida nunca deixa uma saída "válida" no cache
+    base, suffix = os.path.splitext(out_path)
+    partial = f'{base}.partial{suffix}'
+    start = time.perf_counter()
+    function(partial, **kwargs)
+    os.replace(partial, out_path)
+    return time.perf_counter() - start
+
+
+class Pipeline:
+    """DAG de etapas com cache por hash e execução concorrente sob um orçamento de memória."""
+
+    def __init__(self, cache_dir=CACHE_DIR, workers=0, memory_budget=MEMORY_BUDGET):
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self.memory_budget = memory_budget
+        self.stages = {}
+        self.outputs = {}
+        self.keys = {}
+        self.report = {}
+
+    def add(self, name, function, inputs=None, params=None, suffix='.tif', each=(), memory=DEFAULT_MEMORY):
+        inputs = dict(inputs or {})
+        for arg, value in inputs.items():
+            # Padrões glob viram a lista ordenada de arquivos
+            if isinstance(value, str) and any(c in value for c in '*?['):
+                inputs[arg] = sorted(glob.glob(value))
+        self.stages[name] = Stage(name, function, inputs, dict(params or {}), suffix, tuple(each), memory)
+        return self.stages[name]
+
+    def set_params(self, name, **params):
+        self.stages[name].params.update(params)
+
+    def order(self):
+        """Etapas em ordem topológica (falha em dependências desconhecidas ou ciclos)."""
+        ordered, state = [], {}
+
+        def visit(name, path):
+            if name not in self.stages:
+                raise ValueError(f"Etapa desconhecida: {name} (em {' -> '.join(path)})")
+            if state.get(name) == 'feito':
+                return
+            if state.get(name) == 'visitando':
+                raise ValueError(f"Ciclo nas etapas: {' -> '.join(path + [name])}")
+            state[name] = 'visitando'
+            for dependency in self.stages[name].dependencies:
+                visit(dependency, path + [name])
+            state[name] = 'feito'
+            ordered.append(name)
+
+        for name in self.stages:
+            visit(name, [])
+        return ordered
+
+    # ---- chaves e tarefas ----
+
+    def _resolve(self, stage):
+        """Valores e chaves das entradas de uma etapa cujas dependências já terminaram."""
+        values, keys = {}, {}
+        for arg, value in stage.inputs.items():
+            if isinstance(value, Output):
+                values[arg], keys[arg] = self.outputs[value.stage], self.keys[value.stage]
+            else:
+                values[arg] = value
+                keys[arg] = [_external_key(v) for v in value] if arg in stage.each else _external_key(value)
+        return values, keys
+
+    def _jobs(self, stage):
+        """Tarefas da etapa: (caminho de saída, chave, argumentos); uma por item quando há `each`."""
+        values, keys = self._resolve(stage)
+        function = f'{stage.function.__module__}.{stage.function.__qualname__}'
+        base = _hash(stage.name, function, stage.params, {arg: keys[arg] for arg in keys if arg not in stage.each})
+        directory = os.path.join(self.cache_dir, stage.name)
+        if not stage.each:
+            key = base[:16]
+            return [(os.path.join(directory, f'{stage.name}-{key}{stage.suffix}'), key,
+                     dict(values, **stage.params))]
+
+        counts = {len(values[arg]) for arg in stage.each}
+        if len(counts) > 1:
+            raise ValueError(f"As entradas {stage.each} da etapa {stage.name} têm tamanhos diferentes.")
+        jobs = []
+        for i in range(counts.pop()):
+            key = _hash(base, [keys[arg][i] for arg in stage.each])[:16]
+            item = {arg: values[arg][i] for arg in stage.each}
+            kwargs = dict(values, **item, **stage.params)
+            name = _stem(values[stage.each[0]][i])
+            jobs.append((os.path.join(directory, f'{name}-{key}{stage.suffix}'), key, kwargs))
+        return jobs
+
+    # ---- execução ----
+
+    def run(self, targets=None):
+        """Executa as etapas pedidas (e as de que dependem); retorna {etapa: saída ou lista de saídas}."""
+        order = self.order()
+        if targets:
+            needed = set()
+            stack = list(targets)
+            while stack:
+                name = stack.pop()
+                if name not in needed:
+                    needed.add(name)
+                    stack.extend(self.stages[name].dependencies)
+            order = [name for name in order if name in needed]
+
+        start = time.perf_counter()
+        waiting = list(order)
+        queue = []        # (etapa, índice, caminho, argumentos)
+        remaining = {}    # etapa -> tarefas ainda não concluídas
+        results = {}      # etapa -> lista de saídas
+        running = {}      # future -> (etapa, índice, memória)
+        used = 0
+        pool = concurrent.futures.ProcessPoolExecutor(self.workers) if self.workers and self.workers > 1 else None
+
+        def finish(name):
+            stage = self.stages[name]
+            paths = results.pop(name)
+            self.outputs[name] = paths if stage.each else paths[0]
+            report = self.report[name]
+            report['seconds'] = time.perf_counter() - report.pop('started')
+            print(f"{name}: {report['jobs']} tarefa(s), {report['cached']} do cache, "
+                  f"{report['seconds']:.1f} s")
+
+        try:
+            while waiting or queue or running:
+                # Etapas cujas dependências terminaram viram tarefas (as que estão no cache já contam como feitas)
+                for name in [n for n in waiting if all(d in self.outputs for d in self.stages[n].dependencies)]:
+                    waiting.remove(name)
+                    stage = self.stages[name]
+                    jobs = self._jobs(stage)
+                    os.makedirs(os.path.join(self.cache_dir, name), exist_ok=True)
+                    self.keys[name] = [key for _, key, _ in jobs] if stage.each else jobs[0][1]
+                    results[name] = [path for path, _, _ in jobs]
+                    cached = sum(1 for path, _, _ in jobs if os.path.exists(path))
+                    self.report[name] = {'jobs': len(jobs), 'cached': cached, 'started': time.perf_counter()}
+                    remaining[name] = len(jobs) - cached
+                    queue.extend((name, i, path, kwargs) for i, (path, _, kwargs) in enumerate(jobs)
+                                 if not os.path.exists(path))
+                    if not remaining[name]:
+                        finish(name)
+                if not queue and not running:
+                    if waiting:
+                        continue
+                    break
+
+                if pool is None:
+                    name, _, path, kwargs = queue.pop(0)
+                    _run_job(self.stages[name].function, path, kwargs)
+                    remaining[name] -= 1
+                    if not remaining[name]:
+                        finish(name)
+                    continue
+
+                # Submete enquanto couber no orçamento (sempre ao menos uma tarefa em execução)
+                while queue:
+                    memory = self.stages[queue[0][0]].memory
+                    if running and used + memory > self.memory_budget:
+                        break
+                    name, i, path, kwargs = queue.pop(0)
+                    future = pool.submit(_run_job, self.stages[name].function, path, kwargs)
+                    running[future] = (name, memory)
+                    used += memory
+
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    name, memory = running.pop(future)
+                    used -= memory
+                    future.result()
+                    remaining[name] -= 1
+                    if not remaining[name]:
+                        finish(name)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+        print(f"Pipeline concluído em {time.perf_counter() - start:.1f} s.")
+        return {name: self.outputs[name] for name in order}
+
+
+# -------------------------------------------
+# Etapas (funções de módulo, para rodarem no pool de processos)
+# -------------------------------------------
+
+def mask_stage(out_path, scene, preset='landsat8', band=1):
+    compute_mask(scene, out_path, preset, band=band)
+
+
+def apply_mask(ndvi_path, mask_path, out_path, block_size=512, quantize=None):
+    """Copia o NDVI pondo NaN onde a máscara (1 = limpo) marca pixel não limpo."""
+    with open_raster(ndvi_path) as ndvi, open_raster(mask_path) as mask:
+        if quantize:
+            options = writer_options(quantize, ['NDVI'])
+        else:
+            options = {'dtype': 'float32', 'nodata': float('nan'), 'band_metadata': [{'description': 'NDVI'}]}
+        writer = RasterWriter(out_path, ndvi.width, ndvi.height, transform=ndvi.transform, epsg=ndvi.epsg,
+                              block_size=block_size, **options)
+        for window in grid_windows(ndvi.width, ndvi.height, block_size):
+            values = ndvi.read_values(1, window)
+            values[mask.read(bands=[1], window=window)[0] == 0] = np.nan
+            writer.write(quantize_block(values, quantize) if quantize else values, window)
+        writer.close()
+
+
+def ndvi_stage(out_path, scene, mask=None, sensor=None, apply_scale_factors=False, quantize=None):
+    if mask is None:
+        compute_ndvi(scene, out_path, sensor=sensor, apply_scale_factors=apply_scale_factors, quantize=quantize)
+        return
+    base, suffix = os.path.splitext(out_path)
+    unmasked = f'{base}.sem_mascara{suffix}'
+    compute_ndvi(scene, unmasked, sensor=sensor, apply_scale_factors=apply_scale_factors)
+    try:
+        apply_mask(unmasked, mask, out_path, quantize=quantize)
+    finally:
+        os.remove(unmasked)
+
+
+def composite_stage(out_path, ndvi, stats=DEFAULT_STATS):
+    build_composite(ndvi, out_path, stats=stats)
+
+
+def trend_stage(out_path, ndvi, min_observations=MIN_OBSERVATIONS):
+    build_trend(ndvi, out_path, min_observations=min_observations)
+
+
+def harmonics_stage(out_path, ndvi, harmonics=HARMONICS):
+    build_harmonics(ndvi, out_path, harmonics=harmonics)
+
+
+def fragmentation_stage(out_path, classes, preset='mapbiomas'):
+    # Importado aqui: fragmentation carrega o ee (via tiling), que as demais etapas não usam
+    from fragmentation import fragmentation_by_year
+
+    metrics = fragmentation_by_year(classes, preset=preset)
+    with open(out_path, 'w', encoding='utf-8') as f:
+        json.dump({str(year): values for year, values in metrics.items()}, f, indent=2, default=float)
+
+
+def zonal_stage(out_path, zones, raster, band=1, field=None):
+    index = ZoneIndex.build(zones, raster, field)
+    write_stats_csv(zonal_table(index, [raster], band=band), out_path)
+
+
+def default_pipeline(scenes, sensor, zones=None, classes_by_year=None, qa_band=None, cache_dir=CACHE_DIR,
+                     workers=0, memory_budget=MEMORY_BUDGET, quantize=None):
+    """
+    Pipeline padrão do projeto sobre cenas exportadas (NIR, Red[, QA]) de um sensor; com `quantize`
+    ('int16' ou 'uint8') as cenas de NDVI do cache ficam no formato compacto do quantized.py.
+    """
+    pipeline = Pipeline(cache_dir, workers, memory_budget)
+    ndvi_inputs = {'scene': scenes}
+    if qa_band:
+        pipeline.add('mascara', mask_stage, {'scene': scenes}, {'preset': sensor, 'band': qa_band},
+                     each=('scene',), memory=64)
+        ndvi_inputs['mask'] = Output('mascara')
+    ndvi_params = {'sensor': sensor, 'quantize': quantize} if quantize else {'sensor': sensor}
+    pipeline.add('ndvi', ndvi_stage, ndvi_inputs, ndvi_params, each=tuple(ndvi_inputs), memory=128)
+    pipeline.add('composicao', composite_stage, {'ndvi': Output('ndvi')}, {'stats': list(DEFAULT_STATS)},
+                 memory=512)
+    pipeline.add('tendencia', trend_stage, {'ndvi': Output('ndvi')}, {'min_observations': MIN_OBSERVATIONS},
+                 memory=512)
+    pipeline.add('harmonicos', harmonics_stage, {'ndvi': Output('ndvi')}, {'harmonics': HARMONICS}, memory=256)
+    if classes_by_year:
+        pipeline.add('fragmentacao', fragmentation_stage, {'classes': classes_by_year}, {'preset': 'mapbiomas'},
+                     suffix='.json', memory=512)
+    if zones:
+        pipeline.add('zonas', zonal_stage, {'zones': zones, 'raster': Output('composicao')}, {'band': 1},
+                     suffix='.csv', memory=128)
+    return pipeline
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("Uso: python pipeline.py <landsat8|sentinel2> 'cenas/*.tif' [zonas.geojson] [ano=classes.tif ...]")
+        return
+    sensor, scenes = sys.argv[1], sorted(glob.glob(sys.argv[2]))
+    rest = sys.argv[3:]
+    zones = rest.pop(0) if rest and '=' not in rest[0] else None
+    classes = dict(argument.split('=', 1) for argument in rest) or None
+    workers = max(1, math.floor((os.cpu_count() or 1) * 0.75))
+    outputs = default_pipeline(scenes, sensor, zones, classes, workers=workers).run()
+    for name, output in outputs.items():
+        print(f"{name}: {output if isinstance(output, str) else f'{len(output)} arquivo(s)'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""
+Extração de séries temporais de NDVI em pontos de campo (dezenas de milhares),
+no servidor ou localmente, com o resultado em uma tabela ponto x data.
+
+No servidor, os pontos são ordenados por célula de uma grade grossa e
+divididos em lotes espacialmente compactos; para cada lote entram só as cenas
+do manifesto cuja área de cobertura toca o lote, e cada requisição junta
+vários reduceRegions (um por cena) com no máximo `max_elements` linhas, em vez
+de um reduceRegion por ponto.
+
+Localmente (cubo de dados do datacube.py ou GeoTIFFs exportados), os pontos
+são agrupados pelo bloco que os contém e cada bloco é lido uma única vez.
+
+Uso:
+    python point_samples.py pontos.csv cubo/ saida.csv
+    python point_samples.py pontos.geojson 'ndvi_*.tif' saida.csv
+    python point_samples.py pontos.csv <landsat8|sentinel2> saida.csv 2017-01-01 2024-01-01
+"""
+
+import csv
+import datetime
+import glob
+import json
+import math
+import os
+import sys
+import time
+from dataclasses import dataclass
+
+import ee
+import numpy as np
+
+from datacube import Datacube
+from init import initialize
+from instrumentation import traced
+from raster_io import Window, open_raster
+from scene_manifest import SENSORS, fetch_scenes, sensor_collection
+from tiling import bbox_intersects
+from trend import date_from_name
+
+# Pontos por lote e linhas (ponto x cena) por requisição ao servidor
+BATCH_POINTS = 1000
+MAX_ELEMENTS = 5000
+
+# Célula (graus) da grade usada para ordenar os pontos antes de dividi-los em lotes
+SORT_CELL = 0.5
+
+# Nomes aceitos para as colunas do CSV de pontos
+ID_COLUMNS = ('id', 'point_id', 'ponto', 'name', 'nome')
+LON_COLUMNS = ('lon', 'longitude', 'lng', 'x')
+LAT_COLUMNS = ('lat', 'latitude', 'y')
+
+
+@dataclass
+class PointSet:
+    """Pontos de amostragem: identificadores e coordenadas (lon/lat)."""
+    ids: list
+    lon: np.ndarray
+    lat: np.ndarray
+
+    def __len__(self):
+        return len(self.ids)
+
+
+@dataclass
+class SampleTable:
+    """Tabela colunar ponto x data (NaN onde a cena não tem valor no ponto)."""
+    points: PointSet
+    dates: list
+    values: np.ndarray
+
+    def column(self, date):
+        return self.values[:, self.dates.index(date)]
+
+    def write_csv(self, path):
+        """Grava a tabela larga: id, lon, lat e uma coluna por data."""
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['id', 'lon', 'lat'] + [f'{date:%Y-%m-%d}' for date in self.dates])
+            for i, point_id in enumerate(self.points.ids):
+                row = ['' if math.isnan(value) else f'{value:.4f}' for value in self.values[i]]
+                writer.writerow([point_id, self.points.lon[i], self.points.lat[i]] + row)
+
+
+def _column(header, names, path):
+    lowered = [name.strip().lower() for name in header]
+    for name in names:
+        if name in lowered:
+            return lowered.index(name)
+    raise ValueError(f"O arquivo {path} não tem nenhuma das colunas {names}.")
+
+
+def load_points(path):
+    """Lê pontos de um CSV (colunas id/lon/lat) ou de um GeoJSON de pontos."""
+    ids, lon, lat = [], [], []
+    if path.lower().endswith(('.geojson', '.json')):
+        with open(path) as f:
+            features = json.load(f)['features']
+        for i, feature in enumerate(features):
+            if feature['geometry']['type'] != 'Point':
+                raise ValueError(f"Somente geometrias do tipo Point são aceitas ({path}).")
+            x, y = feature['geometry']['coordinates'][:2]
+            ids.append(str((feature.get('properties') or {}).get('id', feature.get('id', i))))
+            lon.append(x)
+            lat.append(y)
+    else:
+        with open(path, newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            lon_col, lat_col = _column(header, LON_COLUMNS, path), _column(header, LAT_COLUMNS, path)
+            try:
+                id_col = _column(header, ID_COLUMNS, path)
+            except ValueError:
+                id_col = None
+            for i, row in enumerate(reader):
+                if not row:
+                    continue
+                ids.append(row[id_col] if id_col is not None else str(i))
+                lon.append(float(row[lon_col]))
+                lat.append(float(row[lat_col]))
+    return PointSet(ids, np.asarray(lon, dtype=np.float64), np.asarray(lat, dtype=np.float64))
+
+
+def spatial_order(points, cell=SORT_CELL):
+    """Ordem dos pontos por célula de uma grade grossa (linha a linha), para lotes compactos."""
+    rows = np.floor(points.lat / cell).astype(np.int64)
+    cols = np.floor(points.lon / cell).astype(np.int64)
+    return np.lexsort((points.lon, cols, -rows))
+
+
+def _merge_dates(dates, values):
+    """Junta colunas da mesma data (cenas vizinhas do mesmo dia): fica o primeiro valor válido."""
+    days = sorted({date.replace(hour=0, minute=0, second=0, microsecond=0) for date in dates})
+    position = {day: i for i, day in enumerate(days)}
+    merged = np.full((values.shape[0], len(days)), np.nan, dtype=np.float32)
+    for j, date in enumerate(dates):
+        target = merged[:, position[date.replace(hour=0, minute=0, second=0, microsecond=0)]]
+        empty = np.isnan(target)
+        target[empty] = values[empty, j]
+    return days, merged
+
+
+def _report(label, points, dates, seconds, requests=None):
+    rate = len(points) / max(seconds, 1e-9)
+    extra = f", {requests} requisição(ões)" if requests is not None else ''
+    print(f"Amostragem {label}: {len(points)} pontos x {len(dates)} datas em {seconds:.1f} s "
+          f"({rate:.0f} pontos/s, {rate * len(dates):.0f} valores/s{extra})")
+
+
+# -------------------------------------------
+# Servidor (Earth Engine)
+# -------------------------------------------
+
+def _batch_requests(batch, scenes, max_elements):
+    """Grupos de cenas de um lote cujo total de linhas (pontos x cenas) cabe em uma requisição."""
+    per_request = max(1, max_elements // max(len(batch), 1))
+    return [scenes[i:i + per_request] for i in range(0, len(scenes), per_request)]
+
+
+@traced('amostras.servidor')
+def sample_server(points, sensor, date_start, date_end, max_cloud=20, scale=None,
+                  batch_points=BATCH_POINTS, max_elements=MAX_ELEMENTS):
+    """Séries de NDVI nos pontos por reduceRegions em lotes (um getInfo por grupo de cenas)."""
+    config = SENSORS[sensor]
+    scale = scale or config['scale']
+    start = time.perf_counter()
+    bounds = [float(points.lon.min()), float(points.lat.min()), float(points.lon.max()), float(points.lat.max())]
+    region = ee.Geometry.Rectangle(bounds)
+    scenes = fetch_scenes(sensor_collection(sensor, region, date_start, date_end, max_cloud), sensor)
+    column = {scene.id: j for j, scene in enumerate(scenes)}
+    values = np.full((len(points), len(scenes)), np.nan, dtype=np.float32)
+
+    order = spatial_order(points)
+    requests = 0
+    for first in range(0, len(order), batch_points):
+        batch = order[first:first + batch_points]
+        lon, lat = points.lon[batch], points.lat[batch]
+        box = [float(lon.min()), float(lat.min()), float(lon.max()), float(lat.max())]
+        # Pontos exatamente iguais formam um retângulo degenerado; a folga evita falsos negativos
+        box = [box[0] - 1e-9, box[1] - 1e-9, box[2] + 1e-9, box[3] + 1e-9]
+        batch_scenes = [scene for scene in scenes if scene.bbox is None or bbox_intersects(scene.bbox, box)]
+        if not batch_scenes:
+            continue
+        features = ee.FeatureCollection([
+            ee.Feature(ee.Geometry.Point([float(x), float(y)]), {'pid': int(index)})
+            for index, x, y in zip(batch, lon, lat)
+        ])
+        for group in _batch_requests(batch, batch_scenes, max_elements):
+            reduced = [
+                ee.Image(scene.id).normalizedDifference(config['bands']).rename('NDVI')
+                .reduceRegions(collection=features, reducer=ee.Reducer.first(), scale=scale)
+                .select(['pid', 'first'], None, False)
+                for scene in group
+            ]
+            # Uma única ida ao servidor por grupo; cada reduceRegions mantém a ordem das cenas
+            result = ee.List(reduced).getInfo()
+            requests += 1
+            for scene, collection in zip(group, result):
+                j = column[scene.id]
+                for feature in collection['features']:
+                    value = feature['properties'].get('first')
+                    if value is not None:
+                        values[feature['properties']['pid'], j] = value
+
+    dates, values = _merge_dates([scene.date for scene in scenes], values)
+    seconds = time.perf_counter() - start
+    _report('no servidor', points, dates, seconds, requests)
+    return SampleTable(points, dates, values)
+
+
+# -------------------------------------------
+# Local (cubo de dados ou GeoTIFFs)
+# -------------------------------------------
+
+def _pixel_index(transform, lon, lat):
+    x0, px, _, y0, _, py = transform
+    return np.floor((lat - y0) / py).astype(np.int64), np.floor((lon - x0) / px).astype(np.int64)
+
+
+def _group_by_block(rows, cols, block_height, block_width, inside):
+    """Pontos agrupados pelo bloco que os contém: {(linha do bloco, coluna do bloco): índices}."""
+    index = np.flatnonzero(inside)
+    keys = (rows[index] // block_height) * (1 << 32) + cols[index] // block_width
+    order = np.argsort(keys, kind='stable')
+    index, keys = index[order], keys[order]
+    bounds = np.flatnonzero(np.diff(keys)) + 1
+    groups = {}
+    for part in np.split(index, bounds):
+        if len(part):
+            groups[(int(rows[part[0]] // block_height), int(cols[part[0]] // block_width))] = part
+    return groups
+
+
+@traced('amostras.cubo')
+def sample_cube(points, cube, sensors=None):
+    """Séries nos pontos a partir do cubo de dados: cada bloco (tempo, y, x) é decodificado uma vez."""
+    if isinstance(cube, str):
+        cube = Datacube(cube)
+    start = time.perf_counter()
+    order, dates = cube.time_order(sensors)
+    rows, cols = _pixel_index(cube.transform, points.lon, points.lat)
+    inside = (rows >= 0) & (rows < cube.height) & (cols >= 0) & (cols < cube.width)
+    groups = _group_by_block(rows, cols, cube.chunk, cube.chunk, inside)
+
+    values = np.full((len(points), len(order)), np.nan, dtype=np.float32)
+    for (chunk_row, chunk_col), series in cube.read_chunks(sorted(groups)):
+        members = groups[(chunk_row, chunk_col)]
+        local_rows = rows[members] - chunk_row * cube.chunk
+        local_cols = cols[members] - chunk_col * cube.chunk
+        values[members] = series[order][:, local_rows, local_cols].T
+
+    dates, values = _merge_dates(dates, values)
+    _report('no cubo de dados', points, dates, time.perf_counter() - start)
+    return SampleTable(points, dates, values)
+
+
+@traced('amostras.rasters')
+def sample_rasters(points, paths, dates=None):
+    """Séries nos pontos a partir de GeoTIFFs (uma cena por arquivo): cada bloco é lido uma vez."""
+    if isinstance(paths, str):
+        paths = sorted(glob.glob(paths))
+    dates = dates or [date_from_name(path) for path in paths]
+    start = time.perf_counter()
+    values = np.full((len(points), len(paths)), np.nan, dtype=np.float32)
+    for j, path in enumerate(paths):
+        with open_raster(path, cache_blocks=1) as raster:
+            level = raster.levels[0]
+            rows, cols = _pixel_index(raster.transform, points.lon, points.lat)
+            inside = (rows >= 0) & (rows < raster.height) & (cols >= 0) & (cols < raster.width)
+            groups = _group_by_block(rows, cols, level.block_height, level.block_width, inside)
+            for (block_row, block_col), members in groups.items():
+                y0, x0 = block_row * level.block_height, block_col * level.block_width
+                window = Window(x0, y0, min(level.block_width, raster.width - x0),
+                                min(level.block_height, raster.height - y0))
+                block = raster.read_values(1, window)
+                values[members, j] = block[rows[members] - y0, cols[members] - x0]
+
+    dates, values = _merge_dates(dates, values)
+    _report('nos GeoTIFFs', points, dates, time.perf_counter() - start)
+    return SampleTable(points, dates, values)
+
+
+def main():
+    if len(sys.argv) < 4:
+        print("Uso: python point_samples.py pontos.csv cubo/ saida.csv\n"
+              "     python point_samples.py pontos.geojson 'ndvi_*.tif' saida.csv\n"
+              "     python point_samples.py pontos.csv <landsat8|sentinel2> saida.csv inicio fim")
+        return
+    points = load_points(sys.argv[1])
+    source, out_path = sys.argv[2], sys.argv[3]
+    if source in ('landsat8', 'sentinel2'):
+        initialize(service_account=True)
+        date_start = datetime.datetime.strptime(sys.argv[4], '%Y-%m-%d')
+        date_end = datetime.datetime.strptime(sys.argv[5], '%Y-%m-%d')
+        table = sample_server(points, source, date_start, date_end)
+    elif os.path.isdir(source):
+        table = sample_cube(points, source)
+    else:
+        table = sample_rasters(points, source)
+    table.write_csv(out_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,29 +8,51 @@ Tarefas:
 5. Relatório: Elaborar um relatório técnico que inclua todos os passos realizados, as metodologias aplicadas, os resultados obtidos e uma discussão sobre a relevância dos achados.
 """
 
+import datetime
+
 import ee
-import geemap
 # import streamlit as st
-from init import GEE
+from init import initialize
+from scene_manifest import SENSORS, fetch_scenes
+from scene_selection import select_scenes, selection_report
 
 # Classe base para aquisição de dados de satélite
 class Satellite:
+    # Chave do sensor em scene_manifest.SENSORS (propriedade de nuvens e grade WRS/MGRS)
+    sensor = None
+
     def __init__(self, data_start: str, data_end: str, satellite: str, cloudy_pixel_percentage: int = 20):
+        self.data_start, self.data_end = data_start, data_end
+        cloud_property = SENSORS[self.sensor]["cloud_property"] if self.sensor else "CLOUDY_PIXEL_PERCENTAGE"
         self.dataset = (
             ee.ImageCollection(satellite)
             .filterDate(data_start, data_end)
-            .filter(ee.Filter.lt("CLOUDY_PIXEL_PERCENTAGE", cloudy_pixel_percentage))
+            .filter(ee.Filter.lt(cloud_property, cloudy_pixel_percentage))
         )
 
     def add_filter(self, filter_func):
         self.dataset = self.dataset.map(filter_func)
         return self
 
+    # Mantém apenas as melhores cenas por período e por posição WRS/MGRS (uma consulta ao servidor)
+    def select_best(self, region, per_group: int = 2, window: str = "month", tiles=None):
+        self.dataset = self.dataset.filterBounds(region)
+        scenes = fetch_scenes(self.dataset, self.sensor)
+        date_start = datetime.datetime.strptime(self.data_start, "%Y-%m-%d")
+        date_end = datetime.datetime.strptime(self.data_end, "%Y-%m-%d")
+        selected = select_scenes(scenes, tiles, date_start, date_end, window, per_group)
+        selection_report(scenes, selected, tiles)
+        indexes = [scene.id.split("/")[-1] for scene in selected]
+        self.dataset = self.dataset.filter(ee.Filter.inList("system:index", indexes))
+        return self
+
     def get_visualization(self, bands: list, min_value: float, max_value: float):
         return {"bands": bands, "min": min_value, "max": max_value}
 
 # Classe para dados do LandSat8
 class LandSat8(Satellite):
+    sensor = "landsat8"
+
     def __init__(self, data_start: str, data_end: str, cloudy_pixel_percentage: int = 20):
         super().__init__(data_start, data_end, "LANDSAT/LC08/C02/T1_L2", cloudy_pixel_percentage)
 
@@ -42,6 +64,8 @@ class LandSat8(Satellite):
 
 # Classe para dados do Sentinel2
 class Sentinel2(Satellite):
+    sensor = "sentinel2"
+
     def __init__(self, data_start: str, data_end: str, cloudy_pixel_percentage: int = 20):
         super().__init__(data_start, data_end, "COPERNICUS/S2_SR_HARMONIZED", cloudy_pixel_percentage)
 
@@ -54,8 +78,10 @@ class Sentinel2(Satellite):
         return image.updateMask(mask).divide(10000)
 
 def main():
-    gee = GEE()
-    ee.Initialize(gee.credentials)
+    # geemap é pesado; só é importado aqui, onde os mapas são gerados
+    import geemap
+
+    initialize(service_account=True)
 
     # Inicializa as coleções de imagens
     datasetLandSat = LandSat8("2021-05-01", "2021-06-01").add_filter(LandSat8.apply_scale_factors)
@@ -1,8 +1,10 @@
 import ee
-import geemap
-import time
-import math
-import datetime
+import functools
+
+from ee_cache import get_info
+from export_scheduler import ExportScheduler
+from init import initialize
+from tiling import TileGrid, bbox_of, intersecting_tiles
 
 # Função para calcular o NDVI
 def calculate_ndvi(image, nir_band, red_band):
@@ -21,24 +23,39 @@ def mask_s2_clouds(image):
 
 # Função para criar mapa
 def create_map(dataset, visualization, center_coords, zoom_level, map_name):
+    # geemap é pesado; só é importado quando um mapa é de fato gerado
+    import geemap
+
     m = geemap.Map()
     m.set_center(*center_coords, zoom_level)
     m.addLayer(dataset, visualization, map_name)
     return m
 
-# Função para calcular a escala com base na área (Redução para 20 Mp)
-def calculate_scale(area_m2, max_pixels=2e7):
-    return math.sqrt(area_m2 / max_pixels)
-
-def monitor_tasks(tasks):
-    """Verifica o status das tarefas até que sejam concluídas."""
-    while any([task.active() for task in tasks]):
-        print("Aguardando conclusão das tarefas...")
-        time.sleep(30)  # Verifica o status a cada 30 segundos
-        for task in tasks:
-            status = task.status()
-            print(f"Tarefa {task.id}: {status['state']}")
-    print("Todas as tarefas foram concluídas!")
+# Função para exportar uma única imagem para o Google Drive
+# (parâmetros extras, como crs/crsTransform/dimensions de um bloco, são repassados ao Export)
+def export_image(image, description, folder, region=None, scale=None, **params):
+    task = ee.batch.Export.image.toDrive(
+        image=image,
+        description=description,
+        folder=folder,
+        region=region,
+        scale=scale,
+        fileFormat='GeoTIFF',
+        **params
+    )
+    task.start()
+    return task
+
+# Função para agendar a exportação de uma imagem em blocos na resolução nativa
+def schedule_tiled_export(scheduler, image, name, folder, tiles):
+    for tile in tiles:
+        scheduler.add(f'{name}/{tile.id}', functools.partial(
+            export_image,
+            image=image,
+            description=f'{name}_{tile.id}',
+            folder=folder,
+            **tile.export_params()
+        ))
 
 def main():
     try:
@@ -52,28 +69,23 @@ def main():
         # Porcentagem máxima de cobertura de nuvens
         CLOUDY_PIXEL_PERCENTAGE = 20
 
-        # Inicializa o GEE
-        ee.Authenticate()
-        ee.Initialize(project='analise-satelite-projeto-01')
+        # Diário das exportações (permite retomar após uma falha)
+        JOURNAL_PATH = 'export_journal_ndvi.json'
+
+        # Inicializa o GEE (sem repetir a autenticação se as credenciais já estão salvas)
+        initialize()
 
         # Definir uma área de interesse (Caatinga)
         caatinga = ee.FeatureCollection('projects/ee-maxwellamaral-proj01/assets/MAPBIOMAS/caatinga')
 
-        # Calcula a área da região de interesse em metros quadrados
-        area_m2 = caatinga.geometry().area().getInfo()
-
-        # Gerar o timestamp para nomeação dos arquivos
-        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-
-        # Calcula a escala com base no limite de pixels
-        scale = calculate_scale(area_m2)
-        print(f"Área da região: {area_m2} metros quadrados. Escala calculada: {scale} metros.")
-
         # Pasta no Google Drive
         folder_drive = 'analise-satelite-projeto-01'
 
-        # Lista de tarefas para monitoramento
-        tasks = []
+        # Retângulo envolvente do bioma (calculado uma única vez)
+        bounds = bbox_of(get_info(caatinga.geometry().bounds())['coordinates'])
+
+        # Agendador das tarefas de exportação
+        scheduler = ExportScheduler(JOURNAL_PATH)
 
         # -------------------------------------------
         # Landsat 8 - Cálculo do NDVI
@@ -90,7 +102,7 @@ def main():
         ndvi_landsat = datasetLangSat.map(lambda img: calculate_ndvi(img, 'SR_B5', 'SR_B4'))
 
         # Conta o número de imagens filtradas
-        landsat_count = datasetLangSat.size().getInfo()
+        landsat_count = get_info(datasetLangSat.size())
         print(f"Número de imagens Landsat 8 filtradas: {landsat_count}")
 
         if landsat_count > 0:
@@ -101,22 +113,19 @@ def main():
                 'palette': ['blue', 'white', 'green']
             }
 
+            # Mediana calculada uma vez e usada no mapa e na exportação
+            landsat_median = ndvi_landsat.median()
+
             # Cria o mapa Landsat NDVI e salva como HTML
-            map_landsat = create_map(ndvi_landsat.median(), visualization_ndvi_landsat, CENTRAL_POINTS, 6, "NDVI Landsat 8")
+            map_landsat = create_map(landsat_median, visualization_ndvi_landsat, CENTRAL_POINTS, 6, "NDVI Landsat 8")
             map_landsat.to_html('map_ndvi_landsat.html')
 
-            # Salvar NDVI Landsat no Google Drive
-            landsat_image = ndvi_landsat.median().clip(caatinga)
-            landsat_task = ee.batch.Export.image.toDrive(
-                image=landsat_image,
-                description=f'Landsat_NDVI_Export_{timestamp}',
-                folder=folder_drive,
-                scale=scale,
-                region=caatinga.geometry().bounds().getInfo()['coordinates'],
-                fileFormat='GeoTIFF'
-            )
-            landsat_task.start()
-            tasks.append(landsat_task)
+            # Salvar NDVI Landsat no Google Drive, em blocos de 30 m que tocam o bioma
+            landsat_image = landsat_median.clip(caatinga)
+            landsat_tiles = intersecting_tiles(TileGrid(bounds, 30), caatinga)
+            schedule_tiled_export(scheduler, landsat_image,
+                                  f'Landsat_NDVI_Export_{DATE_START_LANGSAT}_{DATE_END_LANGSAT}',
+                                  folder_drive, landsat_tiles)
         else:
             print("Nenhuma imagem Landsat 8 disponível para o intervalo de tempo especificado.")
 
@@ -135,7 +144,7 @@ def main():
         ndvi_sentinel2 = datasetSentinel2.map(lambda img: calculate_ndvi(img, 'B8', 'B4'))
 
         # Conta o número de imagens filtradas
-        sentinel_count = datasetSentinel2.size().getInfo()
+        sentinel_count = get_info(datasetSentinel2.size())
         print(f"Número de imagens Sentinel-2 filtradas: {sentinel_count}")
 
         if sentinel_count > 0:
@@ -146,27 +155,24 @@ def main():
                 'palette': ['blue', 'white', 'green']
             }
 
+            # Mediana calculada uma vez e usada no mapa e na exportação
+            sentinel_median = ndvi_sentinel2.median()
+
             # Cria o mapa Sentinel-2 NDVI e salva como HTML
-            map_sentinel2 = create_map(ndvi_sentinel2.median(), visualization_ndvi_sentinel2, CENTRAL_POINTS, 6, "NDVI Sentinel-2")
+            map_sentinel2 = create_map(sentinel_median, visualization_ndvi_sentinel2, CENTRAL_POINTS, 6, "NDVI Sentinel-2")
             map_sentinel2.to_html('map_ndvi_sentinel2.html')
 
-            # Salvar NDVI Sentinel-2 no Google Drive
-            sentinel_image = ndvi_sentinel2.median().clip(caatinga)
-            sentinel_task = ee.batch.Export.image.toDrive(
-                image=sentinel_image,
-                description=f'Sentinel_NDVI_Export_{timestamp}',
-                folder=folder_drive,
-                scale=scale,
-                region=caatinga.geometry().bounds().getInfo()['coordinates'],
-                fileFormat='GeoTIFF'
-            )
-            sentinel_task.start()
-            tasks.append(sentinel_task)
+            # Salvar NDVI Sentinel-2 no Google Drive, em blocos de 10 m que tocam o bioma
+            sentinel_image = sentinel_median.clip(caatinga)
+            sentinel_tiles = intersecting_tiles(TileGrid(bounds, 10), caatinga)
+            schedule_tiled_export(scheduler, sentinel_image,
+                                  f'Sentinel_NDVI_Export_{DATE_START_SENTINEL}_{DATE_END_SENTINEL}',
+                                  folder_drive, sentinel_tiles)
         else:
             print("Nenhuma imagem Sentinel-2 disponível para o intervalo de tempo especificado.")
 
-        # Monitoramento das tarefas
-        # monitor_tasks(tasks)
+        # Submissão e monitoramento das tarefas
+        scheduler.run()
 
     except Exception as e:
         print(f"Ocorreu um erro: {str(e)}")
@@ -0,0 +1,144 @@
+"""
+Formato compacto dos produtos locais: NDVI e índices em int16 ou uint8
+quantizados, com um valor reservado para nodata e a escala/offset gravados no
+GDAL_METADATA de cada banda, e máscaras de validade de 1 bit.
+
+Um valor v vira round((v - offset) / scale) no inteiro e volta como
+q * scale + offset, com erro máximo de scale / 2 (QUANTIZATIONS). O
+Raster.read_values() do raster_io desquantiza bloco a bloco, e é por ele que
+composição, tendência, estatísticas zonais, datacube e amostras leem as cenas,
+então os produtos quantizados entram direto no pipeline: int16 ocupa metade
+do float32 e uint8 um quarto, antes ainda da compressão.
+
+Uso:
+    python quantized.py converter ndvi.tif ndvi_int16.tif [int16|uint8] [mascara.tif]
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from raster_io import RasterWriter, grid_windows, open_raster
+
+# Esquemas de quantização para índices normalizados em [-1, 1] (EVI pode passar de 1 no int16):
+# tipo inteiro, valor reservado para nodata, escala e offset
+QUANTIZATIONS = {
+    # Passo de 0,0001 (erro máximo 0,00005), faixa de -3,2767 a 3,2767
+    'int16': {'dtype': 'int16', 'nodata': -32768, 'scale': 0.0001, 'offset': 0.0},
+    # 254 passos entre -1 e 1 (erro máximo ~0,0039), 255 reservado
+    'uint8': {'dtype': 'uint8', 'nodata': 255, 'scale': 2 / 254, 'offset': -1.0},
+}
+
+# Bloco padrão de conversão
+BLOCK_SIZE = 512
+
+
+def _limits(scheme):
+    """Menor e maior inteiro válidos (o nodata fica fora da faixa)."""
+    info = np.iinfo(scheme['dtype'])
+    low, high = int(info.min), int(info.max)
+    if scheme['nodata'] == low:
+        low += 1
+    elif scheme['nodata'] == high:
+        high -= 1
+    return low, high
+
+
+def quantize(values, scheme='int16', out=None):
+    """Quantiza um bloco float (NaN = sem dado) no inteiro do esquema; valores fora da faixa são saturados."""
+    scheme = QUANTIZATIONS[scheme] if isinstance(scheme, str) else scheme
+    low, high = _limits(scheme)
+    scaled = np.subtract(values, np.float32(scheme['offset']), dtype=np.float32)
+    scaled /= np.float32(scheme['scale'])
+    np.rint(scaled, out=scaled)
+    np.clip(scaled, low, high, out=scaled)
+    invalid = np.isnan(scaled)
+    scaled[invalid] = scheme['nodata']
+    if out is None:
+        out = np.empty(scaled.shape, dtype=scheme['dtype'])
+    np.copyto(out, scaled, casting='unsafe')
+    return out
+
+
+def count_saturated(values, scheme='int16', axis=None):
+    """Quantos valores (sem contar NaN) ficam fora da faixa do esquema e seriam saturados por quantize()."""
+    scheme = QUANTIZATIONS[scheme] if isinstance(scheme, str) else scheme
+    low, high = _limits(scheme)
+    scaled = np.subtract(values, np.float32(scheme['offset']), dtype=np.float32)
+    scaled /= np.float32(scheme['scale'])
+    np.rint(scaled, out=scaled)
+    return np.count_nonzero((scaled < low) | (scaled > high), axis=axis)
+
+
+def dequantize(values, scheme='int16', out=None):
+    """Inverso de quantize(): float32 com NaN no nodata (o mesmo que Raster.read_values faz na leitura)."""
+    scheme = QUANTIZATIONS[scheme] if isinstance(scheme, str) else scheme
+    if out is None:
+        out = np.empty(values.shape, dtype=np.float32)
+    np.copyto(out, values, casting='unsafe')
+    out *= np.float32(scheme['scale'])
+    out += np.float32(scheme['offset'])
+    out[values == scheme['nodata']] = np.nan
+    return out
+
+
+def max_error(scheme='int16'):
+    """Erro máximo de quantização dentro da faixa representável."""
+    scheme = QUANTIZATIONS[scheme] if isinstance(scheme, str) else scheme
+    return scheme['scale'] / 2
+
+
+def writer_options(scheme, descriptions):
+    """Argumentos do RasterWriter para gravar as bandas `descriptions` quantizadas."""
+    scheme = QUANTIZATIONS[scheme] if isinstance(scheme, str) else scheme
+    return {'dtype': scheme['dtype'], 'nodata': scheme['nodata'],
+            'band_metadata': [{'description': description, 'scale': scheme['scale'], 'offset': scheme['offset']}
+                              for description in descriptions]}
+
+
+def quantize_raster(src_path, dst_path, scheme='int16', mask_path=None, block_size=BLOCK_SIZE,
+                    compress='deflate'):
+    """
+    Converte um produto float (NaN = sem dado) para o formato quantizado e, se pedido, grava a
+    máscara de validade da primeira banda em 1 bit (1 = com dado).
+    """
+    start = time.perf_counter()
+    with open_raster(src_path, cache_blocks=4) as raster:
+        descriptions = [d or f'banda_{i + 1}' for i, d in enumerate(raster.descriptions)]
+        writer = RasterWriter(dst_path, raster.width, raster.height, count=raster.count,
+                              transform=raster.transform, epsg=raster.epsg, block_size=block_size,
+                              compress=compress, **writer_options(scheme, descriptions))
+        mask = None
+        if mask_path:
+            mask = RasterWriter(mask_path, raster.width, raster.height, transform=raster.transform,
+                                epsg=raster.epsg, block_size=block_size, compress=compress, nbits=1,
+                                band_metadata=[{'description': 'valido'}])
+        values = np.empty((raster.count, block_size, block_size), dtype=np.float32)
+        for window in grid_windows(raster.width, raster.height, block_size):
+            block = values[:, :window.height, :window.width]
+            for band in range(raster.count):
+                raster.read_values(band + 1, window, out=block[band])
+            writer.write(quantize(block, scheme), window)
+            if mask is not None:
+                mask.write(~np.isnan(block[0]), window)
+        writer.close()
+        if mask is not None:
+            mask.close()
+        pixels = raster.width * raster.height
+    seconds = time.perf_counter() - start
+    print(f"{src_path} -> {dst_path} ({scheme}): {pixels / 1e6:.1f} Mpx em {seconds:.1f} s")
+    return {'pixels': pixels, 'seconds': seconds}
+
+
+def main():
+    if len(sys.argv) < 4 or sys.argv[1] != 'converter':
+        print("Uso: python quantized.py converter ndvi.tif ndvi_int16.tif [int16|uint8] [mascara.tif]")
+        return
+    scheme = sys.argv[4] if len(sys.argv) > 4 else 'int16'
+    mask_path = sys.argv[5] if len(sys.argv) > 5 else None
+    quantize_raster(sys.argv[2], sys.argv[3], scheme, mask_path)
+
+
+if __name__ == "__main__":
+    main()
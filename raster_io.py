@@ -0,0 +1,875 @@
+"""
+Leitura e escrita de GeoTIFF em blocos, apenas com NumPy.
+
+O projeto não depende de GDAL/rasterio; este módulo implementa o subconjunto
+de TIFF/GeoTIFF usado pelos rasters exportados pelo Earth Engine e pelos
+produtos locais: arquivos em faixas (strips) ou blocos (tiles), TIFF clássico
+ou BigTIFF, compressão nenhuma/Deflate/LZW/PackBits, preditores 2 e 3,
+máscaras de 1 bit, overviews internas e metadados do GDAL (nodata, escala,
+offset e descrição das bandas).
+
+Leitura:
+    with open_raster('ndvi.tif') as src:
+        for window in iter_windows(src, 1024):
+            block = src.read(window=window)          # (bandas, linhas, colunas)
+
+Escrita (blocos alinhados à grade interna de tiles):
+    with RasterWriter('saida.tif', width, height, dtype='float32', transform=src.transform) as dst:
+        dst.write(block, window)
+"""
+
+import collections
+import concurrent.futures
+import math
+import os
+import struct
+import xml.etree.ElementTree as ElementTree
+import zlib
+from dataclasses import dataclass
+
+import numpy as np
+
+# Tags TIFF/GeoTIFF utilizadas
+NEW_SUBFILE_TYPE = 254
+IMAGE_WIDTH = 256
+IMAGE_LENGTH = 257
+BITS_PER_SAMPLE = 258
+COMPRESSION = 259
+PHOTOMETRIC = 262
+STRIP_OFFSETS = 273
+SAMPLES_PER_PIXEL = 277
+ROWS_PER_STRIP = 278
+STRIP_BYTE_COUNTS = 279
+PLANAR_CONFIG = 284
+PREDICTOR = 317
+TILE_WIDTH = 322
+TILE_LENGTH = 323
+TILE_OFFSETS = 324
+TILE_BYTE_COUNTS = 325
+EXTRA_SAMPLES = 338
+SAMPLE_FORMAT = 339
+MODEL_PIXEL_SCALE = 33550
+MODEL_TIEPOINT = 33922
+MODEL_TRANSFORMATION = 34264
+GEO_KEY_DIRECTORY = 34735
+GDAL_METADATA = 42112
+GDAL_NODATA = 42113
+
+# Códigos de compressão suportados
+COMPRESSIONS = {'none': 1, 'lzw': 5, 'deflate': 8, 'packbits': 32773}
+
+# Tipos de campo TIFF: código -> (formato struct, tamanho)
+FIELD_TYPES = {
+    1: ('B', 1), 2: ('s', 1), 3: ('H', 2), 4: ('I', 4), 5: ('II', 8), 6: ('b', 1), 7: ('B', 1),
+    8: ('h', 2), 9: ('i', 4), 10: ('ii', 8), 11: ('f', 4), 12: ('d', 8), 16: ('Q', 8), 17: ('q', 8), 18: ('Q', 8),
+}
+
+# (SampleFormat, BitsPerSample) -> dtype NumPy
+SAMPLE_DTYPES = {
+    (1, 8): 'uint8', (1, 16): 'uint16', (1, 32): 'uint32', (1, 64): 'uint64',
+    (2, 8): 'int8', (2, 16): 'int16', (2, 32): 'int32', (2, 64): 'int64',
+    (3, 32): 'float32', (3, 64): 'float64',
+}
+
+
+@dataclass(frozen=True)
+class Window:
+    """Janela de leitura/escrita em pixels (mesma convenção do GDAL/rasterio)."""
+    col_off: int
+    row_off: int
+    width: int
+    height: int
+
+
+def iter_windows(raster, block_size=None):
+    """Percorre o raster em janelas de `block_size` pixels (padrão: múltiplo do bloco interno)."""
+    if block_size is None:
+        block_size = max(raster.block_shape[0], raster.block_shape[1], 512)
+        block_size = math.ceil(block_size / raster.block_shape[1]) * raster.block_shape[1]
+    return grid_windows(raster.width, raster.height, block_size)
+
+
+def grid_windows(width, height, block_size):
+    """Janelas de `block_size` pixels cobrindo uma grade de width x height."""
+    for row_off in range(0, height, block_size):
+        for col_off in range(0, width, block_size):
+            yield Window(col_off, row_off, min(block_size, width - col_off), min(block_size, height - row_off))
+
+
+def map_windows(function, windows, workers, initializer=None, initargs=()):
+    """
+    Aplica `function(window)` em um pool de processos e gera (janela, resultado)
+    na ordem em que terminam. No máximo 2 x workers janelas ficam em trânsito,
+    para que a memória continue proporcional ao tamanho do bloco.
+    """
+    with concurrent.futures.ProcessPoolExecutor(workers, initializer=initializer, initargs=initargs) as pool:
+        pending = set()
+        for window in windows:
+            pending.add(pool.submit(function, window))
+            if len(pending) >= workers * 2:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in concurrent.futures.as_completed(pending):
+            yield future.result()
+
+
+def transform_from_grid(x0, y0, pixel_width, pixel_height=None):
+    """Geotransformação no formato do GDAL: (x0, dx, 0, y0, 0, -dy)."""
+    return (x0, pixel_width, 0.0, y0, 0.0, -(pixel_height or pixel_width))
+
+
+# -------------------------------------------
+# Compressão e preditores
+# -------------------------------------------
+
+def _lzw_decode(data):
+    # Decodificador LZW do TIFF (códigos MSB-first, com "early change")
+    padded = data + b'\x00\x00\x00'
+    total_bits = len(data) * 8
+    table = [bytes([i]) for i in range(256)] + [b'', b'']
+    out = bytearray()
+    bit_pos, n_bits, previous = 0, 9, None
+    while bit_pos + n_bits <= total_bits:
+        byte = bit_pos >> 3
+        chunk = (padded[byte] << 16) | (padded[byte + 1] << 8) | padded[byte + 2]
+        code = (chunk >> (24 - (bit_pos & 7) - n_bits)) & ((1 << n_bits) - 1)
+        bit_pos += n_bits
+        if code == 256:
+            del table[258:]
+            n_bits, previous = 9, None
+            continue
+        if code == 257:
+            break
+        if previous is None:
+            entry = table[code]
+        elif code < len(table):
+            entry = table[code]
+            table.append(previous + entry[:1])
+        else:
+            entry = previous + previous[:1]
+            table.append(entry)
+        out += entry
+        previous = entry
+        if len(table) + 1 >= (1 << n_bits) and n_bits < 12:
+            n_bits += 1
+    return bytes(out)
+
+
+def _packbits_decode(data):
+    out = bytearray()
+    i = 0
+    while i < len(data):
+        n = data[i] if data[i] < 128 else data[i] - 256
+        i += 1
+        if n >= 0:
+            out += data[i:i + n + 1]
+            i += n + 1
+        elif n != -128:
+            out += data[i:i + 1] * (1 - n)
+            i += 1
+    return bytes(out)
+
+
+def _decompress(data, compression):
+    if compression == 1:
+        return data
+    if compression in (8, 32946):
+        return zlib.decompress(data)
+    if compression == 5:
+        return _lzw_decode(data)
+    if compression == 32773:
+        return _packbits_decode(data)
+    raise ValueError(f"Compressão TIFF não suportada: {compression}")
+
+
+def _undo_predictor(block, predictor):
+    """Desfaz o preditor; `block` tem forma (linhas, colunas, amostras)."""
+    if predictor == 2:
+        np.cumsum(block, axis=1, dtype=block.dtype, out=block)
+        return block
+    if predictor == 3:
+        rows, cols, samples = block.shape
+        itemsize = block.dtype.itemsize
+        raw = block.view(np.uint8).reshape(rows, cols * samples * itemsize)
+        # A diferença entre bytes é feita com passo igual ao número de amostras por pixel
+        strided = raw.reshape(rows, cols * itemsize, samples)
+        np.cumsum(strided, axis=1, dtype=np.uint8, out=strided)
+        # Os bytes de cada amostra estão em planos, do mais significativo para o menos significativo
+        planes = raw.reshape(rows, itemsize, cols * samples)[:, ::-1, :]
+        restored = np.ascontiguousarray(planes.transpose(0, 2, 1)).view(block.dtype.newbyteorder('<'))
+        return restored.reshape(rows, cols, samples).astype(block.dtype.newbyteorder('='), copy=False)
+    return block
+
+
+def _apply_predictor(block, predictor):
+    if predictor == 2:
+        diff = block.copy()
+        diff[:, 1:] = block[:, 1:] - block[:, :-1]
+        return diff
+    if predictor == 3:
+        rows, cols, samples = block.shape
+        itemsize = block.dtype.itemsize
+        little = block.astype(block.dtype.newbyteorder('<'), copy=False)
+        planes = little.view(np.uint8).reshape(rows, cols * samples, itemsize)[:, :, ::-1]
+        raw = np.ascontiguousarray(planes.transpose(0, 2, 1)).reshape(rows, cols * itemsize, samples)
+        diff = raw.copy()
+        diff[:, 1:] = raw[:, 1:] - raw[:, :-1]
+        return diff
+    return block
+
+
+# -------------------------------------------
+# Leitura
+# -------------------------------------------
+
+class _Level:
+    """Uma imagem (IFD) do arquivo: resolução completa ou overview."""
+
+    def __init__(self, tags):
+        self.tags = tags
+        self.width = tags[IMAGE_WIDTH][0]
+        self.height = tags[IMAGE_LENGTH][0]
+        self.samples = tags.get(SAMPLES_PER_PIXEL, (1,))[0]
+        self.bits = tags.get(BITS_PER_SAMPLE, (1,))[0]
+        self.sample_format = tags.get(SAMPLE_FORMAT, (1,))[0]
+        self.compression = tags.get(COMPRESSION, (1,))[0]
+        self.predictor = tags.get(PREDICTOR, (1,))[0]
+        self.planar = tags.get(PLANAR_CONFIG, (1,))[0]
+        if TILE_WIDTH in tags:
+            self.block_width = tags[TILE_WIDTH][0]
+            self.block_height = tags[TILE_LENGTH][0]
+            self.offsets = np.asarray(tags[TILE_OFFSETS], dtype=np.int64)
+            self.byte_counts = np.asarray(tags[TILE_BYTE_COUNTS], dtype=np.int64)
+            self.tiled = True
+        else:
+            self.block_width = self.width
+            self.block_height = min(tags.get(ROWS_PER_STRIP, (self.height,))[0], self.height)
+            self.offsets = np.asarray(tags[STRIP_OFFSETS], dtype=np.int64)
+            self.byte_counts = np.asarray(tags[STRIP_BYTE_COUNTS], dtype=np.int64)
+            self.tiled = False
+        self.blocks_across = math.ceil(self.width / self.block_width)
+        self.blocks_down = math.ceil(self.height / self.block_height)
+        if self.bits == 1:
+            self.dtype = np.dtype('uint8')
+        else:
+            self.dtype = np.dtype(SAMPLE_DTYPES[(self.sample_format, self.bits)])
+
+
+class Raster:
+    """GeoTIFF aberto para leitura em janelas, com cache LRU de blocos decodificados."""
+
+    def __init__(self, path, cache_blocks=64):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._cache = collections.OrderedDict()
+        self._cache_blocks = cache_blocks
+        self.levels = self._read_ifds()
+        base = self.levels[0]
+        self.width, self.height = base.width, base.height
+        self.count = base.samples
+        self.dtype = base.dtype
+        self.nbits = base.bits if base.bits == 1 else None
+        self.block_shape = (base.block_height, base.block_width)
+        self.compression = base.compression
+        self.nodata = self._read_nodata(base.tags)
+        self.transform, self.epsg = self._read_georeference(base.tags)
+        self.metadata, self.band_metadata = self._read_gdal_metadata(base.tags)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    @property
+    def overviews(self):
+        return self.levels[1:]
+
+    @property
+    def scales(self):
+        return [float(meta.get('scale', 1.0)) for meta in self.band_metadata]
+
+    @property
+    def offsets(self):
+        return [float(meta.get('offset', 0.0)) for meta in self.band_metadata]
+
+    @property
+    def descriptions(self):
+        return [meta.get('description') for meta in self.band_metadata]
+
+    def _read_ifds(self):
+        f = self._file
+        header = f.read(16)
+        self._endian = {b'II': '<', b'MM': '>'}[header[:2]]
+        version = struct.unpack(self._endian + 'H', header[2:4])[0]
+        self._big = version == 43
+        if self._big:
+            offset = struct.unpack(self._endian + 'Q', header[8:16])[0]
+        else:
+            offset = struct.unpack(self._endian + 'I', header[4:8])[0]
+
+        levels = []
+        while offset:
+            tags, offset = self._read_ifd(offset)
+            subfile = tags.get(NEW_SUBFILE_TYPE, (0,))[0]
+            # Ignora máscaras internas (bit 2); mantém imagem principal e overviews
+            if not subfile & 4:
+                levels.append(_Level(tags))
+        return levels
+
+    def _read_ifd(self, offset):
+        f, e = self._file, self._endian
+        f.seek(offset)
+        if self._big:
+            count = struct.unpack(e + 'Q', f.read(8))[0]
+            entry_size, count_fmt, value_size = 20, 'Q', 8
+        else:
+            count = struct.unpack(e + 'H', f.read(2))[0]
+            entry_size, count_fmt, value_size = 12, 'I', 4
+        raw = f.read(count * entry_size + value_size)
+
+        tags = {}
+        for i in range(count):
+            entry = raw[i * entry_size:(i + 1) * entry_size]
+            tag, field_type = struct.unpack(e + 'HH', entry[:4])
+            n = struct.unpack(e + count_fmt, entry[4:4 + value_size])[0]
+            if field_type not in FIELD_TYPES:
+                continue
+            fmt, size = FIELD_TYPES[field_type]
+            nbytes = size * n
+            if nbytes <= value_size:
+                data = entry[4 + value_size:4 + value_size + nbytes]
+            else:
+                pointer = struct.unpack(e + count_fmt, entry[4 + value_size:])[0]
+                position = f.tell()
+                f.seek(pointer)
+                data = f.read(nbytes)
+                f.seek(position)
+            if field_type == 2:
+                tags[tag] = data.rstrip(b'\x00').decode('latin-1')
+            elif field_type in (5, 10):
+                values = struct.unpack(e + fmt[0] * (2 * n), data)
+                tags[tag] = tuple(values[j] / values[j + 1] for j in range(0, len(values), 2))
+            elif fmt in ('B', 'H', 'I', 'Q') and n > 16:
+                tags[tag] = np.frombuffer(data, dtype=np.dtype(e + fmt)).astype(np.int64)
+            else:
+                tags[tag] = struct.unpack(e + fmt * n, data)
+        next_offset = struct.unpack(e + count_fmt, raw[count * entry_size:])[0]
+        return tags, next_offset
+
+    @staticmethod
+    def _read_nodata(tags):
+        value = tags.get(GDAL_NODATA)
+        if value is None or not value.strip():
+            return None
+        return float(value)
+
+    @staticmethod
+    def _read_georeference(tags):
+        epsg = None
+        keys = tags.get(GEO_KEY_DIRECTORY)
+        if keys:
+            for i in range(4, len(keys), 4):
+                key_id, location, _count, value = keys[i:i + 4]
+                if key_id in (2048, 3072) and location == 0 and value not in (0, 32767):
+                    epsg = value
+        if MODEL_TRANSFORMATION in tags:
+            m = tags[MODEL_TRANSFORMATION]
+            return (m[3], m[0], m[1], m[7], m[4], m[5]), epsg
+        if MODEL_PIXEL_SCALE in tags and MODEL_TIEPOINT in tags:
+            sx, sy = tags[MODEL_PIXEL_SCALE][:2]
+            i, j, _k, x, y = tags[MODEL_TIEPOINT][:5]
+            return (x - i * sx, sx, 0.0, y + j * sy, 0.0, -sy), epsg
+        return (0.0, 1.0, 0.0, 0.0, 0.0, 1.0), epsg
+
+    def _read_gdal_metadata(self, tags):
+        metadata = {}
+        band_metadata = [{} for _ in range(self.count)]
+        text = tags.get(GDAL_METADATA)
+        if text:
+            for item in ElementTree.fromstring(text).iter('Item'):
+                name, sample = item.get('name'), item.get('sample')
+                role = item.get('role')
+                if sample is None:
+                    metadata[name] = item.text
+                elif int(sample) < self.count:
+                    band_metadata[int(sample)][(role or name).lower()] = item.text
+        return metadata, band_metadata
+
+    def _read_block(self, level, index):
+        """Lê e decodifica um bloco (tile ou strip); retorna (linhas, colunas, amostras do plano)."""
+        key = (id(level), index)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        samples = 1 if level.planar == 2 else level.samples
+        offset, size = int(level.offsets[index]), int(level.byte_counts[index])
+        block_in_plane = index % (level.blocks_across * level.blocks_down)
+        rows = level.block_height
+        if not level.tiled:
+            rows = min(level.block_height, level.height - (block_in_plane // level.blocks_across) * level.block_height)
+        cols = level.block_width
+
+        if size == 0:
+            # Bloco ausente (arquivo esparso): preenchido com zero
+            block = np.zeros((rows, cols, samples), dtype=level.dtype)
+        else:
+            self._file.seek(offset)
+            data = _decompress(self._file.read(size), level.compression)
+            if level.bits == 1:
+                row_bytes = (cols * samples + 7) // 8
+                packed = np.frombuffer(data, dtype=np.uint8)[:rows * row_bytes].reshape(rows, row_bytes)
+                block = np.unpackbits(packed, axis=1)[:, :cols * samples].reshape(rows, cols, samples)
+            else:
+                dtype = level.dtype.newbyteorder(self._endian)
+                count = rows * cols * samples
+                block = np.frombuffer(data, dtype=dtype, count=count).reshape(rows, cols, samples)
+                block = _undo_predictor(block.astype(level.dtype), level.predictor)
+
+        self._cache[key] = block
+        if len(self._cache) > self._cache_blocks:
+            self._cache.popitem(last=False)
+        return block
+
+    def read(self, bands=None, window=None, level=0, out=None):
+        """Lê as bandas (índices a partir de 1) na janela; retorna (bandas, linhas, colunas)."""
+        lvl = self.levels[level]
+        if window is None:
+            window = Window(0, 0, lvl.width, lvl.height)
+        bands = list(range(1, self.count + 1)) if bands is None else list(bands)
+        if out is None:
+            out = np.empty((len(bands), window.height, window.width), dtype=lvl.dtype)
+
+        row_end, col_end = window.row_off + window.height, window.col_off + window.width
+        first_row, last_row = window.row_off // lvl.block_height, (row_end - 1) // lvl.block_height
+        first_col, last_col = window.col_off // lvl.block_width, (col_end - 1) // lvl.block_width
+        plane_blocks = lvl.blocks_across * lvl.blocks_down
+
+        for block_row in range(first_row, last_row + 1):
+            for block_col in range(first_col, last_col + 1):
+                y0, x0 = block_row * lvl.block_height, block_col * lvl.block_width
+                ys, ye = max(window.row_off, y0), min(row_end, y0 + lvl.block_height)
+                xs, xe = max(window.col_off, x0), min(col_end, x0 + lvl.block_width)
+                index = block_row * lvl.blocks_across + block_col
+                dst = (slice(ys - window.row_off, ye - window.row_off), slice(xs - window.col_off, xe - window.col_off))
+                src = (slice(ys - y0, ye - y0), slice(xs - x0, xe - x0))
+                if lvl.planar == 2 and lvl.samples > 1:
+                    for i, band in enumerate(bands):
+                        block = self._read_block(lvl, (band - 1) * plane_blocks + index)
+                        out[i][dst] = block[src][:, :, 0]
+                else:
+                    block = self._read_block(lvl, index)
+                    for i, band in enumerate(bands):
+                        out[i][dst] = block[src][:, :, band - 1]
+        return out
+
+    def read_values(self, band=1, window=None, level=0, out=None):
+        """
+        Lê uma banda como float32 (linhas, colunas) com nodata em NaN e a escala/offset do
+        GDAL_METADATA aplicados, ou seja, desquantiza produtos int16/uint8 bloco a bloco.
+        """
+        lvl = self.levels[level]
+        if window is None:
+            window = Window(0, 0, lvl.width, lvl.height)
+        if out is None:
+            out = np.empty((window.height, window.width), dtype=np.float32)
+        nodata = self.nodata
+        if lvl.dtype == np.float32:
+            self.read(bands=[band], window=window, level=level, out=out[np.newaxis])
+            if nodata is not None and not math.isnan(nodata):
+                out[out == nodata] = np.nan
+        else:
+            raw = self.read(bands=[band], window=window, level=level)[0]
+            np.copyto(out, raw, casting='unsafe')
+            if nodata is not None and not math.isnan(nodata):
+                out[raw == nodata] = np.nan
+        scale, offset = self.scales[band - 1], self.offsets[band - 1]
+        if scale != 1.0:
+            out *= np.float32(scale)
+        if offset:
+            out += np.float32(offset)
+        return out
+
+    def memmap(self, band=1):
+        """Mapeia a banda em memória quando o arquivo não é comprimido e as faixas são contíguas."""
+        lvl = self.levels[0]
+        if lvl.compression != 1 or lvl.tiled or lvl.bits == 1:
+            return None
+        plane_strips = lvl.blocks_down
+        start = (band - 1) * plane_strips if lvl.planar == 2 else 0
+        offsets = lvl.offsets[start:start + plane_strips]
+        counts = lvl.byte_counts[start:start + plane_strips]
+        if np.any(offsets[1:] != offsets[:-1] + counts[:-1]):
+            return None
+        samples = 1 if lvl.planar == 2 else lvl.samples
+        dtype = lvl.dtype.newbyteorder(self._endian)
+        array = np.memmap(self.path, dtype=dtype, mode='r', offset=int(offsets[0]),
+                          shape=(lvl.height, lvl.width, samples))
+        return array[:, :, 0 if lvl.planar == 2 else band - 1]
+
+    def window_transform(self, window):
+        x0, dx, rx, y0, ry, dy = self.transform
+        return (x0 + window.col_off * dx, dx, rx, y0 + window.row_off * dy, ry, dy)
+
+
+def open_raster(path, cache_blocks=64):
+    return Raster(path, cache_blocks=cache_blocks)
+
+
+# -------------------------------------------
+# Escrita
+# -------------------------------------------
+
+def _downsample(block, nodata, resampling):
+    """Reduz um bloco (amostras, 2h, 2w) pela metade, ignorando nodata."""
+    samples, height, width = block.shape
+    height, width = height // 2, width // 2
+    quads = block[:, :height * 2, :width * 2].reshape(samples, height, 2, width, 2)
+    if resampling == 'nearest':
+        return quads[:, :, 0, :, 0].copy()
+    values = quads.astype(np.float32).transpose(0, 1, 3, 2, 4).reshape(samples, height, width, 4)
+    valid = ~np.isnan(values) if nodata is None or np.isnan(nodata) else values != nodata
+    count = valid.sum(axis=-1)
+    total = np.where(valid, values, 0).sum(axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / count
+    fill = np.nan if nodata is None else nodata
+    mean = np.where(count > 0, mean, fill)
+    if np.issubdtype(block.dtype, np.integer):
+        mean = np.rint(mean)
+    return mean.astype(block.dtype)
+
+
+def _gdal_metadata_xml(metadata, band_metadata):
+    root = ElementTree.Element('GDALMetadata')
+    for name, value in (metadata or {}).items():
+        item = ElementTree.SubElement(root, 'Item', name=str(name))
+        item.text = str(value)
+    for sample, meta in enumerate(band_metadata or []):
+        for role, value in meta.items():
+            if value is None:
+                continue
+            attrs = {'name': role.upper(), 'sample': str(sample)}
+            if role in ('scale', 'offset', 'description'):
+                attrs['role'] = role
+            item = ElementTree.SubElement(root, 'Item', **attrs)
+            item.text = str(value)
+    if not len(root):
+        return None
+    return ElementTree.tostring(root, encoding='unicode')
+
+
+class RasterWriter:
+    """
+    Escreve um GeoTIFF em blocos (tiles), com compressão e overviews opcionais.
+
+    Os blocos são gravados à medida que chegam em um arquivo temporário; ao fechar,
+    as overviews são geradas a partir dos próprios blocos gravados (sem carregar a
+    imagem inteira) e, com `cog=True`, o arquivo final é reorganizado no layout de
+    Cloud-Optimized GeoTIFF (IFDs no início, overviews menores antes da imagem cheia).
+    """
+
+    def __init__(self, path, width, height, count=1, dtype='float32', transform=None, epsg=4326,
+                 nodata=None, block_size=256, compress='deflate', predictor=None, nbits=None,
+                 overviews=0, resampling='average', cog=False, metadata=None, band_metadata=None,
+                 bigtiff=None):
+        self.path = path
+        self.width, self.height, self.count = width, height, count
+        self.dtype = np.dtype('uint8' if nbits == 1 else dtype)
+        self.nbits = nbits
+        self.transform = transform or (0.0, 1.0, 0.0, 0.0, 0.0, -1.0)
+        self.epsg = epsg
+        self.nodata = nodata
+        self.block_size = block_size
+        self.compression = COMPRESSIONS[compress]
+        if predictor is None:
+            predictor = 1 if self.compression == 1 or nbits == 1 else (3 if self.dtype.kind == 'f' else 2)
+        self.predictor = predictor
+        self.resampling = resampling
+        self.cog = cog
+        self.metadata = metadata
+        self.band_metadata = band_metadata
+        uncompressed = width * height * count * max(1, self.dtype.itemsize) * (1 + 1 / 3 if overviews else 1)
+        self.bigtiff = uncompressed > 3.5e9 if bigtiff is None else bigtiff
+
+        # Níveis: 0 = resolução completa, 1.. = overviews (cada um com metade do anterior)
+        self.levels = []
+        level_width, level_height = width, height
+        for _ in range(overviews + 1):
+            across = math.ceil(level_width / block_size)
+            down = math.ceil(level_height / block_size)
+            self.levels.append({
+                'width': level_width, 'height': level_height, 'across': across, 'down': down,
+                'offsets': np.zeros(across * down * count, dtype=np.int64),
+                'counts': np.zeros(across * down * count, dtype=np.int64),
+            })
+            level_width, level_height = max(1, level_width // 2), max(1, level_height // 2)
+
+        self._tmp_path = f'{path}.part'
+        self._data = open(self._tmp_path, 'w+b')
+        self._data.write(b'\x00' * 16)  # espaço para o cabeçalho (usado quando não é COG)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._data.close()
+            os.remove(self._tmp_path)
+
+    # ---- blocos ----
+
+    def _encode(self, tile):
+        """Comprime um bloco (amostras, linhas, colunas) já no tamanho do tile."""
+        if self.nbits == 1:
+            raw = np.packbits(tile.astype(bool), axis=-1).tobytes()
+        else:
+            block = tile.reshape(tile.shape[1], tile.shape[2], 1).astype(self.dtype.newbyteorder('<'), copy=False)
+            raw = _apply_predictor(block, self.predictor).tobytes()
+        if self.compression == 8:
+            return zlib.compress(raw, 6)
+        if self.compression == 1:
+            return raw
+        raise ValueError("A escrita suporta apenas compressão 'none' ou 'deflate'.")
+
+    def _write_tile(self, level, band, block_row, block_col, tile):
+        info = self.levels[level]
+        index = band * info['across'] * info['down'] + block_row * info['across'] + block_col
+        data = self._encode(tile)
+        self._data.seek(0, os.SEEK_END)
+        info['offsets'][index] = self._data.tell()
+        info['counts'][index] = len(data)
+        self._data.write(data)
+
+    def write(self, array, window=None, level=0):
+        """Grava um bloco (bandas, linhas, colunas) cuja janela é alinhada à grade de tiles."""
+        array = np.asarray(array)
+        if array.ndim == 2:
+            array = array[np.newaxis]
+        size = self.block_size
+        if window is None:
+            window = Window(0, 0, array.shape[2], array.shape[1])
+        if window.col_off % size or window.row_off % size:
+            raise ValueError(f"A janela {window} não está alinhada aos blocos de {size} pixels.")
+
+        info = self.levels[level]
+        fill = 0 if self.nodata is None or self.nbits == 1 else self.nodata
+        for y in range(0, window.height, size):
+            for x in range(0, window.width, size):
+                part = array[:, y:y + size, x:x + size]
+                if part.shape[1] < size or part.shape[2] < size:
+                    # Blocos da borda são completados até o tamanho do tile
+                    padded = np.full((array.shape[0], size, size), fill, dtype=self.dtype)
+                    padded[:, :part.shape[1], :part.shape[2]] = part
+                    part = padded
+                block_row, block_col = (window.row_off + y) // size, (window.col_off + x) // size
+                if block_row >= info['down'] or block_col >= info['across']:
+                    continue
+                for band in range(array.shape[0]):
+                    self._write_tile(level, band, block_row, block_col, part[band:band + 1])
+
+    def _read_tile(self, level, band, block_row, block_col):
+        info = self.levels[level]
+        index = band * info['across'] * info['down'] + block_row * info['across'] + block_col
+        size = self.block_size
+        if info['counts'][index] == 0:
+            fill = np.nan if self.nodata is None and self.dtype.kind == 'f' else (self.nodata or 0)
+            return np.full((size, size), fill, dtype=self.dtype)
+        self._data.seek(int(info['offsets'][index]))
+        data = _decompress(self._data.read(int(info['counts'][index])), self.compression)
+        if self.nbits == 1:
+            packed = np.frombuffer(data, dtype=np.uint8).reshape(size, (size + 7) // 8)
+            return np.unpackbits(packed, axis=1)[:, :size]
+        block = np.frombuffer(data, dtype=self.dtype.newbyteorder('<')).reshape(size, size, 1)
+        return _undo_predictor(block.astype(self.dtype), self.predictor)[:, :, 0]
+
+    def _build_overviews(self):
+        size = self.block_size
+        for level in range(1, len(self.levels)):
+            info = self.levels[level]
+            for band in range(self.count):
+                for block_row in range(info['down']):
+                    for block_col in range(info['across']):
+                        # Cada tile da overview vem de 2x2 tiles do nível anterior
+                        parent = np.empty((1, 2 * size, 2 * size), dtype=self.dtype)
+                        previous = self.levels[level - 1]
+                        for dy in range(2):
+                            for dx in range(2):
+                                row, col = 2 * block_row + dy, 2 * block_col + dx
+                                if row < previous['down'] and col < previous['across']:
+                                    tile = self._read_tile(level - 1, band, row, col)
+                                else:
+                                    tile = np.full((size, size), self._fill_value(), dtype=self.dtype)
+                                parent[0, dy * size:(dy + 1) * size, dx * size:(dx + 1) * size] = tile
+                        resampling = 'nearest' if self.nbits == 1 else self.resampling
+                        tile = _downsample(parent, self.nodata, resampling)
+                        self._write_tile(level, band, block_row, block_col, tile)
+
+    def _fill_value(self):
+        if self.nodata is not None:
+            return self.nodata
+        return np.nan if self.dtype.kind == 'f' else 0
+
+    # ---- IFDs ----
+
+    def _tags(self, level, offsets):
+        info = self.levels[level]
+        bits = 1 if self.nbits == 1 else self.dtype.itemsize * 8
+        sample_format = {'u': 1, 'b': 1, 'i': 2, 'f': 3}[self.dtype.kind]
+        offset_type = 16 if self.bigtiff else 4
+        tags = [
+            (NEW_SUBFILE_TYPE, 4, [1 if level else 0]),
+            (IMAGE_WIDTH, 4, [info['width']]),
+            (IMAGE_LENGTH, 4, [info['height']]),
+            (BITS_PER_SAMPLE, 3, [bits] * self.count),
+            (COMPRESSION, 3, [self.compression]),
+            (PHOTOMETRIC, 3, [1]),
+            (SAMPLES_PER_PIXEL, 3, [self.count]),
+            (PLANAR_CONFIG, 3, [2 if self.count > 1 else 1]),
+            (TILE_WIDTH, 3, [self.block_size]),
+            (TILE_LENGTH, 3, [self.block_size]),
+            (TILE_OFFSETS, offset_type, offsets),
+            (TILE_BYTE_COUNTS, offset_type, info['counts']),
+            (SAMPLE_FORMAT, 3, [sample_format] * self.count),
+        ]
+        if self.predictor != 1:
+            tags.append((PREDICTOR, 3, [self.predictor]))
+        if self.count > 1:
+            tags.append((EXTRA_SAMPLES, 3, [0] * (self.count - 1)))
+        if self.nodata is not None:
+            value = 'nan' if isinstance(self.nodata, float) and math.isnan(self.nodata) else repr(self.nodata)
+            tags.append((GDAL_NODATA, 2, value))
+        if level == 0:
+            x0, dx, _rx, y0, _ry, dy = self.transform
+            tags.append((MODEL_PIXEL_SCALE, 12, [dx, -dy, 0.0]))
+            tags.append((MODEL_TIEPOINT, 12, [0.0, 0.0, 0.0, x0, y0, 0.0]))
+            if self.epsg:
+                geographic = self.epsg in (4326, 4674, 4618)
+                keys = [1, 1, 0, 3,
+                        1024, 0, 1, 2 if geographic else 1,
+                        1025, 0, 1, 1,
+                        2048 if geographic else 3072, 0, 1, self.epsg]
+                tags.append((GEO_KEY_DIRECTORY, 3, keys))
+            xml = _gdal_metadata_xml(self.metadata, self.band_metadata)
+            if xml:
+                tags.append((GDAL_METADATA, 2, xml))
+        return sorted(tags, key=lambda t: t[0])
+
+    def _ifd_size(self, tags):
+        entry, header, pointer = (20, 8, 8) if self.bigtiff else (12, 2, 4)
+        size = header + entry * len(tags) + pointer
+        for _tag, field_type, values in tags:
+            nbytes = self._field_bytes(field_type, values)
+            if nbytes > pointer:
+                size += nbytes + (nbytes & 1)
+        return size
+
+    @staticmethod
+    def _field_bytes(field_type, values):
+        if field_type == 2:
+            return len(values) + 1
+        return FIELD_TYPES[field_type][1] * len(values)
+
+    def _pack_ifd(self, tags, position, next_offset):
+        """Serializa um IFD que começa em `position` (dados externos logo após as entradas)."""
+        entry_fmt, count_fmt, pointer = ('<HHQ', '<Q', 8) if self.bigtiff else ('<HHI', '<H', 4)
+        pointer_fmt = '<Q' if self.bigtiff else '<I'
+        entries = bytearray(struct.pack(count_fmt, len(tags)))
+        external = bytearray()
+        external_start = position + len(entries) + (20 if self.bigtiff else 12) * len(tags) + pointer
+        for tag, field_type, values in tags:
+            if field_type == 2:
+                data = values.encode('latin-1') + b'\x00'
+                count = len(data)
+            else:
+                fmt = FIELD_TYPES[field_type][0]
+                data = struct.pack('<' + fmt * len(values), *[
+                    float(v) if field_type in (11, 12) else int(v) for v in values])
+                count = len(values)
+            entries += struct.pack(entry_fmt, tag, field_type, count)
+            if len(data) <= pointer:
+                entries += data.ljust(pointer, b'\x00')
+            else:
+                entries += struct.pack(pointer_fmt, external_start + len(external))
+                external += data
+                if len(data) & 1:
+                    external += b'\x00'
+        entries += struct.pack(pointer_fmt, next_offset)
+        return bytes(entries + external)
+
+    def _header(self, first_ifd):
+        if self.bigtiff:
+            return b'II' + struct.pack('<HHHQ', 43, 8, 0, first_ifd)
+        return b'II' + struct.pack('<HI', 42, first_ifd)
+
+    def close(self):
+        if len(self.levels) > 1:
+            self._build_overviews()
+
+        if not self.cog:
+            # Layout simples: dados já gravados no arquivo temporário, IFDs ao final
+            self._data.seek(0, os.SEEK_END)
+            position = self._data.tell()
+            position += position & 1
+            self._data.seek(position)
+            first_ifd = position
+            for level in range(len(self.levels)):
+                tags = self._tags(level, self.levels[level]['offsets'])
+                size = self._ifd_size(tags)
+                next_offset = position + size if level + 1 < len(self.levels) else 0
+                self._data.write(self._pack_ifd(tags, position, next_offset))
+                position += size
+            self._data.seek(0)
+            self._data.write(self._header(first_ifd))
+            self._data.close()
+            os.replace(self._tmp_path, self.path)
+            return
+
+        # Layout COG: cabeçalho, todos os IFDs e, em seguida, os dados das overviews
+        # (da menor para a maior) e da resolução completa
+        header_size = 16 if self.bigtiff else 8
+        tag_sets = [self._tags(level, self.levels[level]['offsets']) for level in range(len(self.levels))]
+        ifd_sizes = [self._ifd_size(tags) for tags in tag_sets]
+        data_start = header_size + sum(ifd_sizes)
+
+        new_offsets = [None] * len(self.levels)
+        position = data_start
+        for level in reversed(range(len(self.levels))):
+            counts = self.levels[level]['counts']
+            new_offsets[level] = np.where(counts > 0, position + np.concatenate([[0], np.cumsum(counts)[:-1]]), 0)
+            position += int(counts.sum())
+
+        with open(self.path, 'wb') as out:
+            out.write(self._header(header_size))
+            position = header_size
+            for level, size in enumerate(ifd_sizes):
+                tags = self._tags(level, new_offsets[level])
+                next_offset = position + size if level + 1 < len(self.levels) else 0
+                out.write(self._pack_ifd(tags, position, next_offset))
+                position += size
+            for level in reversed(range(len(self.levels))):
+                info = self.levels[level]
+                for offset, count in zip(info['offsets'], info['counts']):
+                    if count:
+                        self._data.seek(int(offset))
+                        out.write(self._data.read(int(count)))
+        self._data.close()
+        os.remove(self._tmp_path)
+
+
+def copy_profile(raster, **overrides):
+    """Parâmetros de RasterWriter com a mesma grade/georreferência de um raster aberto."""
+    profile = {
+        'width': raster.width, 'height': raster.height, 'count': raster.count,
+        'dtype': raster.dtype, 'transform': raster.transform, 'epsg': raster.epsg,
+        'nodata': raster.nodata,
+    }
+    profile.update(overrides)
+    return profile
@@ -1,9 +1,9 @@
 import ee
 import geemap
+from init import initialize
 
-# Inicializa o Earth Engine
-ee.Authenticate()
-ee.Initialize(project='analise-satelite-projeto-01')
+# Inicializa o Earth Engine (sem repetir a autenticação se as credenciais já estão salvas)
+initialize()
 
 # Carrega a imagem Landsat 8
 image = ee.Image('LANDSAT/LC08/C01/T1_SR/LC08_044034_20140318')
@@ -0,0 +1,108 @@
+"""
+Manifesto de cenas: obtém, em uma única consulta por sensor, o id, a data, a
+cobertura de nuvens e a área de cobertura de todas as cenas do período, para
+que as exportações sejam montadas diretamente a partir de ee.Image(id), sem
+percorrer a coleção com toList(count).get(i) nem chamar size().getInfo() mês
+a mês.
+"""
+
+import datetime
+from dataclasses import dataclass
+
+import ee
+
+from tiling import bbox_of
+
+# Configuração de cada sensor (coleção, propriedade de nuvens, grade de aquisição WRS/MGRS,
+# bandas NIR/Red e escala nativa)
+SENSORS = {
+    'landsat8': {
+        'collection': 'LANDSAT/LC08/C02/T1_L2',
+        'cloud_property': 'CLOUD_COVER',
+        'tile_properties': ['WRS_PATH', 'WRS_ROW'],
+        'bands': ['SR_B5', 'SR_B4'],
+        'scale': 30,
+        'label': 'Landsat',
+    },
+    'sentinel2': {
+        'collection': 'COPERNICUS/S2_SR_HARMONIZED',
+        'cloud_property': 'CLOUDY_PIXEL_PERCENTAGE',
+        'tile_properties': ['MGRS_TILE'],
+        'bands': ['B8', 'B4'],
+        'scale': 10,
+        'label': 'Sentinel',
+    },
+}
+
+
+@dataclass
+class Scene:
+    """Uma cena do manifesto."""
+    id: str
+    sensor: str
+    date: datetime.datetime
+    cloud_cover: float
+    bbox: list = None
+    tile: str = None
+    version: int = None
+
+
+def _format_date(date):
+    if isinstance(date, datetime.datetime):
+        return date.strftime('%Y-%m-%d')
+    return date
+
+
+# Função para montar a coleção filtrada de um sensor
+def sensor_collection(sensor, region, date_start, date_end, max_cloud):
+    config = SENSORS[sensor]
+    return ee.ImageCollection(config['collection']) \
+        .filterDate(_format_date(date_start), _format_date(date_end)) \
+        .filterBounds(region) \
+        .filter(ee.Filter.lt(config['cloud_property'], max_cloud)) \
+        .select(config['bands'])
+
+
+# Função para buscar o manifesto de uma coleção em uma única ida ao servidor
+def fetch_scenes(collection, sensor):
+    config = SENSORS[sensor]
+    query = {
+        'ids': collection.aggregate_array('system:id'),
+        'times': collection.aggregate_array('system:time_start'),
+        'clouds': collection.aggregate_array(config['cloud_property']),
+        'footprints': collection.aggregate_array('system:footprint'),
+        # Versão do asset (muda quando a cena é reprocessada); usada nas execuções incrementais
+        'versions': collection.aggregate_array('system:version'),
+    }
+    for prop in config['tile_properties']:
+        query[prop] = collection.aggregate_array(prop)
+    info = ee.Dictionary(query).getInfo()
+
+    # Identificador da cena na grade de aquisição (ex.: '217/065' no WRS-2, '24MUV' no MGRS)
+    tile_values = zip(*[info[prop] for prop in config['tile_properties']])
+    tile_keys = ['/'.join(f'{int(value):03d}' if isinstance(value, (int, float)) else str(value) for value in values)
+                 for values in tile_values]
+
+    scenes = []
+    for scene_id, millis, cloud, footprint, tile, version in zip(info['ids'], info['times'], info['clouds'],
+                                                                 info['footprints'], tile_keys, info['versions']):
+        date = datetime.datetime.utcfromtimestamp(millis / 1000)
+        bbox = bbox_of(footprint['coordinates']) if footprint else None
+        scenes.append(Scene(id=scene_id, sensor=sensor, date=date, cloud_cover=cloud, bbox=bbox, tile=tile,
+                            version=version))
+    scenes.sort(key=lambda scene: (scene.date, scene.id))
+    return scenes
+
+
+def build_scene_manifest(region, date_start, date_end, max_cloud, sensors=('landsat8', 'sentinel2')):
+    """Retorna as cenas de todos os sensores no período (uma consulta por sensor)."""
+    scenes = []
+    for sensor in sensors:
+        collection = sensor_collection(sensor, region, date_start, date_end, max_cloud)
+        scenes.extend(fetch_scenes(collection, sensor))
+    return scenes
+
+
+# Função para montar a imagem de exportação de uma cena diretamente pelo id
+def scene_image(scene, region):
+    return ee.Image(scene.id).select(SENSORS[scene.sensor]['bands']).clip(region)
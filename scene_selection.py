@@ -0,0 +1,120 @@
+"""
+Seleção das melhores cenas por período e por posição na grade de aquisição
+(WRS-2 path/row do Landsat, tile MGRS do Sentinel-2), para não exportar todas
+as cenas abaixo do limite de nuvens.
+
+Em cada período (mês, por padrão) a seleção é gulosa: escolhe a cena com maior
+ganho de cobertura dos blocos do bioma ainda não cobertos, ponderado pela
+fração sem nuvens e pelo espaçamento em relação às cenas já escolhidas da
+mesma posição, até que cada bloco tocado pelas candidatas esteja coberto
+`per_group` vezes (ou não haja mais ganho). Cada posição WRS/MGRS contribui
+com no máximo `per_group` cenas por período.
+
+Uso:
+    selected = select_scenes(scenes, tiles, DATE_START, DATE_END, 'month', per_group=2)
+    selection_report(scenes, selected, tiles)
+"""
+
+import collections
+
+from scene_manifest import SENSORS
+from temporal_bins import bin_scenes
+from tiling import tiles_for_bbox
+
+# Bytes por amostra das bandas exportadas (reflectância de superfície em uint16)
+BYTES_PER_SAMPLE = 2
+
+
+def clear_fraction(scene):
+    """Fração da cena sem nuvens (0 a 1), a partir da cobertura de nuvens do manifesto."""
+    return max(0.0, 1.0 - (scene.cloud_cover or 0.0) / 100.0)
+
+
+def scene_tiles(scene, tiles):
+    """Blocos do bioma cobertos pela cena (todos, quando a cena não tem área de cobertura)."""
+    sensor_tiles = tiles.get(scene.sensor, []) if tiles else []
+    if not sensor_tiles:
+        return [scene.tile or scene.id]
+    return [tile.id for tile in (tiles_for_bbox(sensor_tiles, scene.bbox) if scene.bbox else sensor_tiles)]
+
+
+def _spread(scene, chosen, ideal_gap):
+    """1 quando a cena está a pelo menos `ideal_gap` dias das já escolhidas da mesma posição."""
+    if not chosen or ideal_gap <= 0:
+        return 1.0
+    gap = min(abs((scene.date - other.date).total_seconds()) / 86400 for other in chosen)
+    return min(1.0, gap / ideal_gap)
+
+
+def select_bin(candidates, tiles, per_group=2, bin_days=30):
+    """Seleciona as cenas de um período (um único sensor ou vários) pela cobertura gulosa."""
+    coverage = {scene.id: scene_tiles(scene, tiles) for scene in candidates}
+    need = collections.Counter()
+    for covered in coverage.values():
+        for tile_id in covered:
+            need[tile_id] = per_group
+
+    chosen = collections.defaultdict(list)
+    remaining = sorted(candidates, key=lambda scene: (scene.cloud_cover or 0.0, scene.date, scene.id))
+    selected = []
+    while remaining:
+        best, best_score = None, 0.0
+        for scene in remaining:
+            group = chosen[(scene.sensor, scene.tile)]
+            if len(group) >= per_group:
+                continue
+            gain = sum(1 for tile_id in coverage[scene.id] if need[tile_id] > 0)
+            score = gain * clear_fraction(scene) * (0.5 + 0.5 * _spread(scene, group, bin_days / per_group))
+            if score > best_score:
+                best, best_score = scene, score
+        if best is None:
+            break
+        selected.append(best)
+        chosen[(best.sensor, best.tile)].append(best)
+        remaining.remove(best)
+        for tile_id in coverage[best.id]:
+            need[tile_id] -= 1
+    return sorted(selected, key=lambda scene: (scene.date, scene.id))
+
+
+def select_scenes(scenes, tiles, date_start, date_end, window='month', per_group=2):
+    """Melhores cenas de cada sensor em cada período da janela temporal."""
+    selected = []
+    for sensor in SENSORS:
+        sensor_scenes = [scene for scene in scenes if scene.sensor == sensor]
+        for time_bin in bin_scenes(sensor_scenes, date_start, date_end, window, keep_empty=False):
+            bin_days = max(1.0, (time_bin.end - time_bin.start).total_seconds() / 86400)
+            selected.extend(select_bin(time_bin.scenes, tiles, per_group, bin_days))
+    return selected
+
+
+def export_volume(scenes, tiles):
+    """Volume estimado (bytes) e número de blocos exportados para uma lista de cenas."""
+    by_id = {sensor: {tile.id: tile for tile in sensor_tiles} for sensor, sensor_tiles in (tiles or {}).items()}
+    total_bytes, total_tiles = 0, 0
+    for scene in scenes:
+        bands = len(SENSORS[scene.sensor]['bands'])
+        for tile_id in scene_tiles(scene, tiles):
+            tile = by_id.get(scene.sensor, {}).get(tile_id)
+            if tile is not None:
+                total_bytes += tile.width * tile.height * bands * BYTES_PER_SAMPLE
+            total_tiles += 1
+    return total_bytes, total_tiles
+
+
+def selection_report(scenes, selected, tiles):
+    """Mostra (e retorna) quanto a seleção reduziu o número de cenas, de blocos e o volume exportado."""
+    before_bytes, before_tiles = export_volume(scenes, tiles)
+    after_bytes, after_tiles = export_volume(selected, tiles)
+    saved = before_bytes - after_bytes
+    report = {
+        'scenes_before': len(scenes), 'scenes_after': len(selected),
+        'tiles_before': before_tiles, 'tiles_after': after_tiles,
+        'bytes_before': before_bytes, 'bytes_after': after_bytes, 'bytes_saved': saved,
+    }
+    message = f"Seleção de cenas: {len(selected)} de {len(scenes)} cenas, {after_tiles} de {before_tiles} blocos"
+    if before_bytes:
+        message += (f"; volume estimado {after_bytes / 1e9:.1f} GB em vez de {before_bytes / 1e9:.1f} GB "
+                    f"({saved / 1e9:.1f} GB, {saved / before_bytes * 100:.0f}% a menos)")
+    print(message + ".")
+    return report
@@ -0,0 +1,301 @@
+"""
+Índices espectrais locais (NDVI, EVI, SAVI, NBR, NDWI) calculados em uma
+única passada sobre as bandas de reflectância exportadas.
+
+Cada banda necessária aos índices pedidos é lida uma vez por janela e
+convertida para reflectância float32 (escala/offset do sensor, como em
+LandSat8.apply_scale_factors e no Sentinel2 do projeto-01.py) em buffers
+reutilizados; os índices são avaliados sobre esses buffers, com a diferença
+NIR - Red compartilhada entre NDVI, EVI e SAVI, e gravados como bandas de um
+único GeoTIFF float32 (nodata NaN), na ordem pedida.
+
+A posição de cada banda no arquivo vem das descrições das bandas do GeoTIFF,
+de `band_names` ou, na falta de ambos, da ordem de SENSOR_BANDS[sensor].
+
+Uso:
+    python spectral_indices.py landsat8 cena.tif indices.tif [NDVI,EVI,SAVI,NBR,NDWI] [processos]
+"""
+
+import math
+import sys
+import time
+
+import numpy as np
+
+from instrumentation import traced
+from local_ndvi import BLOCK_SIZE, NDVI_PRESETS
+from quantized import quantize as quantize_block, writer_options
+from raster_io import RasterWriter, grid_windows, map_windows, open_raster
+
+# Bandas de reflectância de cada sensor (nome comum -> banda da coleção), na ordem de uma exportação
+# com .select(list(bands.values())), e a escala/offset da reflectância de superfície
+SENSOR_BANDS = {
+    'landsat8': {
+        'bands': {'blue': 'SR_B2', 'green': 'SR_B3', 'red': 'SR_B4', 'nir': 'SR_B5', 'swir1': 'SR_B6',
+                  'swir2': 'SR_B7'},
+        'scale': NDVI_PRESETS['landsat8']['scale'],
+        'offset': NDVI_PRESETS['landsat8']['offset'],
+    },
+    'sentinel2': {
+        'bands': {'blue': 'B2', 'green': 'B3', 'red': 'B4', 'nir': 'B8', 'swir1': 'B11', 'swir2': 'B12'},
+        'scale': NDVI_PRESETS['sentinel2']['scale'],
+        'offset': NDVI_PRESETS['sentinel2']['offset'],
+    },
+}
+
+# Constantes do EVI (MODIS) e fator de solo do SAVI
+EVI_GAIN, EVI_C1, EVI_C2, EVI_L = 2.5, 6.0, 7.5, 1.0
+SAVI_L = 0.5
+
+# Bandas usadas por cada índice
+INDEX_BANDS = {
+    'NDVI': ('nir', 'red'),
+    'EVI': ('nir', 'red', 'blue'),
+    'SAVI': ('nir', 'red'),
+    'NBR': ('nir', 'swir2'),
+    'NDWI': ('green', 'nir'),
+}
+
+# Índices calculados por padrão
+DEFAULT_INDICES = ('NDVI', 'EVI', 'SAVI', 'NBR', 'NDWI')
+
+
+class _Workspace:
+    """Buffers reutilizados em todos os blocos: uma banda float32 por nome, máscaras e temporários."""
+
+    def __init__(self, block_size, names, dtype):
+        shape = (block_size, block_size)
+        self.raw = np.empty((len(names),) + shape, dtype=dtype)
+        self.bands = {name: np.empty(shape, dtype=np.float32) for name in names}
+        self.nodata = {name: np.empty(shape, dtype=bool) for name in names}
+        self.diff = np.empty(shape, dtype=np.float32)
+        self.total = np.empty(shape, dtype=np.float32)
+        self.temp = np.empty(shape, dtype=np.float32)
+        self.invalid = np.empty(shape, dtype=bool)
+
+    def view(self, array, height, width):
+        return array[:height, :width]
+
+
+def _ratio(numerator, denominator, out, invalid):
+    """out = numerator / denominator, com NaN onde o denominador é zero ou o pixel é inválido."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        np.divide(numerator, denominator, out=out)
+    np.logical_or(invalid, denominator == 0, out=invalid)
+    out[invalid] = np.nan
+    return out
+
+
+def _normalized_difference(a, b, out, total, invalid):
+    np.add(a, b, out=total)
+    np.subtract(a, b, out=out)
+    return _ratio(out, total, out, invalid)
+
+
+# Cada índice recebe as bandas, a diferença NIR - Red já calculada, a saída, dois buffers temporários e a
+# máscara de pixels inválidos
+def _ndvi(b, diff, out, total, temp, invalid):
+    np.add(b['nir'], b['red'], out=total)
+    return _ratio(diff, total, out, invalid)
+
+
+def _evi(b, diff, out, total, temp, invalid):
+    # 2.5 * (NIR - Red) / (NIR + 6 Red - 7.5 Blue + 1)
+    np.multiply(b['red'], EVI_C1, out=total)
+    total += b['nir']
+    np.multiply(b['blue'], EVI_C2, out=temp)
+    total -= temp
+    total += EVI_L
+    np.multiply(diff, EVI_GAIN, out=temp)
+    return _ratio(temp, total, out, invalid)
+
+
+def _savi(b, diff, out, total, temp, invalid):
+    # (1 + L) * (NIR - Red) / (NIR + Red + L)
+    np.add(b['nir'], b['red'], out=total)
+    total += SAVI_L
+    np.multiply(diff, 1 + SAVI_L, out=temp)
+    return _ratio(temp, total, out, invalid)
+
+
+def _nbr(b, diff, out, total, temp, invalid):
+    return _normalized_difference(b['nir'], b['swir2'], out, total, invalid)
+
+
+def _ndwi(b, diff, out, total, temp, invalid):
+    # NDWI de McFeeters (água aberta): (Green - NIR) / (Green + NIR)
+    return _normalized_difference(b['green'], b['nir'], out, total, invalid)
+
+
+INDEX_FUNCTIONS = {'NDVI': _ndvi, 'EVI': _evi, 'SAVI': _savi, 'NBR': _nbr, 'NDWI': _ndwi}
+
+
+def indices_block(bands, nodata, indices, out, ws):
+    """
+    Avalia `indices` sobre as bandas de reflectância de um bloco (dicionários nome -> array float32 e
+    nome -> máscara de nodata) e grava cada um em out[i]; pixels sem dado ficam NaN.
+    """
+    height, width = out.shape[1:]
+    diff = ws.view(ws.diff, height, width)
+    if any(index in ('NDVI', 'EVI', 'SAVI') for index in indices):
+        np.subtract(bands['nir'], bands['red'], out=diff)
+    total, temp = ws.view(ws.total, height, width), ws.view(ws.temp, height, width)
+    invalid = ws.view(ws.invalid, height, width)
+    for i, index in enumerate(indices):
+        invalid.fill(False)
+        for name in INDEX_BANDS[index]:
+            if nodata is not None:
+                invalid |= nodata[name]
+        INDEX_FUNCTIONS[index](bands, diff, out[i], total, temp, invalid)
+    return out
+
+
+def resolve_bands(raster, sensor, indices, band_names=None):
+    """Posição (a partir de 1) no arquivo de cada banda usada pelos índices."""
+    config = SENSOR_BANDS[sensor]
+    names = band_names or raster.descriptions
+    if not names or not all(names):
+        names = list(config['bands'].values())
+    positions = {}
+    for name in dict.fromkeys(b for index in indices for b in INDEX_BANDS[index]):
+        band = config['bands'][name]
+        if band not in names:
+            raise ValueError(f"A banda {band} ({name}) não está em {raster.path} (bandas: {names}).")
+        positions[name] = names.index(band) + 1
+    if max(positions.values()) > raster.count:
+        raise ValueError(f"{raster.path} tem {raster.count} banda(s); faltam bandas para {', '.join(indices)}.")
+    return positions
+
+
+class _BandReader:
+    """Lê as bandas de uma janela uma única vez (memmap quando possível) e as converte para reflectância."""
+
+    def __init__(self, path, positions, block_size):
+        self.raster = open_raster(path)
+        self.positions = positions
+        self.names = list(positions)
+        maps = [self.raster.memmap(band) for band in positions.values()]
+        self.maps = maps if all(m is not None for m in maps) else None
+        self.workspace = _Workspace(block_size, self.names, self.raster.dtype)
+
+    def read(self, window):
+        if self.maps:
+            rows = slice(window.row_off, window.row_off + window.height)
+            cols = slice(window.col_off, window.col_off + window.width)
+            return [band_map[rows, cols] for band_map in self.maps]
+        raw = self.workspace.raw[:, :window.height, :window.width]
+        self.raster.read(bands=list(self.positions.values()), window=window, out=raw)
+        return raw
+
+    def indices(self, window, indices, out, nodata, scale, offset):
+        ws = self.workspace
+        bands, masks = {}, {} if nodata is not None else None
+        for name, values in zip(self.names, self.read(window)):
+            band = ws.view(ws.bands[name], window.height, window.width)
+            if masks is not None:
+                masks[name] = np.equal(values, nodata, out=ws.view(ws.nodata[name], window.height, window.width))
+            np.copyto(band, values, casting='unsafe')
+            if scale is not None:
+                band *= np.float32(scale)
+                band += np.float32(offset)
+            bands[name] = band
+        return indices_block(bands, masks, indices, out, ws)
+
+    def close(self):
+        self.maps = None
+        self.raster.close()
+
+
+# Estado de cada processo do pool (um leitor aberto por processo)
+_worker = {}
+
+
+def _init_worker(path, positions, block_size, indices, nodata, scale, offset):
+    _worker['reader'] = _BandReader(path, positions, block_size)
+    _worker['params'] = (indices, nodata, scale, offset)
+
+
+def _worker_indices(window):
+    indices, nodata, scale, offset = _worker['params']
+    out = np.empty((len(indices), window.height, window.width), dtype=np.float32)
+    return window, _worker['reader'].indices(window, indices, out, nodata, scale, offset)
+
+
+@traced('indices')
+def compute_indices(src_path, dst_path, sensor, indices=DEFAULT_INDICES, band_names=None, apply_scale_factors=True,
+                    nodata=None, block_size=BLOCK_SIZE, workers=0, compress='deflate', quantize=None):
+    """
+    Grava os `indices` de um GeoTIFF exportado em `dst_path` (uma banda float32 por índice, nodata NaN).
+
+    Diferente do compute_ndvi(), a escala/offset da reflectância é aplicada por padrão: EVI e SAVI
+    dependem da reflectância absoluta, não só da razão entre bandas. Se o arquivo não define nodata,
+    o valor 0 das bandas inteiras é tratado como pixel mascarado. `quantize='int16'` (ou 'uint8') grava
+    os índices no formato compacto do quantized.py.
+    """
+    indices = [index.upper() for index in indices]
+    unknown = [index for index in indices if index not in INDEX_FUNCTIONS]
+    if unknown:
+        raise ValueError(f"Índices desconhecidos: {', '.join(unknown)} (disponíveis: {', '.join(INDEX_FUNCTIONS)})")
+    config = SENSOR_BANDS[sensor]
+    scale, offset = (config['scale'], config['offset']) if apply_scale_factors else (None, None)
+
+    start = time.perf_counter()
+    with open_raster(src_path) as raster:
+        positions = resolve_bands(raster, sensor, indices, band_names)
+    reader = _BandReader(src_path, positions, block_size)
+    raster = reader.raster
+    if nodata is None:
+        nodata = raster.nodata
+        if nodata is None and raster.dtype.kind in 'ui':
+            nodata = 0
+    if isinstance(nodata, float) and math.isnan(nodata):
+        nodata = None
+    windows = grid_windows(raster.width, raster.height, block_size)
+
+    if quantize:
+        options = writer_options(quantize, indices)
+    else:
+        options = {'dtype': 'float32', 'nodata': float('nan'),
+                   'band_metadata': [{'description': index} for index in indices]}
+    writer = RasterWriter(dst_path, raster.width, raster.height, count=len(indices), transform=raster.transform,
+                          epsg=raster.epsg, block_size=block_size, compress=compress, **options)
+
+    def write(block, window):
+        writer.write(quantize_block(block, quantize) if quantize else block, window)
+
+    try:
+        if workers and workers > 1:
+            reader.close()
+            initargs = (src_path, positions, block_size, indices, nodata, scale, offset)
+            for window, block in map_windows(_worker_indices, windows, workers, _init_worker, initargs):
+                write(block, window)
+        else:
+            out = np.empty((len(indices), block_size, block_size), dtype=np.float32)
+            for window in windows:
+                block = out[:, :window.height, :window.width]
+                write(reader.indices(window, indices, block, nodata, scale, offset), window)
+            reader.close()
+        writer.close()
+    except BaseException:
+        reader.close()
+        raise
+
+    seconds = time.perf_counter() - start
+    pixels = raster.width * raster.height
+    print(f"Índices {', '.join(indices)} de {src_path}: {pixels / 1e6:.1f} Mpx em {seconds:.1f} s "
+          f"({pixels / 1e6 / max(seconds, 1e-9):.1f} Mpx/s, {len(positions)} banda(s) lida(s) uma vez)")
+    return {'pixels': pixels, 'seconds': seconds, 'bands_read': len(positions)}
+
+
+def main():
+    if len(sys.argv) < 4:
+        print("Uso: python spectral_indices.py <landsat8|sentinel2> entrada.tif saida.tif "
+              "[NDVI,EVI,SAVI,NBR,NDWI] [processos]")
+        return
+    indices = sys.argv[4].split(',') if len(sys.argv) > 4 else DEFAULT_INDICES
+    workers = int(sys.argv[5]) if len(sys.argv) > 5 else 0
+    compute_indices(sys.argv[2], sys.argv[3], sys.argv[1], indices=indices, workers=workers)
+
+
+if __name__ == "__main__":
+    main()
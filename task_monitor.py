@@ -0,0 +1,128 @@
+"""
+Monitor de tarefas de exportação: obtém o estado de todas as tarefas em uma
+única listagem por ciclo (ee.data.getTaskList), com intervalo de consulta
+adaptativo e callbacks disparados assim que cada tarefa muda de estado.
+
+A listagem só traz as tarefas mais recentes do usuário; as que não aparecem
+nela são consultadas no mesmo ciclo com ee.data.getTaskStatus (uma chamada
+para todas). Uma tarefa que o servidor continua sem reconhecer depois de
+`max_unknown_polls` ciclos recebe o estado UNKNOWN, que é final, para que
+wait() e o ExportScheduler não fiquem esperando por ela para sempre.
+
+Uso síncrono:
+    monitor = TaskMonitor(on_complete=lambda status: print(status['id']))
+    monitor.wait(tasks)
+
+Uso assíncrono (processa cada tarefa assim que ela termina):
+    async for status in TaskMonitor().as_completed(tasks):
+        ...
+"""
+
+import asyncio
+import collections
+import time
+
+import ee
+
+# Estado de uma tarefa que o servidor não reconhece (o mesmo que ee.data.getTaskStatus retorna)
+UNKNOWN = 'UNKNOWN'
+
+# Estados finais das tarefas do Earth Engine (UNKNOWN só depois de max_unknown_polls ciclos)
+TERMINAL_STATES = ('COMPLETED', 'FAILED', 'CANCELLED', UNKNOWN)
+
+# Ciclos seguidos sem o servidor reconhecer a tarefa até ela ser dada como UNKNOWN
+MAX_UNKNOWN_POLLS = 5
+
+
+def _task_id(task):
+    return task if isinstance(task, str) else task.id
+
+
+class TaskMonitor:
+    """Acompanha tarefas com uma consulta em lote por ciclo e intervalo adaptativo."""
+
+    def __init__(self, min_interval=5, max_interval=60, backoff=1.5,
+                 on_complete=None, on_fail=None, on_change=None, sleep=None,
+                 max_unknown_polls=MAX_UNKNOWN_POLLS):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.on_complete = on_complete
+        self.on_fail = on_fail
+        self.on_change = on_change
+        self.sleep = sleep or time.sleep
+        self.max_unknown_polls = max_unknown_polls
+        self.interval = min_interval
+        self.states = {}
+        self.unknown = collections.Counter()
+
+    def poll(self, tasks):
+        """Consulta o estado das tarefas em uma única chamada e dispara os callbacks."""
+        ids = {_task_id(task) for task in tasks}
+        statuses = {status['id']: status for status in ee.data.getTaskList() if status.get('id') in ids}
+        missing = [task_id for task_id in ids if task_id not in statuses]
+        if missing:
+            # Fora da listagem (tarefas antigas ou de outra sessão): consulta direta, no mesmo ciclo
+            for status in ee.data.getTaskStatus(missing):
+                if status.get('state', UNKNOWN) != UNKNOWN:
+                    statuses[status['id']] = status
+        for task_id in ids:
+            if task_id in statuses:
+                self.unknown.pop(task_id, None)
+                continue
+            self.unknown[task_id] += 1
+            if self.unknown[task_id] >= self.max_unknown_polls:
+                statuses[task_id] = {'id': task_id, 'state': UNKNOWN,
+                                     'error_message': f'Tarefa não encontrada no servidor após '
+                                                      f'{self.unknown[task_id]} consultas.'}
+
+        changed = False
+        for task_id, status in statuses.items():
+            previous = self.states.get(task_id)
+            if status['state'] == previous:
+                continue
+            changed = True
+            self.states[task_id] = status['state']
+            if self.on_change:
+                self.on_change(status, previous)
+            if status['state'] == 'COMPLETED' and self.on_complete:
+                self.on_complete(status)
+            elif status['state'] in ('FAILED', 'CANCELLED', UNKNOWN) and self.on_fail:
+                self.on_fail(status)
+
+        # Volta ao intervalo mínimo quando algo mudou; caso contrário, espaça as consultas
+        if changed:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+        return statuses
+
+    def pending(self, tasks):
+        return [task for task in tasks if self.states.get(_task_id(task)) not in TERMINAL_STATES]
+
+    def wait(self, tasks):
+        """Bloqueia até que todas as tarefas terminem; retorna o último status de cada uma."""
+        last = {}
+        remaining = list(tasks)
+        while remaining:
+            last.update(self.poll(remaining))
+            remaining = self.pending(remaining)
+            if remaining:
+                print(f"Aguardando conclusão de {len(remaining)} tarefa(s)...")
+                self.sleep(self.interval)
+        return last
+
+    async def as_completed(self, tasks):
+        """Gera o status de cada tarefa assim que ela chega a um estado final."""
+        loop = asyncio.get_running_loop()
+        remaining = list(tasks)
+        while remaining:
+            # A consulta é bloqueante; roda em uma thread para não travar o loop de eventos
+            statuses = await loop.run_in_executor(None, self.poll, remaining)
+            for task in remaining:
+                status = statuses.get(_task_id(task))
+                if status and status['state'] in TERMINAL_STATES:
+                    yield status
+            remaining = self.pending(remaining)
+            if remaining:
+                await asyncio.sleep(self.interval)
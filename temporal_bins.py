@@ -0,0 +1,98 @@
+"""
+Agrupamento temporal das cenas do manifesto (mês, ano, semana ou janelas de N
+dias, como o ciclo de 16 dias do Landsat).
+
+O manifesto já traz, em uma única consulta por sensor, o id e a data de todas
+as cenas do período; os grupos são montados localmente a partir dele. Assim, a
+contagem e a lista de cenas de cada período saem da mesma resposta, e trocar a
+janela (mensal -> 16 dias, por exemplo) não gera nenhuma nova ida ao servidor.
+
+Uso:
+    scenes = build_scene_manifest(caatinga, DATE_START, DATE_END, 20)
+    for time_bin in bin_scenes(scenes, DATE_START, DATE_END, 'month'):
+        print(time_bin.label, time_bin.count)
+"""
+
+import bisect
+import datetime
+import re
+from dataclasses import dataclass, field
+
+# Janelas com nome; as demais são escritas como '<N>d' (ex.: '16d') ou um inteiro de dias
+NAMED_WINDOWS = {'month': ('month', 1), 'year': ('year', 1), 'week': ('day', 7)}
+
+
+@dataclass
+class TimeBin:
+    """Um período [start, end) e as cenas adquiridas nele."""
+    start: datetime.datetime
+    end: datetime.datetime
+    unit: str
+    scenes: list = field(default_factory=list)
+
+    @property
+    def count(self):
+        return len(self.scenes)
+
+    @property
+    def label(self):
+        if self.unit == 'year':
+            return self.start.strftime('%Y')
+        if self.unit == 'month':
+            return self.start.strftime('%Y-%m')
+        return self.start.strftime('%Y-%m-%d')
+
+
+def parse_window(window):
+    """Converte 'month', 'year', 'week', '16d' ou 16 em (unidade, passo)."""
+    if isinstance(window, int):
+        return 'day', window
+    if window in NAMED_WINDOWS:
+        return NAMED_WINDOWS[window]
+    match = re.fullmatch(r'(\d+)d', str(window))
+    if not match or int(match.group(1)) < 1:
+        raise ValueError(f"Janela temporal inválida: {window}")
+    return 'day', int(match.group(1))
+
+
+def _add_months(date, months):
+    month = date.month - 1 + months
+    return date.replace(year=date.year + month // 12, month=month % 12 + 1, day=1)
+
+
+def bin_edges(date_start, date_end, window='month'):
+    """Limites [início, fim) de cada período entre date_start e date_end."""
+    unit, step = parse_window(window)
+    edges = []
+    current = date_start
+    if unit == 'month':
+        current = current.replace(day=1)
+    elif unit == 'year':
+        current = current.replace(month=1, day=1)
+    while current < date_end:
+        if unit == 'month':
+            following = _add_months(current, step)
+        elif unit == 'year':
+            following = current.replace(year=current.year + step)
+        else:
+            following = current + datetime.timedelta(days=step)
+        edges.append((current, min(following, date_end)))
+        current = following
+    return edges
+
+
+def bin_scenes(scenes, date_start, date_end, window='month', keep_empty=True):
+    """Distribui as cenas (em qualquer ordem) pelos períodos da janela; nenhuma consulta ao servidor."""
+    unit, _ = parse_window(window)
+    bins = [TimeBin(start, end, unit) for start, end in bin_edges(date_start, date_end, window)]
+    starts = [time_bin.start for time_bin in bins]
+    for scene in sorted(scenes, key=lambda scene: (scene.date, scene.id)):
+        index = bisect.bisect_right(starts, scene.date) - 1
+        if 0 <= index < len(bins) and scene.date < bins[index].end:
+            bins[index].scenes.append(scene)
+    return bins if keep_empty else [time_bin for time_bin in bins if time_bin.scenes]
+
+
+def bin_counts(bins):
+    """Contagem de cenas por período ({rótulo: quantidade})."""
+    return {time_bin.label: time_bin.count for time_bin in bins}
@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# Os módulos do projeto ficam na raiz do repositório (sem pacote)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def fake_ee():
+    """O fake_ee no lugar do módulo ee, limpo a cada teste."""
+    import fake_ee
+
+    fake_ee.install(geemap=False)
+    fake_ee.reset()
+    yield fake_ee
+    fake_ee.reset()
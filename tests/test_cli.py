@@ -0,0 +1,20 @@
+import pytest
+
+import cli
+
+NON_MAP_COMMANDS = [command for command in cli.COMMAND_MODULES if command not in cli.MAP_COMMANDS]
+
+
+@pytest.mark.parametrize('command', NON_MAP_COMMANDS)
+def test_non_map_commands_never_import_geemap(command):
+    # Processo novo por subcomando, com o fake_ee no lugar do ee e sem nenhum geemap instalado
+    result = cli.startup_report([command], fake_ee=True)[command]
+    assert 'error' not in result, result
+    assert not result['geemap']
+
+
+@pytest.mark.parametrize('command', ['ndvi', 'indices', 'composicao', 'harmonicos', 'pipeline'])
+def test_local_commands_do_not_import_ee(command):
+    result = cli.startup_report([command])[command]
+    assert 'error' not in result, result
+    assert not result['ee']
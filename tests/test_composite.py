@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from composite import DEFAULT_STATS, build_composite, composite_stack, reference_composite
+from raster_io import RasterWriter, open_raster
+
+STATS = DEFAULT_STATS + ('p25', 'p75')
+
+
+def _random_stack(scenes=9, height=60, width=50, seed=0):
+    rng = np.random.default_rng(seed)
+    stack = rng.uniform(-1, 1, (scenes, height, width)).astype(np.float32)
+    stack[rng.random(stack.shape) < 0.4] = np.nan
+    # Pixels sem nenhuma observação e pixels com uma só
+    stack[:, :10, :10] = np.nan
+    stack[0, 10:20, :10] = rng.uniform(-1, 1, (10, 10))
+    stack[1:, 10:20, :10] = np.nan
+    return stack
+
+
+def _write_scenes(stack, directory):
+    paths = []
+    for i, scene in enumerate(stack):
+        path = str(directory / f'cena_{i:02d}.tif')
+        writer = RasterWriter(path, scene.shape[1], scene.shape[0], nodata=float('nan'), compress='none')
+        writer.write(scene, None)
+        writer.close()
+        paths.append(path)
+    return paths
+
+
+def _assert_matches(result, expected):
+    assert result.shape == expected.shape
+    np.testing.assert_array_equal(np.isnan(result), np.isnan(expected))
+    np.testing.assert_allclose(result, expected, rtol=0, atol=1e-6, equal_nan=True)
+
+
+def test_composite_stack_matches_reference(tmp_path):
+    stack = _random_stack()
+    paths = _write_scenes(stack, tmp_path)
+
+    expected = reference_composite(paths, STATS)
+    original = stack.copy()
+    result = composite_stack(stack, STATS)
+
+    _assert_matches(result, expected)
+    # Sem overwrite_input a pilha do chamador não é reordenada
+    np.testing.assert_array_equal(stack, original)
+    _assert_matches(composite_stack(stack, STATS, overwrite_input=True), expected)
+    # Pixels sem observação: contagem zero e NaN nas demais estatísticas
+    count = result[STATS.index('count')]
+    assert (count[:10, :10] == 0).all() and (count[10:20, :10] == 1).all()
+    assert np.isnan(np.delete(result, STATS.index('count'), axis=0)[:, :10, :10]).all()
+
+
+@pytest.mark.parametrize('workers', [0, 2])
+def test_build_composite_matches_stack(tmp_path, workers):
+    # Várias janelas de 256 pixels; o reference_composite (nan* do NumPy) seria lento demais aqui
+    stack = _random_stack(scenes=5, height=600, width=530, seed=1)
+    paths = _write_scenes(stack, tmp_path)
+    out_path = str(tmp_path / 'composicao.tif')
+
+    build_composite(paths, out_path, stats=STATS, chunk=256, workers=workers, compress='none')
+
+    with open_raster(out_path) as raster:
+        result = np.stack([raster.read_values(band + 1) for band in range(raster.count)])
+    _assert_matches(result, composite_stack(stack, STATS))
@@ -0,0 +1,138 @@
+import datetime
+import os
+import tracemalloc
+import warnings
+
+import numpy as np
+import pytest
+
+from raster_io import RasterWriter, Window
+
+
+@pytest.fixture
+def datacube(fake_ee):
+    # datacube importa o tiling, que importa o ee
+    import datacube
+
+    return datacube
+
+
+def _cube(datacube, root, width, height, chunk=16):
+    """Cubo de `width` x `height` pixels de 30 m, com a origem alinhada à grade."""
+    pixel = 30 / 111319.49
+    x0, y0 = -40.0 // pixel * pixel, -(8.0 // pixel) * pixel
+    bounds = [x0 + 1e-9, y0 - height * pixel + 1e-9, x0 + width * pixel - 1e-9, y0 - 1e-9]
+    return datacube.Datacube.create(str(root), bounds, chunk=chunk, time_chunk=8)
+
+
+def _scene(path, cube, col, row, width, height, value, factor=1):
+    """Cena alinhada ao cubo a partir do pixel (col, row); `factor` > 1 gera uma cena mais fina."""
+    x0, px, _, y0, _, py = cube.transform
+    rng = np.random.default_rng(int(value * 1000) % 2 ** 32)
+    data = rng.uniform(-1, 1, (height * factor, width * factor)).astype(np.float32)
+    data[rng.random(data.shape) < 0.1] = np.nan
+    writer = RasterWriter(str(path), width * factor, height * factor, nodata=float('nan'), compress='none',
+                          transform=(x0 + col * px, px / factor, 0.0, y0 + row * py, 0.0, py / factor))
+    writer.write(data)
+    writer.close()
+    return data
+
+
+def _expected(cube, scenes):
+    out = np.full((len(scenes), cube.height, cube.width), np.nan, dtype=np.float32)
+    for t, (col, row, data, factor) in enumerate(scenes):
+        h, w = data.shape[0] // factor, data.shape[1] // factor
+        blocks = data.reshape(h, factor, w, factor).transpose(0, 2, 1, 3).reshape(h, w, -1)
+        with warnings.catch_warnings():
+            # Células sem nenhuma observação geram avisos de "Mean of empty slice"
+            warnings.simplefilter('ignore', RuntimeWarning)
+            out[t, row:row + h, col:col + w] = np.nanmean(blocks, axis=2)
+    return out
+
+
+def _add_scenes(cube, directory, layout, first=0):
+    scenes, paths, dates = [], [], []
+    for i, (col, row, width, height, factor) in enumerate(layout, start=first):
+        path = directory / f'ndvi_{i:03d}.tif'
+        scenes.append((col, row, _scene(path, cube, col, row, width, height, i + 0.5, factor), factor))
+        paths.append(str(path))
+        dates.append(datetime.datetime(2020, 1, 1) + datetime.timedelta(days=16 * i))
+    return scenes, paths, dates
+
+
+LAYOUT = [(0, 0, 40, 30, 1), (50, 20, 60, 50, 1), (5, 40, 30, 25, 3), (90, 0, 30, 70, 1), (20, 10, 70, 40, 1)]
+
+
+def test_append_places_scenes_on_the_grid(datacube, tmp_path):
+    cube = _cube(datacube, tmp_path / 'cubo', 130, 90)
+    scenes, paths, dates = _add_scenes(cube, tmp_path, LAYOUT)
+    cube.append(paths, 'landsat8', dates)
+
+    _, values = datacube.Datacube(cube.root).read(sort=False)
+    np.testing.assert_array_equal(np.isnan(values), np.isnan(_expected(cube, scenes)))
+    np.testing.assert_allclose(values, _expected(cube, scenes), rtol=0, atol=1e-6, equal_nan=True)
+
+
+def test_append_in_batches_gives_the_same_cube(datacube, tmp_path, monkeypatch):
+    whole = _cube(datacube, tmp_path / 'inteiro', 130, 90)
+    scenes, paths, dates = _add_scenes(whole, tmp_path, LAYOUT)
+    whole.append(paths, 'landsat8', dates)
+
+    # Uma cena por lote: cada lote grava os seus próprios blocos (t0, t1)
+    monkeypatch.setattr(datacube, 'APPEND_FILES', 1)
+    batched = _cube(datacube, tmp_path / 'lotes', 130, 90)
+    batched.append(paths, 'landsat8', dates)
+    assert {(int(r['t0']), int(r['t1'])) for chunks in batched.index.values() for r in chunks} == \
+        {(t, t + 1) for t in range(len(paths))}
+    np.testing.assert_array_equal(batched.read()[1], whole.read()[1])
+
+
+def test_append_memory_follows_scene_footprints(datacube, tmp_path):
+    # 40 cenas pequenas num cubo de 48 000 colunas
+    cube = _cube(datacube, tmp_path / 'cubo', 48000, 256, chunk=64)
+    layout = [(20000 + 37 * i, 10 + i, 300, 200, 1) for i in range(40)]
+    _, paths, dates = _add_scenes(cube, tmp_path, layout)
+
+    tracemalloc.start()
+    try:
+        cube.append(paths, 'landsat8', dates)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak < 96 * 2 ** 20
+    _, values = cube.read(Window(20000, 0, 37 * 40 + 300, 256), sort=False)
+    assert (~np.isnan(values)).any(axis=(1, 2)).all()
+
+
+def test_compact_switches_generation_atomically(datacube, tmp_path, monkeypatch):
+    cube = _cube(datacube, tmp_path / 'cubo', 130, 90)
+    scenes, paths, dates = _add_scenes(cube, tmp_path, LAYOUT)
+    for i in range(len(paths)):
+        cube.append(paths[i:i + 1], 'landsat8', dates[i:i + 1])
+    before = cube.read()[1]
+    files = set(os.listdir(cube.root))
+
+    # Falha antes da troca do cube.json: o cubo continua íntegro, na geração anterior
+    def crash(path, value):
+        raise OSError('queda simulada')
+    monkeypatch.setattr(datacube, '_write_json', crash)
+    with pytest.raises(OSError):
+        cube.compact()
+    monkeypatch.undo()
+    np.testing.assert_array_equal(datacube.Datacube(cube.root).read()[1], before)
+
+    cube = datacube.Datacube(cube.root)
+    cube.compact()
+    reopened = datacube.Datacube(cube.root)
+    np.testing.assert_array_equal(reopened.read()[1], before)
+    assert all(len(chunks) == 1 for chunks in reopened.index.values())
+    # Só a nova geração fica no diretório
+    assert len(set(os.listdir(cube.root))) == len(files)
+    assert not files & {name for name in os.listdir(cube.root) if name != 'cube.json'}
+
+    # Cenas adicionadas depois da compactação vão para a nova geração
+    extra, extra_paths, extra_dates = _add_scenes(reopened, tmp_path, [(10, 10, 20, 20, 1)], first=len(paths))
+    reopened.append(extra_paths, 'sentinel2', extra_dates)
+    values = datacube.Datacube(cube.root).read(sort=False)[1]
+    np.testing.assert_array_equal(values[:len(paths)], before)
+    np.testing.assert_allclose(values[-1:], _expected(reopened, extra), rtol=0, atol=1e-6, equal_nan=True)
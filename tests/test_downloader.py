@@ -0,0 +1,123 @@
+import os
+
+import pytest
+
+from downloader import Download, Downloader, DownloadError
+from fake_http import FileServer
+
+SIZE = 300 * 1024
+
+
+@pytest.fixture
+def served(tmp_path):
+    directory = tmp_path / 'servidor'
+    directory.mkdir()
+    data = os.urandom(SIZE)
+    (directory / 'cena.tif').write_bytes(data)
+    return str(directory), data
+
+
+def _downloader(tmp_path, sleeps):
+    return Downloader(str(tmp_path / 'downloads'), workers=1, chunk_size=16 * 1024, sleep=sleeps.append)
+
+
+def _item(tmp_path, server, **kwargs):
+    os.makedirs(tmp_path / 'downloads', exist_ok=True)
+    return Download(server.url('cena.tif'), str(tmp_path / 'downloads' / 'cena.tif'), **kwargs)
+
+
+@pytest.mark.parametrize('ranges', [True, False])
+def test_resume_after_dropped_connection(tmp_path, served, ranges):
+    directory, data = served
+    sleeps = []
+    with FileServer(directory, drop_after=100 * 1024, ranges=ranges) as server:
+        item = _item(tmp_path, server)
+        result = _downloader(tmp_path, sleeps).fetch(item)
+        assert server.stats['dropped'] == 1
+
+    assert result['status'] == 'baixado' and result['attempts'] == 2
+    assert open(item.path, 'rb').read() == data
+    assert not os.path.exists(item.path + '.part')
+    # Com Range (206) só o restante é baixado de novo; sem Range o arquivo recomeça e os bytes da
+    # tentativa cortada não contam
+    assert result['bytes'] == SIZE
+    assert len(sleeps) == 1
+
+
+def test_complete_part_file_gets_416(tmp_path, served):
+    directory, data = served
+    with FileServer(directory) as server:
+        item = _item(tmp_path, server)
+        with open(item.path + '.part', 'wb') as f:
+            f.write(data)
+        result = _downloader(tmp_path, []).fetch(item)
+        assert server.requests == 1
+
+    assert result['attempts'] == 1 and result['bytes'] == 0
+    assert open(item.path, 'rb').read() == data
+    assert not os.path.exists(item.path + '.part')
+
+
+def test_retry_after_503_uses_retry_after(tmp_path, served):
+    directory, data = served
+    sleeps = []
+    with FileServer(directory, error_every=2) as server:
+        downloader = _downloader(tmp_path, sleeps)
+        # 1ª requisição atendida; a 2ª (do segundo download) recebe 503 com Retry-After: 0
+        downloader.fetch(_item(tmp_path, server))
+        item = Download(server.url('cena.tif'), str(tmp_path / 'downloads' / 'copia.tif'))
+        result = downloader.fetch(item)
+        assert server.stats['errors'] == 1
+
+    assert result['attempts'] == 2
+    assert sleeps == [0.0]
+    assert open(item.path, 'rb').read() == data
+
+
+def test_gives_up_after_retries(tmp_path, served):
+    directory, _ = served
+    sleeps = []
+    with FileServer(directory, error_every=1) as server:
+        downloader = Downloader(str(tmp_path / 'downloads'), retries=2, sleep=sleeps.append)
+        with pytest.raises(DownloadError, match='3 tentativa'):
+            downloader.fetch(_item(tmp_path, server))
+    assert len(sleeps) == 2
+
+
+@pytest.mark.parametrize('size', [SIZE - 1, SIZE + 1])
+def test_size_mismatch_deletes_part(tmp_path, served, size):
+    directory, _ = served
+    with FileServer(directory) as server:
+        item = _item(tmp_path, server, size=size)
+        with pytest.raises(DownloadError, match='tamanho'):
+            _downloader(tmp_path, []).fetch(item)
+
+    assert not os.path.exists(item.path + '.part')
+    assert not os.path.exists(item.path)
+
+
+def test_md5_mismatch_deletes_part(tmp_path, served):
+    directory, data = served
+    path = os.path.join(directory, 'cena.tif')
+
+    def replace_object(seconds):
+        # O objeto muda no servidor entre a tentativa cortada e a retomada: o .part mistura as duas versões
+        with open(path, 'wb') as f:
+            f.write(data[::-1])
+
+    with FileServer(directory, drop_after=100 * 1024, goog_hash=True) as server:
+        item = _item(tmp_path, server)
+        downloader = Downloader(str(tmp_path / 'downloads'), chunk_size=16 * 1024, sleep=replace_object)
+        with pytest.raises(DownloadError, match='MD5'):
+            downloader.fetch(item)
+
+    assert not os.path.exists(item.path + '.part')
+    assert not os.path.exists(item.path)
+
+
+def test_md5_match(tmp_path, served):
+    directory, data = served
+    with FileServer(directory, goog_hash=True) as server:
+        item = _item(tmp_path, server)
+        _downloader(tmp_path, []).fetch(item)
+    assert open(item.path, 'rb').read() == data
@@ -0,0 +1,101 @@
+import pytest
+
+from ee_cache import CachedObject, GetInfoCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def area(fake_ee):
+    fake_ee.add_synthetic_catalog('2020-01-01', '2020-02-01')
+    return lambda: fake_ee.FeatureCollection(fake_ee.CAATINGA_ASSET).geometry().area()
+
+
+def test_memory_hit(fake_ee, area):
+    cache = GetInfoCache(path=None)
+    first = cache.get_info(area())
+    # Mesma consulta montada de novo: mesmo grafo, mesma chave
+    assert cache.get_info(area()) == first
+    assert fake_ee.calls['getInfo'] == 1
+    assert cache.stats == {'miss': 1, 'memory': 1}
+
+
+def test_disk_hit_after_new_instance(fake_ee, area, tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    cache = GetInfoCache(path=path)
+    first = cache.get_info(area())
+    cache.close()
+
+    reopened = GetInfoCache(path=path)
+    assert reopened.get_info(area()) == first
+    assert reopened.get_info(area()) == first
+    assert fake_ee.calls['getInfo'] == 1
+    assert reopened.stats == {'disk': 1, 'memory': 1}
+    reopened.close()
+
+
+def test_ttl_expiry_uses_injected_clock(fake_ee, area, tmp_path):
+    clock = Clock()
+    cache = GetInfoCache(path=str(tmp_path / 'cache.sqlite'), ttl=60, clock=clock)
+    cache.get_info(area())
+    clock.now += 59
+    cache.get_info(area())
+    assert fake_ee.calls['getInfo'] == 1
+
+    # Vencida na memória e no disco
+    clock.now += 1
+    cache.get_info(area())
+    assert fake_ee.calls['getInfo'] == 2
+
+    # TTL por chamada
+    cache.get_info(area(), ttl=5, refresh=True)
+    clock.now += 5
+    cache.get_info(area())
+    assert fake_ee.calls['getInfo'] == 4
+    cache.close()
+
+
+def test_invalidate(fake_ee, area, tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    cache = GetInfoCache(path=path)
+    count = fake_ee.FeatureCollection(fake_ee.CAATINGA_ASSET).size()
+    cache.get_info(area())
+    cache.get_info(count)
+
+    cache.invalidate(area())
+    cache.get_info(area())
+    cache.get_info(count)
+    assert fake_ee.calls['getInfo'] == 3
+
+    cache.invalidate()
+    cache.close()
+    reopened = GetInfoCache(path=path)
+    reopened.get_info(area())
+    reopened.get_info(count)
+    assert fake_ee.calls['getInfo'] == 5
+    reopened.close()
+
+
+def test_cached_object_wraps_derived_objects(fake_ee):
+    fake_ee.add_synthetic_catalog('2020-01-01', '2020-02-01')
+    cache = GetInfoCache(path=None)
+    caatinga = cache.wrap(fake_ee.FeatureCollection(fake_ee.CAATINGA_ASSET))
+
+    bounds = caatinga.geometry().bounds()
+    assert isinstance(bounds, CachedObject)
+    first = bounds.getInfo()
+    assert caatinga.geometry().bounds().getInfo() == first
+    assert first['type'] == 'Polygon'
+    assert fake_ee.calls['getInfo'] == 1
+
+    # Argumentos embrulhados são desembrulhados antes de chegar ao objeto ee
+    region = cache.wrap(fake_ee.Geometry.Rectangle(fake_ee.CAATINGA_BBOX))
+    assert caatinga.filterBounds(region).size().getInfo() == 1
+    assert fake_ee.calls['getInfo'] == 2
+    assert isinstance(caatinga.unwrap(), fake_ee.FeatureCollection)
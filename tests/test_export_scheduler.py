@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+
+@pytest.fixture
+def scheduler_module(fake_ee):
+    # export_scheduler importa o task_monitor, que importa o ee
+    import export_scheduler
+
+    return export_scheduler
+
+
+def test_journal_saves_only_when_dirty(scheduler_module, tmp_path):
+    ExportJournal, SUBMITTED = scheduler_module.ExportJournal, scheduler_module.SUBMITTED
+    path = tmp_path / 'journal.json'
+    journal = ExportJournal(str(path))
+    assert not journal.save() and not path.exists()
+
+    journal.update('cena', state=SUBMITTED, task_id='T1')
+    assert journal.save()
+    assert not journal.save()
+    assert json.loads(path.read_text(encoding='utf-8'))['cena']['task_id'] == 'T1'
+
+    reopened = ExportJournal(str(path))
+    assert reopened.state('cena') == SUBMITTED and not reopened.dirty
+
+
+def test_run_writes_journal_once_per_changed_cycle(fake_ee, scheduler_module, tmp_path):
+    from task_monitor import TaskMonitor
+
+    ExportScheduler, ExportJournal = scheduler_module.ExportScheduler, scheduler_module.ExportJournal
+    COMPLETED = scheduler_module.COMPLETED
+
+    def export(description):
+        task = fake_ee.batch.Export.image.toDrive(None, description=description)
+        task.start()
+        return task
+
+    scheduler = ExportScheduler(str(tmp_path / 'journal.json'), max_in_flight=2,
+                                monitor=TaskMonitor(min_interval=10, max_interval=10, sleep=fake_ee.clock.sleep))
+    for i in range(3):
+        scheduler.add(f'cena_{i}', lambda i=i: export(f'cena_{i}'))
+
+    saves = []
+    save = scheduler.journal.save
+
+    def counted_save():
+        saves.append(save())
+        return saves[-1]
+    scheduler.journal.save = counted_save
+    summary = scheduler.run()
+
+    assert summary == {COMPLETED: 3}
+    cycles = fake_ee.calls['getTaskList'] + 1
+    # Uma chamada por ciclo; gravação só nos ciclos com submissão ou conclusão
+    assert len(saves) == cycles
+    assert 0 < sum(saves) < cycles
+    on_disk = ExportJournal(str(tmp_path / 'journal.json'))
+    assert on_disk.summary(scheduler.jobs) == {COMPLETED: 3}
@@ -0,0 +1,91 @@
+import collections
+
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def fragmentation(fake_ee):
+    # fragmentation importa o tiling, que importa o ee
+    import fragmentation
+
+    return fragmentation
+
+
+def _reference_union_find(count, left, right):
+    parent = list(range(count))
+
+    def find(node):
+        while parent[node] != node:
+            node = parent[node]
+        return node
+
+    for a, b in zip(left.tolist(), right.tolist()):
+        root_a, root_b = find(a), find(b)
+        parent[max(root_a, root_b)] = min(root_a, root_b)
+    return np.array([find(node) for node in range(count)], dtype=np.int64)
+
+
+def _reference_patches(mask, connectivity):
+    """Tamanho (pixels) de cada mancha por busca em largura."""
+    if connectivity == 8:
+        neighbours = [(dy, dx) for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dy or dx]
+    else:
+        neighbours = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+    seen = np.zeros(mask.shape, dtype=bool)
+    sizes = []
+    for start in zip(*np.nonzero(mask)):
+        if seen[start]:
+            continue
+        seen[start] = True
+        queue, size = collections.deque([start]), 0
+        while queue:
+            y, x = queue.popleft()
+            size += 1
+            for dy, dx in neighbours:
+                ny, nx = y + dy, x + dx
+                if 0 <= ny < mask.shape[0] and 0 <= nx < mask.shape[1] and mask[ny, nx] and not seen[ny, nx]:
+                    seen[ny, nx] = True
+                    queue.append((ny, nx))
+        sizes.append(size)
+    return np.sort(sizes)
+
+
+def test_union_find_matches_reference(fragmentation):
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        count = int(rng.integers(1, 300))
+        edges = rng.integers(0, count, (2, int(rng.integers(0, 400))))
+        np.testing.assert_array_equal(fragmentation._union_find(count, *edges),
+                                      _reference_union_find(count, *edges))
+    # Cadeias longas, nas duas direções e embaralhadas
+    chain, shuffled = np.arange(5000), rng.permutation(5000)
+    for left, right in [(chain[:-1], chain[1:]), (chain[1:], chain[:-1]), (shuffled[:-1], shuffled[1:])]:
+        np.testing.assert_array_equal(fragmentation._union_find(5000, left, right),
+                                      _reference_union_find(5000, left, right))
+    assert len(fragmentation._union_find(0, np.zeros(0, int), np.zeros(0, int))) == 0
+
+
+@pytest.mark.parametrize('connectivity', [4, 8])
+def test_tiled_patches_match_flood_fill(fragmentation, tmp_path, connectivity):
+    from raster_io import RasterWriter, transform_from_grid
+
+    rng = np.random.default_rng(connectivity)
+    height, width = 150, 170
+    classes = rng.choice(np.array([0, 3, 4, 12], dtype=np.uint8), size=(height, width), p=[0.05, 0.3, 0.25, 0.4])
+    path = str(tmp_path / 'classes.tif')
+    writer = RasterWriter(path, width, height, dtype='uint8', transform=transform_from_grid(500000, 9000000, 30),
+                          epsg=32723, nodata=0, compress='none')
+    writer.write(classes)
+    writer.close()
+
+    # Blocos de 32 pixels: quase todas as manchas atravessam bordas de blocos
+    metrics = fragmentation.fragmentation_metrics(path, classes=(3, 4), connectivity=connectivity, tile_size=32)
+
+    sizes = _reference_patches(np.isin(classes, (3, 4)), connectivity)
+    pixel_ha = 30 * 30 / 1e4
+    assert metrics['NP'] == len(sizes)
+    assert metrics['LPI'] == pytest.approx(sizes.max() * pixel_ha / metrics['landscape_ha'] * 100)
+    assert metrics['AREA_MN'] == pytest.approx(sizes.mean() * pixel_ha)
+    assert metrics['AREA_SD'] == pytest.approx(sizes.std() * pixel_ha)
+    assert metrics['landscape_ha'] == pytest.approx((classes != 0).sum() * pixel_ha)
@@ -0,0 +1,52 @@
+import datetime
+
+import numpy as np
+
+from harmonics import build_harmonics, coefficient_names, reconstruct
+from raster_io import RasterWriter, open_raster
+
+
+def _write_series(directory, dates, height=16, width=20):
+    """Metade esquerda com NDVI sazonal; metade direita com uma rampa de -0,9 a 0,9 em meio ano."""
+    years = np.array([date.timetuple().tm_yday / 365.25 for date in dates])
+    paths = []
+    for i, date in enumerate(dates):
+        scene = np.empty((height, width), dtype=np.float32)
+        scene[:, :width // 2] = 0.5 + 0.2 * np.cos(2 * np.pi * years[i]) + 0.1 * np.sin(2 * np.pi * years[i])
+        scene[:, width // 2:] = -0.9 + 1.8 * i / (len(dates) - 1)
+        path = str(directory / f'ndvi_{date:%Y%m%d}.tif')
+        writer = RasterWriter(path, width, height, nodata=float('nan'), compress='none')
+        writer.write(scene)
+        writer.close()
+        paths.append(path)
+    return paths
+
+
+def test_saturated_coefficients_are_reported(tmp_path):
+    dates = [datetime.datetime(2020, 1, 1) + datetime.timedelta(days=int(d)) for d in np.linspace(0, 182, 12)]
+    paths = _write_series(tmp_path, dates)
+    coefficients_path = str(tmp_path / 'coeficientes.tif')
+
+    report = build_harmonics(paths, str(tmp_path / 'resumo.tif'), coefficients_path, dates=dates, harmonics=1)
+
+    # A rampa tem tendência de ~3,6 por ano, fora da faixa do int16 (±3,2767)
+    assert report['saturated'] == {'c0': 0, 'trend': 16 * 10, 'cos_1': 0, 'sin_1': 0}
+    assert list(report['saturated']) == coefficient_names(1)
+    # O resumo (float32) guarda a tendência real; o raster de coeficientes, o valor saturado
+    with open_raster(str(tmp_path / 'resumo.tif')) as summary:
+        assert (summary.read_values(2)[:, 10:] > 3.5).all()
+    with open_raster(coefficients_path) as coefficients:
+        assert np.allclose(coefficients.read_values(2)[:, 10:], 3.2767)
+
+    # Os pixels dentro da faixa continuam reconstruídos com o erro da quantização
+    modelled = reconstruct(coefficients_path, dates[5])
+    with open_raster(paths[5]) as scene:
+        observed = scene.read_values(1)
+    assert np.abs(modelled[:, :10] - observed[:, :10]).max() < 1e-3
+
+
+def test_no_saturation_in_range(tmp_path):
+    dates = [datetime.datetime(2019, 1, 1) + datetime.timedelta(days=int(d)) for d in np.linspace(0, 730, 24)]
+    paths = _write_series(tmp_path, dates)
+    report = build_harmonics(paths, str(tmp_path / 'resumo.tif'), str(tmp_path / 'coef.tif'), dates=dates)
+    assert sum(report['saturated'].values()) == 0
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from quantized import QUANTIZATIONS, count_saturated, dequantize, max_error, quantize
+
+# Folga de um ulp do float32 para o arredondamento da própria conta
+EPS = float(np.finfo(np.float32).eps)
+
+
+@pytest.mark.parametrize('scheme', ['int16', 'uint8'])
+def test_round_trip_error_is_bounded(scheme):
+    rng = np.random.default_rng(0)
+    values = rng.uniform(-1, 1, 200_000).astype(np.float32)
+    values[:3] = [-1.0, 0.0, 1.0]
+    restored = dequantize(quantize(values, scheme), scheme)
+    assert np.abs(restored - values).max() <= max_error(scheme) + EPS
+
+
+@pytest.mark.parametrize('scheme, nodata', [('int16', -32768), ('uint8', 255)])
+def test_nan_maps_to_reserved_nodata(scheme, nodata):
+    values = np.array([np.nan, 0.5, np.nan, -0.5], dtype=np.float32)
+    quantized = quantize(values, scheme)
+    assert quantized.dtype == np.dtype(QUANTIZATIONS[scheme]['dtype'])
+    assert quantized[0] == nodata and quantized[2] == nodata
+    assert not np.any(quantized[[1, 3]] == nodata)
+    restored = dequantize(quantized, scheme)
+    assert np.array_equal(np.isnan(restored), np.isnan(values))
+
+
+@pytest.mark.parametrize('scheme', ['int16', 'uint8'])
+def test_out_of_range_values_saturate_without_hitting_nodata(scheme):
+    values = np.array([-100.0, 100.0], dtype=np.float32)
+    quantized = quantize(values, scheme)
+    assert not np.any(quantized == QUANTIZATIONS[scheme]['nodata'])
+    assert quantized[0] < quantized[1]
+
+
+def test_quantized_raster_reads_back_through_read_values(tmp_path):
+    from raster_io import RasterWriter, open_raster
+    from quantized import writer_options
+
+    rng = np.random.default_rng(1)
+    values = rng.uniform(-1, 1, (300, 300)).astype(np.float32)
+    values[::7, ::5] = np.nan
+    path = str(tmp_path / 'ndvi.tif')
+    with RasterWriter(path, 300, 300, block_size=256, **writer_options('int16', ['NDVI'])) as writer:
+        writer.write(quantize(values, 'int16'))
+    with open_raster(path) as raster:
+        restored = raster.read_values(1)
+    assert np.array_equal(np.isnan(restored), np.isnan(values))
+    assert np.nanmax(np.abs(restored - values)) <= max_error('int16') + EPS
+
+
+@pytest.mark.parametrize('scheme', ['int16', 'uint8'])
+def test_count_saturated_matches_quantize(scheme):
+    # Fora da faixa nos dois sentidos; NaN não conta
+    above, below = QUANTIZATIONS[scheme]['scale'] * 40000, -QUANTIZATIONS[scheme]['scale'] * 40000
+    values = np.array([[0.5, below, np.nan], [above, 0.0, 10.0]], dtype=np.float32)
+    assert count_saturated(values, scheme) == 3
+    assert count_saturated(values, scheme, axis=1).tolist() == [1, 2]
+    restored = dequantize(quantize(values, scheme), scheme)
+    inside = np.abs(restored - values) <= max_error(scheme) + EPS
+    assert (~inside & ~np.isnan(values)).sum() == 3
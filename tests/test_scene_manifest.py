@@ -0,0 +1,41 @@
+import datetime
+
+import pytest
+
+
+@pytest.fixture
+def catalog(fake_ee):
+    fake_ee.add_synthetic_catalog('2020-01-01', '2021-01-01', seed=1)
+    return fake_ee
+
+
+def test_manifest_uses_one_getinfo_per_sensor(catalog):
+    from scene_manifest import build_scene_manifest
+
+    region = catalog.Geometry.Rectangle(catalog.CAATINGA_BBOX)
+    scenes = build_scene_manifest(region, '2020-01-01', '2021-01-01', 20)
+
+    assert catalog.calls['getInfo'] == 2
+    assert sum(catalog.calls.values()) == 2
+    # Nenhum size()/toList() para percorrer a coleção
+    assert catalog.operations['size'] == 0
+    assert catalog.operations['toList'] == 0
+    assert {scene.sensor for scene in scenes} == {'landsat8', 'sentinel2'}
+
+
+def test_fetch_scenes_matches_catalog(catalog):
+    from scene_manifest import SENSORS, fetch_scenes, sensor_collection
+
+    region = catalog.Geometry.Rectangle(catalog.CAATINGA_BBOX)
+    collection = sensor_collection('landsat8', region, '2020-01-01', '2021-01-01', 20)
+    scenes = fetch_scenes(collection, 'landsat8')
+
+    assert catalog.calls['getInfo'] == 1
+    expected = [scene for scene in catalog.CATALOG[SENSORS['landsat8']['collection']]
+                if scene['properties']['CLOUD_COVER'] < 20]
+    assert sorted(scene.id for scene in scenes) == sorted(scene['id'] for scene in expected)
+    assert scenes == sorted(scenes, key=lambda scene: (scene.date, scene.id))
+    first = scenes[0]
+    assert isinstance(first.date, datetime.datetime)
+    assert first.cloud_cover < 20 and first.version == 1
+    assert len(first.tile.split('/')) == 2 and first.bbox is not None
@@ -0,0 +1,92 @@
+import pytest
+
+# O ee só existe depois da fixture fake_ee
+UNKNOWN = 'UNKNOWN'
+
+
+def _start(fake_ee, description):
+    task = fake_ee.batch.Export.image.toDrive(None, description=description)
+    task.start()
+    return task
+
+
+@pytest.fixture
+def short_listing(fake_ee, monkeypatch):
+    """getTaskList que, como a do servidor, não traz as tarefas mais antigas (aqui: as marcadas como antigas)."""
+    hidden = set()
+    listing = fake_ee.getTaskList
+
+    def getTaskList():
+        return [status for status in listing() if status['id'] not in hidden]
+    monkeypatch.setattr(fake_ee.data, 'getTaskList', getTaskList)
+    return hidden
+
+
+def _monitor(fake_ee, **kwargs):
+    from task_monitor import TaskMonitor
+
+    return TaskMonitor(min_interval=30, sleep=fake_ee.clock.sleep, **kwargs)
+
+
+def test_tasks_missing_from_listing_use_get_task_status(fake_ee, short_listing):
+    old, new = _start(fake_ee, 'antiga'), _start(fake_ee, 'nova')
+    short_listing.add(old.id)
+
+    statuses = _monitor(fake_ee).wait([old, new])
+
+    assert {task_id: status['state'] for task_id, status in statuses.items()} == {old.id: 'COMPLETED',
+                                                                                   new.id: 'COMPLETED'}
+    # Uma listagem e uma consulta pelo id por ciclo, só para a tarefa fora da listagem
+    assert fake_ee.calls['getTaskStatus'] == fake_ee.calls['getTaskList']
+
+
+def test_listed_tasks_skip_get_task_status(fake_ee):
+    _monitor(fake_ee).wait([_start(fake_ee, 'a'), _start(fake_ee, 'b')])
+    assert fake_ee.calls['getTaskStatus'] == 0
+
+
+def test_unknown_task_ends_wait(fake_ee):
+    failures = []
+    task = _start(fake_ee, 'conhecida')
+    monitor = _monitor(fake_ee, max_unknown_polls=3, on_fail=failures.append)
+
+    statuses = monitor.wait([task, 'TAREFA_INEXISTENTE'])
+
+    assert statuses['TAREFA_INEXISTENTE']['state'] == UNKNOWN
+    assert statuses[task.id]['state'] == 'COMPLETED'
+    assert [status['id'] for status in failures] == ['TAREFA_INEXISTENTE']
+    assert monitor.pending([task, 'TAREFA_INEXISTENTE']) == []
+
+
+def test_unknown_count_resets_when_task_shows_up(fake_ee, short_listing, monkeypatch):
+    task = _start(fake_ee, 'atrasada')
+    monitor = _monitor(fake_ee, max_unknown_polls=2)
+    monkeypatch.setattr(fake_ee.data, 'getTaskStatus', lambda ids: [{'id': i, 'state': UNKNOWN} for i in ids])
+    short_listing.add(task.id)
+    monitor.poll([task])
+    assert monitor.unknown[task.id] == 1
+
+    short_listing.clear()
+    monitor.poll([task])
+    assert task.id not in monitor.unknown
+    assert monitor.states[task.id] != UNKNOWN
+
+
+def test_scheduler_finishes_when_task_disappears(fake_ee, tmp_path):
+    from export_scheduler import COMPLETED, FAILED, ExportScheduler
+
+    def lost():
+        # Submissão aceita, mas o id nunca aparece no servidor
+        return type('LostTask', (), {'id': f'PERDIDA{fake_ee.clock.time()}'})()
+
+    scheduler = ExportScheduler(str(tmp_path / 'journal.json'), max_attempts=2,
+                                monitor=_monitor(fake_ee, max_unknown_polls=3))
+    scheduler.add('cena_ok', lambda: _start(fake_ee, 'cena_ok'))
+    scheduler.add('cena_perdida', lost)
+
+    summary = scheduler.run()
+
+    assert summary == {COMPLETED: 1, FAILED: 1}
+    entry = scheduler.journal.entries['cena_perdida']
+    assert entry['attempts'] == 2 and 'não encontrada' in entry['error']
+    assert not scheduler.in_flight
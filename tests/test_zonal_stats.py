@@ -0,0 +1,95 @@
+import math
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from zonal_stats import _rings, rasterize_polygon
+
+# Grade geográfica de ~30 m, com a origem no canto superior esquerdo
+PIXEL = 0.00027
+TRANSFORM = (-40.0, PIXEL, 0.0, -8.0, 0.0, -PIXEL)
+
+
+def _brute_force(shape, rings, transform):
+    """Centro de cada pixel contra todas as arestas (regra par-ímpar), em coordenadas do mapa."""
+    x0, px, _, y0, _, py = transform
+    rows, cols = np.indices(shape)
+    x, y = x0 + (cols + 0.5) * px, y0 + (rows + 0.5) * py
+    inside = np.zeros(shape, dtype=bool)
+    for ring in rings:
+        for (xa, ya), (xb, yb) in zip(ring, np.roll(ring, -1, axis=0)):
+            if ya == yb:
+                continue
+            crosses = (ya > y) != (yb > y)
+            x_cross = xa + (y - ya) * (xb - xa) / (yb - ya)
+            inside ^= crosses & (x < x_cross)
+    return inside
+
+
+def _polygon(center, radius, vertices, rng):
+    angles = np.sort(rng.uniform(0, 2 * math.pi, vertices))
+    radii = radius * rng.uniform(0.5, 1.0, vertices)
+    ring = np.column_stack([center[0] + radii * np.cos(angles), center[1] + radii * np.sin(angles)])
+    return np.vstack([ring, ring[:1]]).tolist()
+
+
+def _geometries():
+    rng = np.random.default_rng(0)
+    lon, lat = TRANSFORM[0] + 60 * PIXEL, TRANSFORM[3] - 40 * PIXEL
+    outer = _polygon((lon, lat), 35 * PIXEL, 40, rng)
+    hole = _polygon((lon, lat), 12 * PIXEL, 12, rng)
+    return {
+        'poligono': {'type': 'Polygon', 'coordinates': [_polygon((lon, lat), 30 * PIXEL, 200, rng)]},
+        'buraco': {'type': 'Polygon', 'coordinates': [outer, hole]},
+        'multipoligono': {'type': 'MultiPolygon', 'coordinates': [
+            [outer, hole],
+            [_polygon((lon + 40 * PIXEL, lat - 25 * PIXEL), 15 * PIXEL, 9, rng)],
+        ]},
+        # Parte fora da grade (à esquerda e acima)
+        'recortado': {'type': 'Polygon', 'coordinates': [_polygon((TRANSFORM[0], TRANSFORM[3]), 30 * PIXEL, 25,
+                                                                   rng)]},
+    }
+
+
+@pytest.mark.parametrize('name', ['poligono', 'buraco', 'multipoligono', 'recortado'])
+def test_rasterize_matches_brute_force(name):
+    geometry = _geometries()[name]
+    labels = np.zeros((90, 120), dtype=np.uint16)
+    filled = rasterize_polygon(labels, _rings(geometry), TRANSFORM, 7)
+
+    expected = _brute_force(labels.shape, _rings(geometry), TRANSFORM)
+    assert expected.any()
+    np.testing.assert_array_equal(labels == 7, expected)
+    assert filled == expected.sum()
+
+
+def test_rasterize_keeps_other_zones():
+    geometry = _geometries()['buraco']
+    labels = np.full((90, 120), 3, dtype=np.uint16)
+    rasterize_polygon(labels, _rings(geometry), TRANSFORM, 7)
+    expected = _brute_force(labels.shape, _rings(geometry), TRANSFORM)
+    np.testing.assert_array_equal(labels, np.where(expected, 7, 3))
+
+
+@pytest.mark.parametrize('columns, edges', [(2890, 4), (47000, 1000)])
+def test_rasterize_memory_is_bounded_on_wide_grid(columns, edges):
+    # Grade de 48 000 colunas; a memória deve acompanhar a faixa de colunas do polígono, não a grade
+    labels = np.zeros((400, 48000), dtype=np.uint8)
+    angles = np.linspace(0, 2 * math.pi, edges, endpoint=False)
+    center = (TRANSFORM[0] + 24000 * PIXEL, TRANSFORM[3] - 200 * PIXEL)
+    ring = np.column_stack([center[0] + columns / 2 * PIXEL * np.cos(angles),
+                            center[1] + 150 * PIXEL * np.sin(angles)])
+    if edges == 4:
+        # Retângulo de 300 x `columns` pixels
+        ring = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1]]) * [columns / 2 * PIXEL, 150 * PIXEL] + center
+
+    tracemalloc.start()
+    try:
+        filled = rasterize_polygon(labels, [ring], TRANSFORM, 1)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    assert filled == int((labels == 1).sum()) > 0
+    assert peak < 128 * 2 ** 20
@@ -0,0 +1,124 @@
+"""
+Planejamento de exportação em blocos (tiles) na resolução nativa do sensor.
+
+Em vez de reduzir a escala para que toda a Caatinga caiba em uma única
+exportação, divide o retângulo envolvente do bioma em uma grade de blocos
+alinhados (30 m para Landsat, 10 m para Sentinel-2), descarta os blocos que
+não tocam o bioma e exporta cada bloco como uma tarefa independente.
+"""
+
+import math
+from dataclasses import dataclass
+
+import ee
+
+from ee_cache import get_info
+
+# Metros por grau no equador (conversão da escala nativa para graus em EPSG:4326)
+METERS_PER_DEGREE = 111319.49
+
+# Tamanho padrão do bloco, em pixels (múltiplo de 256, o tamanho de shard do Earth Engine)
+TILE_PX = 4096
+
+
+@dataclass
+class Tile:
+    """Um bloco da grade: posição (linha/coluna), tamanho em pixels e geotransformação."""
+    row: int
+    col: int
+    x_off: int
+    y_off: int
+    width: int
+    height: int
+    crs: str
+    transform: tuple
+
+    @property
+    def id(self):
+        return f'r{self.row:03d}_c{self.col:03d}'
+
+    @property
+    def bbox(self):
+        x0, pixel, y0 = self.transform[2], self.transform[0], self.transform[5]
+        return [x0, y0 - self.height * pixel, x0 + self.width * pixel, y0]
+
+    def export_params(self):
+        """Parâmetros de ee.batch.Export.image.toDrive que fixam a grade do bloco."""
+        return {
+            'crs': self.crs,
+            'crsTransform': list(self.transform),
+            'dimensions': f'{self.width}x{self.height}',
+            'maxPixels': self.width * self.height,
+        }
+
+
+class TileGrid:
+    """Grade regular de blocos sobre um retângulo (lon/lat), com pixel na escala nativa."""
+
+    def __init__(self, bounds, scale, tile_px=TILE_PX, crs='EPSG:4326'):
+        xmin, ymin, xmax, ymax = bounds
+        self.scale = scale
+        self.crs = crs
+        self.tile_px = tile_px
+        self.pixel = scale / METERS_PER_DEGREE
+
+        # Origem alinhada a múltiplos do pixel, para que grades de exportações diferentes coincidam
+        self.x0 = math.floor(xmin / self.pixel) * self.pixel
+        self.y0 = math.ceil(ymax / self.pixel) * self.pixel
+        self.width = math.ceil((xmax - self.x0) / self.pixel)
+        self.height = math.ceil((self.y0 - ymin) / self.pixel)
+        self.cols = math.ceil(self.width / tile_px)
+        self.rows = math.ceil(self.height / tile_px)
+
+    @property
+    def transform(self):
+        return (self.pixel, 0, self.x0, 0, -self.pixel, self.y0)
+
+    def tile(self, row, col):
+        x_off, y_off = col * self.tile_px, row * self.tile_px
+        return Tile(
+            row=row, col=col, x_off=x_off, y_off=y_off,
+            width=min(self.tile_px, self.width - x_off),
+            height=min(self.tile_px, self.height - y_off),
+            crs=self.crs,
+            transform=(self.pixel, 0, self.x0 + x_off * self.pixel, 0, -self.pixel, self.y0 - y_off * self.pixel),
+        )
+
+    def tiles(self):
+        return [self.tile(row, col) for row in range(self.rows) for col in range(self.cols)]
+
+
+def bbox_of(coordinates):
+    """Retângulo envolvente [xmin, ymin, xmax, ymax] de coordenadas GeoJSON."""
+    xs, ys = [], []
+
+    def walk(coords):
+        if coords and isinstance(coords[0], (int, float)):
+            xs.append(coords[0])
+            ys.append(coords[1])
+        else:
+            for item in coords:
+                walk(item)
+
+    walk(coordinates)
+    return [min(xs), min(ys), max(xs), max(ys)]
+
+
+def bbox_intersects(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def intersecting_tiles(grid, region):
+    """Blocos da grade que tocam a região (uma única consulta ao servidor)."""
+    tiles = grid.tiles()
+    features = ee.FeatureCollection([
+        ee.Feature(ee.Geometry.Rectangle(tile.bbox), {'tile': tile.id}) for tile in tiles
+    ])
+    # O resultado depende só da grade e da região: fica no cache entre execuções
+    kept = set(get_info(features.filterBounds(region).aggregate_array('tile')))
+    return [tile for tile in tiles if tile.id in kept]
+
+
+def tiles_for_bbox(tiles, bbox):
+    """Blocos que tocam um retângulo (ex.: a área de cobertura de uma cena), sem consultar o servidor."""
+    return [tile for tile in tiles if bbox_intersects(tile.bbox, bbox)]
@@ -0,0 +1,243 @@
+"""
+Análise temporal do NDVI (etapa 3 do projeto): tendência por pixel com
+inclinação de Theil–Sen, significância de Mann–Kendall e ponto de mudança de
+Pettitt, para identificar áreas de possível degradação.
+
+Tudo é vetorizado em NumPy sobre lotes de pixels: a série de cada janela é
+lida uma única vez (StackReader da composição) e os pares (i, j) de todas as
+datas são avaliados de uma vez para milhares de pixels, com o tamanho do lote
+limitado por um orçamento de memória. As janelas podem ser processadas em um
+pool de processos.
+
+Uso:
+    python trend.py tendencia.tif 'ndvi/Landsat_*.tif' [processos]
+"""
+
+import datetime
+import glob
+import math
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+from composite import StackReader, composite_stack, stack_grid
+from instrumentation import traced
+from raster_io import RasterWriter, grid_windows, map_windows
+
+# Bandas do raster de saída
+TREND_BANDS = ('slope', 'p_value', 'z', 'degradation', 'break_year', 'break_p', 'count')
+
+# Memória máxima dos arrays de pares (datas x datas x pixels) de um lote
+PAIR_MEMORY = 256 * 2 ** 20
+
+# Janela de leitura e tile do raster de saída
+BLOCK_SIZE = 256
+
+# Mínimo de observações válidas para calcular a tendência de um pixel
+MIN_OBSERVATIONS = 8
+
+# Nível de significância para marcar degradação (tendência negativa significativa)
+ALPHA = 0.05
+
+_DATE_PATTERN = re.compile(r'(\d{4})-?(\d{2})-?(\d{2})')
+
+
+def decimal_year(date):
+    start = datetime.datetime(date.year, 1, 1)
+    end = datetime.datetime(date.year + 1, 1, 1)
+    return date.year + (date - start).total_seconds() / (end - start).total_seconds()
+
+
+def date_from_name(path):
+    """Data da cena a partir do nome do arquivo (ex.: LC08_217065_20170105, 2017-01-05)."""
+    match = _DATE_PATTERN.search(os.path.basename(path))
+    if not match:
+        raise ValueError(f"Não foi possível obter a data da cena a partir do nome {path}.")
+    return datetime.datetime(*map(int, match.groups()))
+
+
+def erfc(x):
+    """Função erro complementar vetorizada (Numerical Recipes, erro relativo < 1.2e-7)."""
+    z = np.abs(x)
+    t = 1 / (1 + 0.5 * z)
+    poly = -z * z - 1.26551223 + t * (1.00002368 + t * (0.37409196 + t * (0.09678418 + t * (
+        -0.18628806 + t * (0.27886807 + t * (-1.13520398 + t * (1.48851587 + t * (
+            -0.82215223 + t * 0.17087277))))))))
+    result = t * np.exp(poly)
+    return np.where(x >= 0, result, 2 - result)
+
+
+def _tie_correction(series, count):
+    """Soma de t(t-1)(2t+5) sobre os grupos de valores repetidos de cada pixel."""
+    ordered = np.sort(series, axis=0)
+    steps = ordered.shape[0]
+    index = np.arange(steps)[:, np.newaxis]
+    # Início do grupo de empate de cada posição (NaN nunca empata)
+    new_group = np.ones(ordered.shape, dtype=bool)
+    new_group[1:] = ordered[1:] != ordered[:-1]
+    group_start = np.maximum.accumulate(np.where(new_group, index, 0), axis=0)
+    k = (index - group_start + 1).astype(np.float64)
+    # f(k) - f(k-1), com f(t) = t(t-1)(2t+5), acumulado ao longo do grupo resulta em f(t)
+    increment = k * (k - 1) * (2 * k + 5) - (k - 1) * (k - 2) * (2 * k + 3)
+    increment[index >= count] = 0
+    return increment.sum(axis=0)
+
+
+def trend_batch(series, years, min_observations=MIN_OBSERVATIONS, alpha=ALPHA):
+    """
+    Tendência de um lote de séries (datas, pixels) com NaN nas ausências.
+
+    Retorna um array (len(TREND_BANDS), pixels): inclinação de Theil–Sen (NDVI/ano),
+    p-valor e Z de Mann–Kendall, indicador de degradação, ano do ponto de mudança
+    de Pettitt e seu p-valor aproximado, e número de observações.
+    """
+    steps, pixels = series.shape
+    years = np.asarray(years, dtype=np.float64)
+    valid = ~np.isnan(series)
+    count = valid.sum(axis=0)
+
+    # Diferenças de todos os pares: diff[i, j] = y_j - y_i (zero quando falta um dos lados)
+    diff = series[np.newaxis, :, :] - series[:, np.newaxis, :]
+    np.nan_to_num(diff, copy=False)
+    sign = np.sign(diff).astype(np.int8)
+    del diff
+
+    # Mann–Kendall: S é a soma dos sinais dos pares com i < j
+    upper = np.triu(np.ones((steps, steps), dtype=bool), k=1)
+    s = sign[upper].sum(axis=0, dtype=np.int64).astype(np.float64)
+    n = count.astype(np.float64)
+    variance = (n * (n - 1) * (2 * n + 5) - _tie_correction(series, count)) / 18
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z = np.where(s > 0, (s - 1) / np.sqrt(variance), np.where(s < 0, (s + 1) / np.sqrt(variance), 0.0))
+    p_value = erfc(np.abs(z) / math.sqrt(2))
+
+    # Theil–Sen: mediana das inclinações dos pares válidos (i < j, datas distintas)
+    rows, cols = np.nonzero(upper)
+    spans = (years[cols] - years[rows]).astype(np.float32)
+    slopes = series[cols] - series[rows]
+    keep = spans > 0
+    slopes, spans = slopes[keep], spans[keep]
+    slopes /= spans[:, np.newaxis]
+    slope = composite_stack(slopes, ('median',), overwrite_input=True)[0]
+
+    # Pettitt: U_t = soma acumulada de sum_j sign(y_t - y_j); K = max |U_t|
+    u = np.cumsum(-sign.sum(axis=1, dtype=np.int64), axis=0)[:-1]
+    position = np.abs(u).argmax(axis=0)
+    k = np.abs(np.take_along_axis(u, position[np.newaxis], axis=0)[0]).astype(np.float64)
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        break_p = np.minimum(1.0, 2 * np.exp(-6 * k ** 2 / (n ** 3 + n ** 2)))
+    break_year = years[position + 1] if steps > 1 else np.full(pixels, np.nan)
+
+    result = np.empty((len(TREND_BANDS), pixels), dtype=np.float32)
+    result[0] = slope
+    result[1] = p_value
+    result[2] = z
+    result[3] = (slope < 0) & (p_value < alpha)
+    result[4] = break_year
+    result[5] = break_p
+    result[6] = count
+    result[:6, count < min_observations] = np.nan
+    return result
+
+
+def batch_size_for(steps, memory=PAIR_MEMORY):
+    """Pixels por lote para que os arrays de pares (diferenças, sinais, inclinações) caibam na memória."""
+    per_pixel = steps * steps * (4 + 1) + steps * (steps - 1) // 2 * 4 * 2
+    return max(1, int(memory // per_pixel))
+
+
+def trend_window(stack, years, batch, min_observations=MIN_OBSERVATIONS, alpha=ALPHA):
+    """Tendência de uma janela (datas, linhas, colunas), em lotes de `batch` pixels."""
+    steps, height, width = stack.shape
+    series = stack.reshape(steps, height * width)
+    result = np.empty((len(TREND_BANDS), height * width), dtype=np.float32)
+    for start in range(0, height * width, batch):
+        part = np.ascontiguousarray(series[:, start:start + batch])
+        result[:, start:start + batch] = trend_batch(part, years, min_observations, alpha)
+    return result.reshape(len(TREND_BANDS), height, width)
+
+
+# Estado de cada processo do pool
+_worker = {}
+
+
+def _init_worker(paths, years, batch, min_observations, alpha):
+    _worker['reader'] = StackReader(paths, BLOCK_SIZE)
+    _worker['params'] = (years, batch, min_observations, alpha)
+
+
+def _worker_window(window):
+    stack = _worker['reader'].read(window)
+    return window, trend_window(stack, *_worker['params'])
+
+
+@traced('tendencia')
+def build_trend(paths, out_path, dates=None, workers=0, min_observations=MIN_OBSERVATIONS, alpha=ALPHA,
+                memory=PAIR_MEMORY, compress='deflate', target_pixels=None):
+    """
+    Calcula a tendência das cenas de NDVI (mesma grade) e grava um GeoTIFF com as
+    bandas de TREND_BANDS. As datas vêm de `dates` ou do nome de cada arquivo;
+    `target_pixels` estima o tempo de uma área maior a partir da vazão medida.
+    """
+    if isinstance(paths, str):
+        paths = sorted(glob.glob(paths))
+    if not paths:
+        raise ValueError("Nenhuma cena encontrada para a análise de tendência.")
+    dates = list(dates) if dates is not None else [date_from_name(path) for path in paths]
+    order = sorted(range(len(paths)), key=lambda i: dates[i])
+    paths = [paths[i] for i in order]
+    years = np.array([decimal_year(dates[i]) for i in order])
+
+    width, height, transform, epsg = stack_grid(paths)
+    batch = batch_size_for(len(paths), memory)
+    print(f"Tendência de {len(paths)} cenas ({years[0]:.2f} a {years[-1]:.2f}), "
+          f"{width}x{height} pixels, lotes de {batch} pixels.")
+
+    start = time.perf_counter()
+    windows = grid_windows(width, height, BLOCK_SIZE)
+    writer = RasterWriter(out_path, width, height, count=len(TREND_BANDS), dtype='float32', transform=transform,
+                          epsg=epsg, nodata=float('nan'), block_size=BLOCK_SIZE, compress=compress,
+                          band_metadata=[{'description': band} for band in TREND_BANDS])
+    params = (years, batch, min_observations, alpha)
+    if workers and workers > 1:
+        initargs = (paths,) + params
+        for window, block in map_windows(_worker_window, windows, workers, _init_worker, initargs):
+            writer.write(block, window)
+    else:
+        reader = StackReader(paths, BLOCK_SIZE)
+        try:
+            for window in windows:
+                writer.write(trend_window(reader.read(window), *params), window)
+        finally:
+            reader.close()
+    writer.close()
+
+    seconds = time.perf_counter() - start
+    return throughput_report(width * height, len(paths), seconds, target_pixels)
+
+
+def throughput_report(pixels, steps, seconds, target_pixels=None):
+    """Vazão (pixels/s) e estimativa de tempo para uma área maior (ex.: a Caatinga a 30 m)."""
+    rate = pixels / max(seconds, 1e-9)
+    report = {'pixels': pixels, 'scenes': steps, 'seconds': seconds, 'pixels_per_second': rate}
+    print(f"Tendência concluída em {seconds:.1f} s: {rate:,.0f} pixels/s com {steps} datas por pixel.")
+    if target_pixels:
+        hours = target_pixels / rate / 3600
+        report['estimated_hours'] = hours
+        print(f"Estimativa para {target_pixels / 1e6:,.0f} Mpx: {hours:.1f} h por processo.")
+    return report
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("Uso: python trend.py saida.tif 'ndvi_*.tif' [processos]")
+        return
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    build_trend(sys.argv[2], sys.argv[1], workers=workers)
+
+
+if __name__ == "__main__":
+    main()